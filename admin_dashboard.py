@@ -44,6 +44,51 @@ def verify_admin(credentials: HTTPBasicCredentials = Depends(security)):
     return credentials.username
 
 class AnalyticsDB:
+    # Aggregation of usage_logs rows into usage_rollup_hourly columns, shared by the trigger and the backfill
+    _ROLLUP_COLUMNS = '''hour, ai_model, request_count, error_count, score_count, score_sum, score_sum_sq,
+        score_min, score_max, score_0_20, score_21_40, score_41_60, score_61_80, score_81_100,
+        response_time_count, response_time_sum, response_time_max,
+        rt_le_250ms, rt_le_500ms, rt_le_1s, rt_le_2s, rt_le_5s, rt_gt_5s'''
+    _ROLLUP_SELECT = '''strftime('%Y-%m-%d %H:00:00', timestamp),
+        CASE WHEN ai_enhanced THEN 'huggingface' ELSE 'local' END,
+        COUNT(*), SUM(CASE WHEN error_occurred THEN 1 ELSE 0 END),
+        COUNT(overall_score), COALESCE(SUM(overall_score), 0), COALESCE(SUM(overall_score * overall_score), 0),
+        MIN(overall_score), MAX(overall_score),
+        SUM(CASE WHEN overall_score BETWEEN 0 AND 20 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN overall_score BETWEEN 21 AND 40 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN overall_score BETWEEN 41 AND 60 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN overall_score BETWEEN 61 AND 80 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN overall_score BETWEEN 81 AND 100 THEN 1 ELSE 0 END),
+        COUNT(processing_time_ms), COALESCE(SUM(processing_time_ms / 1000.0), 0), MAX(processing_time_ms / 1000.0),
+        SUM(CASE WHEN processing_time_ms <= 250 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN processing_time_ms > 250 AND processing_time_ms <= 500 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN processing_time_ms > 500 AND processing_time_ms <= 1000 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN processing_time_ms > 1000 AND processing_time_ms <= 2000 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN processing_time_ms > 2000 AND processing_time_ms <= 5000 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN processing_time_ms > 5000 THEN 1 ELSE 0 END)'''
+    _ROLLUP_MERGE = '''request_count = request_count + excluded.request_count,
+        error_count = error_count + excluded.error_count,
+        score_count = score_count + excluded.score_count,
+        score_sum = score_sum + excluded.score_sum,
+        score_sum_sq = score_sum_sq + excluded.score_sum_sq,
+        score_min = MIN(COALESCE(score_min, excluded.score_min), COALESCE(excluded.score_min, score_min)),
+        score_max = MAX(COALESCE(score_max, excluded.score_max), COALESCE(excluded.score_max, score_max)),
+        score_0_20 = score_0_20 + excluded.score_0_20,
+        score_21_40 = score_21_40 + excluded.score_21_40,
+        score_41_60 = score_41_60 + excluded.score_41_60,
+        score_61_80 = score_61_80 + excluded.score_61_80,
+        score_81_100 = score_81_100 + excluded.score_81_100,
+        response_time_count = response_time_count + excluded.response_time_count,
+        response_time_sum = response_time_sum + excluded.response_time_sum,
+        response_time_max = MAX(COALESCE(response_time_max, excluded.response_time_max),
+                                COALESCE(excluded.response_time_max, response_time_max)),
+        rt_le_250ms = rt_le_250ms + excluded.rt_le_250ms,
+        rt_le_500ms = rt_le_500ms + excluded.rt_le_500ms,
+        rt_le_1s = rt_le_1s + excluded.rt_le_1s,
+        rt_le_2s = rt_le_2s + excluded.rt_le_2s,
+        rt_le_5s = rt_le_5s + excluded.rt_le_5s,
+        rt_gt_5s = rt_gt_5s + excluded.rt_gt_5s'''
+    
     def __init__(self, db_path="analytics.db"):
         self.db_path = db_path
         self.init_db()
@@ -70,6 +115,57 @@ class AnalyticsDB:
             )
         ''')
         
+        # Hourly rollup per model, kept current by the trigger below (buckets match usage_rollup.py)
+        rollup_exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usage_rollup_hourly'"
+        ).fetchone()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS usage_rollup_hourly (
+                hour TEXT NOT NULL,
+                ai_model TEXT NOT NULL,
+                request_count INTEGER NOT NULL DEFAULT 0,
+                error_count INTEGER NOT NULL DEFAULT 0,
+                score_count INTEGER NOT NULL DEFAULT 0,
+                score_sum INTEGER NOT NULL DEFAULT 0,
+                score_sum_sq INTEGER NOT NULL DEFAULT 0,
+                score_min INTEGER,
+                score_max INTEGER,
+                score_0_20 INTEGER NOT NULL DEFAULT 0,
+                score_21_40 INTEGER NOT NULL DEFAULT 0,
+                score_41_60 INTEGER NOT NULL DEFAULT 0,
+                score_61_80 INTEGER NOT NULL DEFAULT 0,
+                score_81_100 INTEGER NOT NULL DEFAULT 0,
+                response_time_count INTEGER NOT NULL DEFAULT 0,
+                response_time_sum REAL NOT NULL DEFAULT 0,
+                response_time_max REAL,
+                rt_le_250ms INTEGER NOT NULL DEFAULT 0,
+                rt_le_500ms INTEGER NOT NULL DEFAULT 0,
+                rt_le_1s INTEGER NOT NULL DEFAULT 0,
+                rt_le_2s INTEGER NOT NULL DEFAULT 0,
+                rt_le_5s INTEGER NOT NULL DEFAULT 0,
+                rt_gt_5s INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (hour, ai_model)
+            )
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS usage_logs_rollup AFTER INSERT ON usage_logs
+            BEGIN
+                INSERT INTO usage_rollup_hourly ({self._ROLLUP_COLUMNS})
+                SELECT {self._ROLLUP_SELECT} FROM (SELECT NEW.timestamp AS timestamp, NEW.ai_enhanced AS ai_enhanced,
+                    NEW.error_occurred AS error_occurred, NEW.overall_score AS overall_score,
+                    NEW.processing_time_ms AS processing_time_ms) AS new_row
+                WHERE true
+                ON CONFLICT (hour, ai_model) DO UPDATE SET {self._ROLLUP_MERGE};
+            END
+        ''')
+        if not rollup_exists:
+            # Backfill from the logs written before the rollup existed
+            cursor.execute(f'''
+                INSERT INTO usage_rollup_hourly ({self._ROLLUP_COLUMNS})
+                SELECT {self._ROLLUP_SELECT} FROM usage_logs
+                GROUP BY 1, 2
+            ''')
+        
         # Daily statistics table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS daily_stats (
@@ -192,6 +288,25 @@ class AnalyticsDB:
         conn.commit()
         conn.close()
     
+    def get_usage_rollup(self, start: str, end: str) -> List[Dict]:
+        """Hourly rollup rows with start <= hour < end (timestamps as 'YYYY-MM-DD HH:MM:SS')"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute('''
+            SELECT * FROM usage_rollup_hourly WHERE hour >= ? AND hour < ? ORDER BY hour, ai_model
+        ''', (start, end)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+    
+    def get_unique_ip_count_between(self, start: str, end: str) -> int:
+        """Count distinct IP addresses with start <= timestamp < end"""
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute('''
+            SELECT COUNT(DISTINCT ip_address) FROM usage_logs WHERE timestamp >= ? AND timestamp < ?
+        ''', (start, end)).fetchone()[0]
+        conn.close()
+        return count
+    
     def get_dashboard_data(self) -> Dict:
         """Get comprehensive dashboard data"""
         conn = sqlite3.connect(self.db_path)
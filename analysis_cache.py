@@ -0,0 +1,162 @@
+# analysis_cache.py - Content-addressed cache for email analysis results
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class AnalysisCache:
+    """Cache analysis results under a hash of everything that determines them.
+
+    Entries live in a per-process LRU bounded by `max_items` and expire after
+    `ttl_seconds`. When `shared_path` (or ANALYSIS_CACHE_PATH) is set, entries are also
+    written to a SQLite file there, so every uvicorn worker on the host shares them.
+    Values are stored as JSON, and every lookup returns a fresh copy that callers may
+    modify freely. The cache is best-effort: shared-tier errors are logged and ignored.
+    """
+
+    # Shared-tier rows are trimmed back to max_items every this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, max_items: Optional[int] = None, ttl_seconds: Optional[int] = None,
+                 shared_path: Optional[str] = None):
+        if max_items is None:
+            max_items = int(os.getenv("ANALYSIS_CACHE_SIZE", "2048"))
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv("ANALYSIS_CACHE_TTL", "3600"))
+        self.max_items = max(1, max_items)
+        self.ttl_seconds = ttl_seconds
+        self.shared_path = shared_path or os.getenv("ANALYSIS_CACHE_PATH") or None
+
+        self._entries = OrderedDict()  # key -> (expires_at, JSON value)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {'hits': 0, 'shared_hits': 0, 'misses': 0}
+
+        self._conn = None
+        if self.shared_path:
+            try:
+                self._conn = sqlite3.connect(self.shared_path, timeout=1, check_same_thread=False)
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('''
+                    CREATE TABLE IF NOT EXISTS analysis_cache (
+                        key TEXT PRIMARY KEY,
+                        expires_at REAL NOT NULL,
+                        value TEXT NOT NULL
+                    )
+                ''')
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"WARNING: Shared analysis cache unavailable, using process-local cache only: {e}")
+                self._conn = None
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Hash the parts (e.g. kind, version, subject, body) into a cache key"""
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part.encode('utf-8')
+            digest.update(len(data).to_bytes(8, 'big'))  # Length prefix keeps part boundaries unambiguous
+            digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a copy of a cached value, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return json.loads(entry[1])
+                del self._entries[key]
+
+            value = self._shared_get(key, now)
+            if value is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters['shared_hits'] += 1
+            self._store_local(key, value[0], value[1])
+            return json.loads(value[1])
+
+    def set(self, key: str, value: Any):
+        """Cache a JSON-serializable value"""
+        data = json.dumps(value)
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store_local(key, expires_at, data)
+            self._shared_set(key, expires_at, data)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for `key`, computing and caching it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['shared_hits'] + self.counters['misses']
+            hits = self.counters['hits'] + self.counters['shared_hits']
+            return {
+                **self.counters,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_items': self.max_items,
+                'ttl_seconds': self.ttl_seconds,
+                'shared': self._conn is not None
+            }
+
+    def close(self):
+        """Close the shared tier"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _store_local(self, key: str, expires_at: float, data: str):
+        """Insert into the LRU, evicting the least recently used entry (caller holds the lock)"""
+        self._entries[key] = (expires_at, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+    def _shared_get(self, key: str, now: float):
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                'SELECT expires_at, value FROM analysis_cache WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"WARNING: Shared analysis cache read failed: {e}")
+            return None
+        return row
+
+    def _shared_set(self, key: str, expires_at: float, data: str):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO analysis_cache (key, expires_at, value) VALUES (?, ?, ?)',
+                (key, expires_at, data)
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._conn.execute('DELETE FROM analysis_cache WHERE expires_at <= ?', (time.time(),))
+                self._conn.execute('''
+                    DELETE FROM analysis_cache WHERE key IN (
+                        SELECT key FROM analysis_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (self.max_items,))
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"WARNING: Shared analysis cache write failed: {e}")
@@ -0,0 +1,177 @@
+# batch_store.py - Bounded storage for batch analysis results
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class BatchResultStore:
+    """Keep recent batch results in memory and spill the rest to a compressed SQLite file.
+
+    The memory tier is an LRU bounded by item count and by an approximate byte budget
+    (the size of each result as JSON); entries also leave memory once they are older
+    than `ttl_seconds`. Anything that leaves memory is written to disk as zlib-compressed
+    JSON and loaded back transparently by `get`. Spilled results are kept for
+    `retention_seconds`.
+
+    Any object with the same `put`, `get` and `stats` methods can be passed to
+    BatchAnalyzer instead.
+    """
+
+    def __init__(self, max_items: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[int] = None, retention_seconds: Optional[int] = None,
+                 spill_path: Optional[str] = None):
+        if max_items is None:
+            max_items = int(os.getenv("BATCH_RESULTS_MAX_ITEMS", "20"))
+        if max_bytes is None:
+            max_bytes = int(os.getenv("BATCH_RESULTS_MAX_MB", "256")) * 1024 * 1024
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv("BATCH_RESULTS_TTL", "3600"))
+        if retention_seconds is None:
+            retention_seconds = int(os.getenv("BATCH_RESULTS_RETENTION", str(7 * 24 * 3600)))
+        self.max_items = max(1, max_items)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.retention_seconds = retention_seconds
+
+        spill_path = spill_path or os.getenv("BATCH_RESULTS_SPILL_PATH")
+        self._owns_spill_file = not spill_path
+        self.spill_path = spill_path or os.path.join(
+            tempfile.gettempdir(), f"batch-results-{os.getpid()}.db"
+        )
+
+        # batch_id -> {'result', 'size', 'stored_at', 'on_disk'}
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self.counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+        self._conn = sqlite3.connect(self.spill_path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS batch_results (
+                batch_id TEXT PRIMARY KEY,
+                stored_at REAL NOT NULL,
+                data BLOB NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def put(self, batch_id: str, batch_result: Dict[str, Any]):
+        """Store a batch result, spilling older results if the memory tier is over budget"""
+        size = len(json.dumps(batch_result, default=str))
+        with self._lock:
+            self._remove_from_memory(batch_id)
+            self._memory[batch_id] = {
+                'result': batch_result,
+                'size': size,
+                'stored_at': time.time(),
+                'on_disk': False
+            }
+            self._memory_bytes += size
+            self._enforce_limits(keep=batch_id)
+
+    def get(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Get a batch result from memory, or load it back from disk"""
+        with self._lock:
+            self._expire()
+            entry = self._memory.get(batch_id)
+            if entry is not None:
+                self._memory.move_to_end(batch_id)
+                self.counters['hits'] += 1
+                return entry['result']
+
+            row = self._conn.execute(
+                'SELECT data FROM batch_results WHERE batch_id = ?', (batch_id,)
+            ).fetchone()
+            if row is None:
+                self.counters['misses'] += 1
+                return None
+
+            self.counters['disk_hits'] += 1
+            data = zlib.decompress(row[0])
+            batch_result = json.loads(data)
+            size = len(data)
+            self._memory[batch_id] = {
+                'result': batch_result,
+                'size': size,
+                'stored_at': time.time(),
+                'on_disk': True  # Already spilled, so evicting it again needs no write
+            }
+            self._memory_bytes += size
+            self._enforce_limits(keep=batch_id)
+            return batch_result
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current tier sizes"""
+        with self._lock:
+            spilled = self._conn.execute('SELECT COUNT(*) FROM batch_results').fetchone()[0]
+            return {
+                **self.counters,
+                'items_in_memory': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'max_items': self.max_items,
+                'max_bytes': self.max_bytes,
+                'items_on_disk': spilled
+            }
+
+    def close(self):
+        """Close the spill file, removing it if the store created it"""
+        with self._lock:
+            self._conn.close()
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self._owns_spill_file:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+
+    def _enforce_limits(self, keep: Optional[str] = None):
+        """Spill least recently used results until both limits hold (caller holds the lock)"""
+        self._expire(keep=keep)
+        while self._memory and (len(self._memory) > self.max_items or self._memory_bytes > self.max_bytes):
+            batch_id = next(iter(self._memory))
+            if batch_id == keep:
+                # The result just stored or loaded stays in memory even if it alone is over budget
+                break
+            self._spill(batch_id)
+            self.counters['evictions'] += 1
+
+    def _expire(self, keep: Optional[str] = None):
+        """Spill results that have been in memory longer than the TTL (caller holds the lock)"""
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            batch_id for batch_id, entry in self._memory.items()
+            if entry['stored_at'] < cutoff and batch_id != keep
+        ]
+        for batch_id in expired:
+            self._spill(batch_id)
+            self.counters['expirations'] += 1
+
+    def _spill(self, batch_id: str):
+        """Move one result from memory to disk (caller holds the lock)"""
+        entry = self._remove_from_memory(batch_id)
+        if entry is None or entry['on_disk']:
+            return
+        data = zlib.compress(json.dumps(entry['result'], default=str).encode('utf-8'))
+        now = time.time()
+        self._conn.execute(
+            'INSERT OR REPLACE INTO batch_results (batch_id, stored_at, data) VALUES (?, ?, ?)',
+            (batch_id, now, data)
+        )
+        self._conn.execute(
+            'DELETE FROM batch_results WHERE stored_at < ?', (now - self.retention_seconds,)
+        )
+        self._conn.commit()
+
+    def _remove_from_memory(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.pop(batch_id, None)
+        if entry is not None:
+            self._memory_bytes -= entry['size']
+        return entry
@@ -0,0 +1,136 @@
+# circuit_breaker.py - Circuit breaker for calls to external services
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop calling a failing or slow service for a while, then probe it before resuming.
+
+    Outcomes from the last `window_seconds` are kept. Once at least `min_calls` were
+    made, the breaker opens when the failure rate or the share of calls slower than
+    `slow_call_seconds` reaches its threshold. After `open_seconds` it lets a single
+    probe call through (half-open): success closes it again, failure re-opens it.
+    """
+
+    def __init__(self, name: str, window_seconds: Optional[float] = None, min_calls: Optional[int] = None,
+                 failure_rate_threshold: Optional[float] = None, slow_call_seconds: Optional[float] = None,
+                 slow_rate_threshold: Optional[float] = None, open_seconds: Optional[float] = None):
+        env = f"{name.upper()}_BREAKER_"
+        self.name = name
+        self.window_seconds = window_seconds if window_seconds is not None else float(os.getenv(env + "WINDOW", "60"))
+        self.min_calls = min_calls if min_calls is not None else int(os.getenv(env + "MIN_CALLS", "10"))
+        self.failure_rate_threshold = (failure_rate_threshold if failure_rate_threshold is not None
+                                       else float(os.getenv(env + "FAILURE_RATE", "0.5")))
+        self.slow_call_seconds = (slow_call_seconds if slow_call_seconds is not None
+                                  else float(os.getenv(env + "SLOW_CALL", "5")))
+        self.slow_rate_threshold = (slow_rate_threshold if slow_rate_threshold is not None
+                                    else float(os.getenv(env + "SLOW_RATE", "0.5")))
+        self.open_seconds = open_seconds if open_seconds is not None else float(os.getenv(env + "OPEN_SECONDS", "30"))
+
+        self.state = CLOSED
+        self._calls = deque()  # (timestamp, succeeded, latency)
+        self._opened_at = None
+        self._probe_started = None  # When the half-open probe call went out
+        self._lock = threading.Lock()
+        self.counters = {'trips': 0, 'rejected': 0, 'successes': 0, 'failures': 0}
+
+    def allow_request(self) -> bool:
+        """Whether a call may go out now.
+
+        A half-open probe must be followed by record_success or record_failure. A call
+        abandoned while closed may go unreported, since it says nothing about the service.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    self.counters['rejected'] += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probe_started = None
+            if self.state == HALF_OPEN:
+                # One probe at a time; a probe that never reported back is replaced after open_seconds
+                if self._probe_started is not None and now - self._probe_started < self.open_seconds:
+                    self.counters['rejected'] += 1
+                    return False
+                self._probe_started = now
+            return True
+
+    def is_open(self) -> bool:
+        """True while calls are being refused outright (doesn't use up the half-open probe)"""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self._opened_at < self.open_seconds
+
+    def record_success(self, latency: float):
+        self._record(True, latency)
+
+    def record_failure(self, latency: float):
+        self._record(False, latency)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current state, trip count and rolling-window rates"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            failure_rate, slow_rate = self._rates()
+            state = self.state
+            if state == OPEN and now - self._opened_at >= self.open_seconds:
+                state = HALF_OPEN  # The next call will be the probe
+            return {
+                'state': state,
+                **self.counters,
+                'window_calls': len(self._calls),
+                'failure_rate': round(failure_rate, 3),
+                'slow_rate': round(slow_rate, 3)
+            }
+
+    def _record(self, succeeded: bool, latency: float):
+        now = time.monotonic()
+        with self._lock:
+            self.counters['successes' if succeeded else 'failures'] += 1
+
+            if self.state == HALF_OPEN:
+                self._probe_started = None
+                if succeeded and latency < self.slow_call_seconds:
+                    self.state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._trip(now)
+                return
+            if self.state == OPEN:
+                return  # A call that started before the breaker opened
+
+            self._calls.append((now, succeeded, latency))
+            self._trim(now)
+            if len(self._calls) >= self.min_calls:
+                failure_rate, slow_rate = self._rates()
+                if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_rate_threshold:
+                    self._trip(now)
+
+    def _trip(self, now: float):
+        """Open the breaker (caller holds the lock)"""
+        self.state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self.counters['trips'] += 1
+        print(f"WARNING: {self.name} circuit breaker opened for {self.open_seconds:g}s")
+
+    def _trim(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _rates(self):
+        if not self._calls:
+            return 0.0, 0.0
+        count = len(self._calls)
+        failures = sum(1 for _, succeeded, _ in self._calls if not succeeded)
+        slow = sum(1 for _, _, latency in self._calls if latency >= self.slow_call_seconds)
+        return failures / count, slow / count
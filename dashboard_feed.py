@@ -0,0 +1,94 @@
+# dashboard_feed.py - In-process counters behind the /admin/stream live dashboard feed
+
+import threading
+from typing import Any, Dict, Optional
+
+from request_metrics import RequestMetrics
+from usage_rollup import SCORE_BUCKETS, is_ai_enhanced
+
+
+def error_label(message: str) -> str:
+    """Group an error message the way the dashboard's error list shows it"""
+    lowered = message.lower()
+    if 'timeout' in lowered:
+        return 'API timeout'
+    if 'rate limit' in lowered:
+        return 'Rate limit exceeded'
+    if 'authentication' in lowered:
+        return 'Authentication failed'
+    if 'invalid' in lowered:
+        return 'Invalid request format'
+    return message[:100]  # Truncate long errors
+
+
+class DashboardFeed:
+    """Running totals of the requests this process has answered.
+
+    `record` is called on the request path and only bumps counters under a lock.
+    Stream readers take `snapshot()`s and send the difference between two of them
+    (`delta`) to the browser, so the database is not touched between full snapshots.
+    Counts cover this process only; the periodic full snapshot from the database
+    corrects for other workers.
+
+    Each recorded request also goes into `metrics`, the RequestMetrics time series
+    behind the recent-window statistics, so the request path records once.
+    """
+
+    def __init__(self, metrics: Optional[RequestMetrics] = None):
+        self.metrics = metrics if metrics is not None else RequestMetrics()
+        self._lock = threading.Lock()
+        self._totals = {
+            'requests': 0,
+            'errors': 0,
+            'ai_enhanced': 0,
+            'score_count': 0,
+            'score_sum': 0,
+            'response_time_sum': 0.0,
+            'score_buckets': {label: 0 for label, _, _, _ in SCORE_BUCKETS},
+            'error_labels': {}
+        }
+        self._seq = 0
+
+    def record(self, score: Optional[float], ai_model: str, response_time: float, error_message: str = ""):
+        """Count one answered request"""
+        self.metrics.record(score, ai_model, response_time, error_message)
+        with self._lock:
+            totals = self._totals
+            self._seq += 1
+            totals['requests'] += 1
+            totals['response_time_sum'] += response_time
+            # Counted like the daily chart's AI series, so live updates match a reload
+            if is_ai_enhanced(ai_model):
+                totals['ai_enhanced'] += 1
+            if error_message:
+                totals['errors'] += 1
+                label = error_label(error_message.strip())
+                totals['error_labels'][label] = totals['error_labels'].get(label, 0) + 1
+            if score is not None:
+                totals['score_count'] += 1
+                totals['score_sum'] += score
+                for label, _, low, high in SCORE_BUCKETS:
+                    if low <= score <= high:
+                        totals['score_buckets'][label] += 1
+                        break
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy of the running totals, with a sequence number that changes on every record"""
+        with self._lock:
+            return {
+                **self._totals,
+                'score_buckets': dict(self._totals['score_buckets']),
+                'error_labels': dict(self._totals['error_labels']),
+                'seq': self._seq
+            }
+
+    @staticmethod
+    def delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+        """What changed between two snapshots (only non-zero entries of the nested counts)"""
+        change = {key: after[key] - before[key] for key in
+                  ('requests', 'errors', 'ai_enhanced', 'score_count', 'score_sum', 'response_time_sum')}
+        for key in ('score_buckets', 'error_labels'):
+            change[key] = {label: count - before[key].get(label, 0)
+                           for label, count in after[key].items() if count != before[key].get(label, 0)}
+        change['seq'] = after['seq']
+        return change
@@ -15,8 +15,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class EmailAlertSystem:
-    def __init__(self, analytics_db):
+    def __init__(self, analytics_db, metrics=None):
         self.analytics_db = analytics_db
+        # Optional RequestMetrics; recent windows are read from it instead of usage_logs.
+        # It counts this worker only, so it is never compared against database figures
+        self.metrics = metrics
         self.smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
         self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
         self.smtp_username = os.getenv("SMTP_USERNAME")
@@ -62,20 +65,20 @@ class EmailAlertSystem:
     def check_error_rate_alert(self):
         """Check if error rate exceeds threshold"""
         try:
-            # Use Supabase if available, otherwise fall back to SQLite
-            if hasattr(self.analytics_db, 'supabase') and self.analytics_db.supabase:
+            live = self._recent_window(3600)
+            if live is not None:
+                # The last hour is still in the in-process buffer
+                total_requests = live['total_requests']
+                error_count = live['error_count']
+                
+            # Otherwise use Supabase if available, then fall back to SQLite
+            elif hasattr(self.analytics_db, 'supabase') and self.analytics_db.supabase:
                 # Get error rate from Supabase
                 one_hour_ago = (datetime.now() - timedelta(hours=1)).isoformat()
                 
-                # Query Supabase for recent logs using correct table name
-                response = self.analytics_db.supabase.table('usage_logs').select('*').gte('timestamp', one_hour_ago).execute()
-                
-                if response.data:
-                    total_requests = len(response.data)
-                    error_count = sum(1 for log in response.data if log.get('error_message') is not None)
-                else:
-                    total_requests = 0
-                    error_count = 0
+                # Count in the database instead of fetching the rows
+                total_requests = self.analytics_db.count_usage_logs(one_hour_ago)
+                error_count = self.analytics_db.count_usage_logs(one_hour_ago, errors_only=True)
                     
             else:
                 # Fall back to SQLite
@@ -115,6 +118,9 @@ class EmailAlertSystem:
     def check_high_usage_alert(self):
         """Check if usage is unusually high"""
         try:
+            # Both sides of the comparison come from the database: the in-process buffer
+            # only counts this worker, while the weekly average covers every worker
+            
             # Use Supabase if available, otherwise fall back to SQLite
             if hasattr(self.analytics_db, 'supabase') and self.analytics_db.supabase:
                 # Get usage from Supabase
@@ -122,12 +128,10 @@ class EmailAlertSystem:
                 seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
                 
                 # Get requests in last hour
-                response_hour = self.analytics_db.supabase.table('usage_logs').select('*').gte('timestamp', one_hour_ago).execute()
-                requests_last_hour = len(response_hour.data) if response_hour.data else 0
+                requests_last_hour = self.analytics_db.count_usage_logs(one_hour_ago)
                 
                 # Get average requests per hour for last 7 days
-                response_week = self.analytics_db.supabase.table('usage_logs').select('*').gte('timestamp', seven_days_ago).execute()
-                total_requests_week = len(response_week.data) if response_week.data else 0
+                total_requests_week = self.analytics_db.count_usage_logs(seven_days_ago)
                 avg_requests = total_requests_week / (24 * 7) if total_requests_week > 0 else 0
                     
             else:
@@ -171,14 +175,12 @@ class EmailAlertSystem:
     def check_api_failure_alert(self):
         """Check for API failures"""
         try:
-            # Use Supabase if available, otherwise fall back to SQLite
+            # Failures are counted from usage_logs, which every worker process writes to
             if hasattr(self.analytics_db, 'supabase') and self.analytics_db.supabase:
                 # Get recent failures from Supabase
                 thirty_mins_ago = (datetime.now() - timedelta(minutes=30)).isoformat()
                 
-                response = self.analytics_db.supabase.table('usage_logs').select('ai_model, error_message, timestamp').gte('timestamp', thirty_mins_ago).order('timestamp', desc=True).execute()
-                
-                recent_logs = response.data if response.data else []
+                failure_count = self.analytics_db.count_usage_logs(thirty_mins_ago, errors_only=True)
                     
             else:
                 # Fall back to SQLite
@@ -197,17 +199,11 @@ class EmailAlertSystem:
                 recent_logs = cursor.fetchall()
                 conn.close()
                 
-            # Convert to consistent format for analysis
-            if hasattr(self.analytics_db, 'supabase') and self.analytics_db.supabase:
-                # Supabase data is already in dict format - check for failures
-                failures = [log for log in recent_logs if log.get('error_message') is not None]
-            else:
-                # SQLite data needs conversion
-                failures = [log for log in recent_logs if log[0] == 0 or log[1] == 1]  # ai_enhanced=False or error_occurred=True
+                failure_count = sum(1 for log in recent_logs if log[0] == 0 or log[1] == 1)  # ai_enhanced=False or error_occurred=True
                 
             # Alert if more than 5 failures in 30 minutes
-            if len(failures) >= 5:
-                self._send_api_failure_alert(len(failures))
+            if failure_count >= 5:
+                self._send_api_failure_alert(failure_count)
                 return True
                 
             return False
@@ -216,6 +212,12 @@ class EmailAlertSystem:
             print(f"❌ Error checking API failures: {e}")
             return False
     
+    def _recent_window(self, seconds: int):
+        """RequestMetrics summary of the last `seconds`, or None if it must come from the database"""
+        if self.metrics is None:
+            return None
+        return self.metrics.window(seconds)
+    
     def _send_error_rate_alert(self, error_rate: float, error_count: int, total_requests: int):
         """Send error rate alert"""
         subject = f"🚨 InboxQualify: High Error Rate Alert ({error_rate:.1f}%)"
@@ -375,5 +377,5 @@ class EmailAlertSystem:
         return self.run_all_checks()
 
 # Initialize email alert system
-def create_email_alert_system(analytics_db):
-    return EmailAlertSystem(analytics_db)
+def create_email_alert_system(analytics_db, metrics=None):
+    return EmailAlertSystem(analytics_db, metrics)
@@ -40,6 +40,8 @@
    - Offline analysis capability
 """
 
+from keyword_matcher import KEYWORD_MATCHER
+
 # Enhanced Email Template Generator with Suggestions
 class EmailTemplateGenerator:
     def __init__(self):
@@ -189,34 +191,35 @@ Best regards,
 
 class EmailSuggestionEngine:
     def __init__(self):
+        # Rules receive the full email text and the keyword hits from the shared matcher
         self.improvement_rules = {
             "subject_length": {
-                "rule": lambda subject: len(subject) > 50,
+                "rule": lambda subject, hits: len(subject) > 50,
                 "suggestion": "Subject line is too long. Keep it under 50 characters for better open rates.",
                 "priority": "high"
             },
             "personalization": {
-                "rule": lambda email: "{name}" not in email.lower() and "hi there" in email.lower(),
+                "rule": lambda email, hits: "{name}" not in hits["suggestion_markers"] and "hi there" in hits["suggestion_markers"],
                 "suggestion": "Add personalization by using the recipient's name instead of generic greetings.",
                 "priority": "high"
             },
             "call_to_action": {
-                "rule": lambda email: "?" not in email and "call" not in email.lower(),
+                "rule": lambda email, hits: "?" not in hits["suggestion_markers"] and "call" not in hits["suggestion_markers"],
                 "suggestion": "Add a clear call-to-action. Consider asking for a specific meeting or response.",
                 "priority": "medium"
             },
             "length": {
-                "rule": lambda email: len(email.split()) > 150,
+                "rule": lambda email, hits: len(email.split()) > 150,
                 "suggestion": "Email is too long. Keep cold emails under 150 words for better response rates.",
                 "priority": "medium"
             },
             "value_proposition": {
-                "rule": lambda email: not any(word in email.lower() for word in ["help", "increase", "improve", "save", "grow"]),
+                "rule": lambda email, hits: not hits["suggestion_value_words"],
                 "suggestion": "Include a clear value proposition. Mention how you can help, increase, improve, or save.",
                 "priority": "high"
             },
             "social_proof": {
-                "rule": lambda email: not any(word in email.lower() for word in ["helped", "clients", "customers", "companies"]),
+                "rule": lambda email, hits: not hits["social_proof_words"],
                 "suggestion": "Add social proof by mentioning other clients or companies you've helped.",
                 "priority": "low"
             }
@@ -225,10 +228,11 @@ class EmailSuggestionEngine:
     def analyze_email(self, subject: str, body: str):
         """Analyze email and provide improvement suggestions"""
         full_email = f"{subject} {body}"
+        keyword_hits = KEYWORD_MATCHER.match(full_email.lower())
         suggestions = []
         
         for rule_name, rule_data in self.improvement_rules.items():
-            if rule_data["rule"](full_email):
+            if rule_data["rule"](full_email, keyword_hits):
                 suggestions.append({
                     "type": rule_name,
                     "message": rule_data["suggestion"],
@@ -463,20 +467,192 @@ class EmailRewriter:
 
 import csv
 import io
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
 import uuid
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Sequence
+
+from batch_store import BatchResultStore
+from local_analyzer import LocalEmailAnalyzer
+
+# Rows scoring below this on the local quality rules also get that score's per-category feedback
+QUALITY_FEEDBACK_BELOW = 70
+
+# Fields of a parsed CSV row that the per-email scorer reads ('sentiment' only when requested)
+_WORKER_FIELDS = ('id', 'subject', 'body', 'sender_name', 'sender_email', 'company', 'industry', 'sentiment')
+
+def _empty_batch_totals() -> Dict[str, Any]:
+    """Partial aggregate for a chunk of a batch"""
+    return {
+        'processed_emails': 0,
+        'total_score': 0,
+        'score_distribution': {'poor': 0, 'fair': 0, 'good': 0, 'excellent': 0},
+        'common_issues': {}
+    }
+
+def _merge_batch_totals(totals: Dict[str, Any], partial: Dict[str, Any]):
+    """Fold a chunk's partial aggregate into the running batch totals"""
+    totals['processed_emails'] += partial['processed_emails']
+    totals['total_score'] += partial['total_score']
+    for bucket, count in partial['score_distribution'].items():
+        totals['score_distribution'][bucket] += count
+    for issue_type, count in partial['common_issues'].items():
+        totals['common_issues'][issue_type] = totals['common_issues'].get(issue_type, 0) + count
+
+def _analyze_chunk(emails: List[Dict[str, Any]], include_rewrite: bool,
+                   suggestion_engine, email_rewriter, local_analyzer):
+    """Score a chunk of emails, returning its results and partial aggregate"""
+    results = []
+    totals = _empty_batch_totals()
+    # The local quality rules score the whole chunk at once
+    quality = local_analyzer.analyze_many([email_data['subject'] for email_data in emails],
+                                          [email_data['body'] for email_data in emails])
+    
+    for row, email_data in enumerate(emails):
+        try:
+            # Analyze email
+            analysis = suggestion_engine.analyze_email(
+                email_data['subject'], 
+                email_data['body']
+            )
+            
+            result = {
+                'id': email_data['id'],
+                'subject': email_data['subject'],
+                'body': email_data['body'][:200] + '...' if len(email_data['body']) > 200 else email_data['body'],
+                'sender_name': email_data['sender_name'],
+                'sender_email': email_data['sender_email'],
+                'company': email_data['company'],
+                'industry': email_data['industry'],
+                'score': analysis['improvement_score'],
+                'word_count': analysis['word_count'],
+                'subject_length': analysis['subject_length'],
+                'suggestions': analysis['suggestions'],
+                'suggestion_count': len(analysis['suggestions']),
+                'priority_issues': [s for s in analysis['suggestions'] if s['priority'] == 'high'],
+                'quality_score': quality.score(row),
+                'quality_verdict': quality.verdict(row)
+            }
+            if result['quality_score'] < QUALITY_FEEDBACK_BELOW:
+                result['quality_breakdown'] = quality.breakdown(row)
+            
+            # AI tone, looked up ahead of time by BatchAnalyzer when requested
+            if 'sentiment' in email_data:
+                result['sentiment'] = email_data['sentiment']
+            
+            # Add rewrite if requested
+            if include_rewrite and analysis['suggestions']:
+                context = {
+                    'company': email_data['company'],
+                    'name': 'recipient',
+                    'industry': email_data['industry']
+                }
+                rewrite_result = email_rewriter.full_rewrite(
+                    email_data['subject'],
+                    email_data['body'],
+                    analysis['suggestions'],
+                    context
+                )
+                result['rewrite'] = rewrite_result
+            
+            results.append(result)
+            totals['total_score'] += analysis['improvement_score']
+            totals['processed_emails'] += 1
+            
+            # Update score distribution
+            score = analysis['improvement_score']
+            if score < 40:
+                totals['score_distribution']['poor'] += 1
+            elif score < 60:
+                totals['score_distribution']['fair'] += 1
+            elif score < 80:
+                totals['score_distribution']['good'] += 1
+            else:
+                totals['score_distribution']['excellent'] += 1
+            
+            # Track common issues
+            for suggestion in analysis['suggestions']:
+                issue_type = suggestion['type']
+                if issue_type in totals['common_issues']:
+                    totals['common_issues'][issue_type] += 1
+                else:
+                    totals['common_issues'][issue_type] = 1
+                    
+        except Exception as e:
+            # Add error result but continue processing
+            results.append({
+                'id': email_data['id'],
+                'subject': email_data['subject'],
+                'error': str(e),
+                'score': 0,
+                'suggestions': [],
+                'suggestion_count': 0
+            })
+            continue
+    
+    return results, totals
+
+def _gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip-encode a byte stream chunk by chunk"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Engines are created once per worker process; their rule lambdas can't be pickled
+_worker_engines = None
+
+def _init_worker():
+    """Process-pool initializer: build the scoring engines once per worker.
+
+    Workers come from a forkserver that has preloaded only this module (and with it
+    the analyzers and keyword lexicons), never from a fork of the multi-threaded server.
+    """
+    global _worker_engines
+    _worker_engines = (EmailSuggestionEngine(), EmailRewriter(), LocalEmailAnalyzer())
+
+def _analyze_chunk_in_worker(emails: List[Dict[str, Any]], include_rewrite: bool):
+    """Process-pool entry point for one chunk"""
+    return _analyze_chunk(emails, include_rewrite, *_worker_engines)
 
 class BatchAnalyzer:
-    def __init__(self, suggestion_engine, email_rewriter):
+    def __init__(self, suggestion_engine, email_rewriter, max_workers: Optional[int] = None,
+                 chunk_size: int = 500, result_store: Optional[BatchResultStore] = None,
+                 sentiment_analyzer=None, local_analyzer: Optional[LocalEmailAnalyzer] = None):
         self.suggestion_engine = suggestion_engine
         self.email_rewriter = email_rewriter
-        self.batch_results = {}  # Store batch results temporarily
+        # Adds the /qualify quality score and verdict to every batch row
+        self.local_analyzer = local_analyzer or LocalEmailAnalyzer()
+        # Optional HuggingFaceAnalyzer or LexiconSentimentAnalyzer for include_sentiment batches
+        self.sentiment_analyzer = sentiment_analyzer
+        # Bounded in memory; older results spill to disk and are reloaded on demand
+        self.batch_results = result_store if result_store is not None else BatchResultStore()
+        # Worker processes for large batches; BATCH_WORKERS=0 or 1 keeps everything in-process
+        if max_workers is None:
+            max_workers = int(os.getenv("BATCH_WORKERS", "0"))
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._executor = None
+        self._executor_lock = threading.Lock()  # Background batch jobs share the pool
         
     def parse_csv_content(self, csv_content: str) -> List[Dict[str, Any]]:
         """Parse CSV content and extract email data"""
-        emails = []
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        return list(self.iter_csv_emails(io.StringIO(csv_content)))
+    
+    def iter_csv_emails(self, lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Yield email data row by row from CSV text lines (a file, or any iterable of lines)"""
+        csv_reader = csv.DictReader(lines)
         
         # Try to detect column names automatically
         fieldnames = csv_reader.fieldnames
@@ -498,17 +674,14 @@ class BatchAnalyzer:
                     'industry': row.get(column_mapping.get('industry', ''), '').strip(),
                     'original_row': row
                 }
-                
-                # Skip rows without subject or body
-                if email_data['subject'] or email_data['body']:
-                    emails.append(email_data)
-                    
             except Exception as e:
                 # Log error but continue processing
                 print(f"Error processing row {i + 1}: {e}")
                 continue
-                
-        return emails
+            
+            # Skip rows without subject or body
+            if email_data['subject'] or email_data['body']:
+                yield email_data
     
     def _detect_columns(self, fieldnames) -> Dict[str, str]:
         """Automatically detect column mappings"""
@@ -541,165 +714,532 @@ class BatchAnalyzer:
         
         return mapping
     
-    def analyze_batch(self, emails: List[Dict[str, Any]], include_rewrite: bool = False) -> Dict[str, Any]:
-        """Analyze a batch of emails"""
-        batch_id = str(uuid.uuid4())
+    def analyze_batch(self, emails: Sequence[Dict[str, Any]], include_rewrite: bool = False,
+                      parallel: Optional[bool] = None, batch_id: Optional[str] = None,
+                      progress_callback: Optional[Callable[[int], None]] = None,
+                      cancel_event: Optional[threading.Event] = None,
+                      include_sentiment: bool = False) -> Dict[str, Any]:
+        """Analyze a batch of emails.
+        
+        With `parallel` (defaults to on when the analyzer has a worker pool and the batch
+        spans more than one chunk), the emails are split into chunks and scored across
+        a process pool. Results come back in the original order and the summary is
+        reduced from per-chunk partial aggregates.
+        
+        `emails` can be a list or a sized lazy source such as CsvEmailSource; it is read
+        chunk by chunk, at most a few chunks ahead of the scored results.
+        
+        With `include_sentiment` (and a sentiment analyzer configured), each chunk's AI
+        tone is fetched in micro-batched requests before scoring and added to its results.
+        
+        `progress_callback` is called with the number of emails done after every chunk.
+        Setting `cancel_event` stops the batch before the next chunk is read; the emails
+        scored so far are kept and the result is marked 'cancelled'.
+        """
+        batch_id = batch_id or str(uuid.uuid4())
+        start_time = datetime.now()
+        
+        if parallel is None:
+            parallel = self.max_workers > 1 and len(emails) > self.chunk_size
+        
         results = []
+        totals = _empty_batch_totals()
+        status = 'completed'
+        source = emails
+        if include_sentiment and self.sentiment_analyzer is not None:
+            source = self._iter_with_sentiment(emails)
+        chunk_iter = self._iter_chunk_results(source, include_rewrite, parallel, cancel_event)
+        try:
+            for chunk_result in chunk_iter:
+                if chunk_result is None:
+                    status = 'cancelled'
+                    break
+                chunk_results, chunk_totals = chunk_result
+                results.extend(chunk_results)
+                _merge_batch_totals(totals, chunk_totals)
+                if progress_callback:
+                    progress_callback(len(results))
+        finally:
+            # Cancels any chunks still waiting in the worker pool
+            chunk_iter.close()
+        
         summary_stats = {
             'total_emails': len(emails),
-            'processed_emails': 0,
+            'processed_emails': totals['processed_emails'],
             'average_score': 0,
-            'score_distribution': {'poor': 0, 'fair': 0, 'good': 0, 'excellent': 0},
-            'common_issues': {},
+            'score_distribution': totals['score_distribution'],
+            'common_issues': totals['common_issues'],
             'processing_time': 0
         }
         
-        start_time = datetime.now()
-        total_score = 0
-        
-        for email_data in emails:
-            try:
-                # Analyze email
-                analysis = self.suggestion_engine.analyze_email(
-                    email_data['subject'], 
-                    email_data['body']
-                )
-                
-                result = {
-                    'id': email_data['id'],
-                    'subject': email_data['subject'],
-                    'body': email_data['body'][:200] + '...' if len(email_data['body']) > 200 else email_data['body'],
-                    'sender_name': email_data['sender_name'],
-                    'sender_email': email_data['sender_email'],
-                    'company': email_data['company'],
-                    'industry': email_data['industry'],
-                    'score': analysis['improvement_score'],
-                    'word_count': analysis['word_count'],
-                    'subject_length': analysis['subject_length'],
-                    'suggestions': analysis['suggestions'],
-                    'suggestion_count': len(analysis['suggestions']),
-                    'priority_issues': [s for s in analysis['suggestions'] if s['priority'] == 'high']
-                }
-                
-                # Add rewrite if requested
-                if include_rewrite and analysis['suggestions']:
-                    context = {
-                        'company': email_data['company'],
-                        'name': 'recipient',
-                        'industry': email_data['industry']
-                    }
-                    rewrite_result = self.email_rewriter.full_rewrite(
-                        email_data['subject'],
-                        email_data['body'],
-                        analysis['suggestions'],
-                        context
-                    )
-                    result['rewrite'] = rewrite_result
-                
-                results.append(result)
-                total_score += analysis['improvement_score']
-                summary_stats['processed_emails'] += 1
-                
-                # Update score distribution
-                score = analysis['improvement_score']
-                if score < 40:
-                    summary_stats['score_distribution']['poor'] += 1
-                elif score < 60:
-                    summary_stats['score_distribution']['fair'] += 1
-                elif score < 80:
-                    summary_stats['score_distribution']['good'] += 1
-                else:
-                    summary_stats['score_distribution']['excellent'] += 1
-                
-                # Track common issues
-                for suggestion in analysis['suggestions']:
-                    issue_type = suggestion['type']
-                    if issue_type in summary_stats['common_issues']:
-                        summary_stats['common_issues'][issue_type] += 1
-                    else:
-                        summary_stats['common_issues'][issue_type] = 1
-                        
-            except Exception as e:
-                # Add error result but continue processing
-                results.append({
-                    'id': email_data['id'],
-                    'subject': email_data['subject'],
-                    'error': str(e),
-                    'score': 0,
-                    'suggestions': [],
-                    'suggestion_count': 0
-                })
-                continue
-        
         # Calculate final stats
         if summary_stats['processed_emails'] > 0:
-            summary_stats['average_score'] = round(total_score / summary_stats['processed_emails'], 1)
+            summary_stats['average_score'] = round(totals['total_score'] / summary_stats['processed_emails'], 1)
         
         summary_stats['processing_time'] = (datetime.now() - start_time).total_seconds()
         
         batch_result = {
             'batch_id': batch_id,
+            'status': status,
             'timestamp': start_time.isoformat(),
             'summary': summary_stats,
             'results': results,
             'column_mapping_detected': True
         }
         
-        # Store temporarily (in production, save to database)
-        self.batch_results[batch_id] = batch_result
+        self.batch_results.put(batch_id, batch_result)
         
         return batch_result
     
+    def _iter_with_sentiment(self, emails: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield emails with a 'sentiment' field, fetched one chunk at a time"""
+        for chunk in self._iter_chunks(emails):
+            texts = [email_data['subject'] + " " + email_data['body'] for email_data in chunk]
+            for email_data, sentiment in zip(chunk, self.sentiment_analyzer.get_sentiment_many(texts)):
+                yield {**email_data, 'sentiment': sentiment}
+    
+    def _iter_chunk_results(self, emails: Iterable[Dict[str, Any]], include_rewrite: bool, parallel: bool,
+                            cancel_event: Optional[threading.Event] = None):
+        """Yield (results, partial totals) per chunk, in the original order.
+        
+        `cancel_event` is checked before each chunk is read; once it is set, None is
+        yielded and nothing more is read. In parallel mode, chunks the pool had already
+        finished are yielded before the None, in order. At most `max_workers * 2`
+        chunks are in the pool at once, and the next chunk is only read when a result
+        is yielded, so a lazy source is never read far ahead of the scored results.
+        """
+        def cancelled():
+            return cancel_event is not None and cancel_event.is_set()
+        
+        chunks = self._iter_chunks(emails)
+        if not parallel:
+            while not cancelled():
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                yield _analyze_chunk(chunk, include_rewrite, self.suggestion_engine, self.email_rewriter,
+                                     self.local_analyzer)
+            yield None
+            return
+        
+        executor = self._get_executor()
+        window = max(1, self.max_workers * 2)
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < window and not cancelled():
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    # Only ship the fields the scorer needs; 'original_row' can be large
+                    chunk = [{key: email_data[key] for key in _WORKER_FIELDS if key in email_data}
+                             for email_data in chunk]
+                    pending.append(executor.submit(_analyze_chunk_in_worker, chunk, include_rewrite))
+                if cancelled():
+                    # Keep the chunks that were already scored, as long as the order holds
+                    while pending and pending[0].done() and not pending[0].cancelled():
+                        yield pending.popleft().result()
+                    yield None
+                    return
+                if not pending:
+                    return
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    def _iter_chunks(self, emails: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """Split emails into lists of chunk_size without needing the whole batch in memory"""
+        emails = iter(emails)
+        while True:
+            chunk = list(itertools.islice(emails, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Create the worker pool on first use and reuse it for later batches.
+        
+        The server has background threads (log writer, cache refresher, job queue, HTTP
+        pools) by the time a batch runs, and a forked child can inherit a lock one of
+        them held and deadlock. Workers are started from a forkserver instead, which is
+        single-threaded and has only imported this module. Like spawned processes,
+        workers also re-import the launching script, so start the server with
+        `uvicorn main_supabase:app` rather than `python main_supabase.py`.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                                     initializer=_init_worker)
+            return self._executor
+    
+    def shutdown(self):
+        """Stop the worker pool, if one was started"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+    
+    # Columns of the CSV report
+    CSV_REPORT_FIELDS = [
+        'ID', 'Subject', 'Body_Preview', 'Sender_Name', 'Sender_Email', 
+        'Company', 'Industry', 'Score', 'Word_Count', 'Subject_Length',
+        'Suggestion_Count', 'Priority_Issues', 'Top_Issue', 'Top_Suggestion',
+        'Quality_Score', 'Quality_Verdict'
+    ]
+    
     def generate_csv_report(self, batch_result: Dict[str, Any]) -> str:
         """Generate CSV report from batch analysis"""
-        output = io.StringIO()
-        
-        # Define CSV columns
-        fieldnames = [
-            'ID', 'Subject', 'Body_Preview', 'Sender_Name', 'Sender_Email', 
-            'Company', 'Industry', 'Score', 'Word_Count', 'Subject_Length',
-            'Suggestion_Count', 'Priority_Issues', 'Top_Issue', 'Top_Suggestion'
-        ]
+        return b''.join(self.iter_csv_report(batch_result)).decode('utf-8')
+    
+    def iter_csv_report(self, batch_result: Dict[str, Any], rows_per_chunk: int = 1000,
+                        compress: bool = False) -> Iterator[bytes]:
+        """Yield the CSV report as UTF-8 bytes, `rows_per_chunk` rows at a time.
         
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        Only one chunk is held in memory at once, so the first bytes go out right away
+        whatever the batch size. With `compress`, the stream is gzip-encoded on the fly.
+        """
+        chunks = self._iter_csv_report_chunks(batch_result, rows_per_chunk)
+        if compress:
+            chunks = _gzip_stream(chunks)
+        return chunks
+    
+    def _iter_csv_report_chunks(self, batch_result: Dict[str, Any], rows_per_chunk: int) -> Iterator[bytes]:
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=self.CSV_REPORT_FIELDS)
         writer.writeheader()
         
-        for result in batch_result['results']:
-            if 'error' in result:
-                row = {
-                    'ID': result['id'],
-                    'Subject': result['subject'],
-                    'Score': 0,
-                    'Top_Issue': f"ERROR: {result['error']}"
-                }
-            else:
-                top_suggestion = result['suggestions'][0] if result['suggestions'] else None
-                row = {
-                    'ID': result['id'],
-                    'Subject': result['subject'],
-                    'Body_Preview': result['body'],
-                    'Sender_Name': result['sender_name'],
-                    'Sender_Email': result['sender_email'],
-                    'Company': result['company'],
-                    'Industry': result['industry'],
-                    'Score': result['score'],
-                    'Word_Count': result['word_count'],
-                    'Subject_Length': result['subject_length'],
-                    'Suggestion_Count': result['suggestion_count'],
-                    'Priority_Issues': len(result['priority_issues']),
-                    'Top_Issue': top_suggestion['type'] if top_suggestion else 'None',
-                    'Top_Suggestion': top_suggestion['message'] if top_suggestion else 'No issues found'
-                }
-            
-            writer.writerow(row)
+        for i, result in enumerate(batch_result['results'], 1):
+            writer.writerow(self._csv_report_row(result))
+            if i % rows_per_chunk == 0:
+                yield output.getvalue().encode('utf-8')
+                output.seek(0)
+                output.truncate(0)
+        
+        if output.tell():
+            yield output.getvalue().encode('utf-8')
+    
+    def _csv_report_row(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Map one analyzed email to a CSV report row"""
+        if 'error' in result:
+            return {
+                'ID': result['id'],
+                'Subject': result['subject'],
+                'Score': 0,
+                'Top_Issue': f"ERROR: {result['error']}"
+            }
         
-        return output.getvalue()
+        top_suggestion = result['suggestions'][0] if result['suggestions'] else None
+        return {
+            'ID': result['id'],
+            'Subject': result['subject'],
+            'Body_Preview': result['body'],
+            'Sender_Name': result['sender_name'],
+            'Sender_Email': result['sender_email'],
+            'Company': result['company'],
+            'Industry': result['industry'],
+            'Score': result['score'],
+            'Word_Count': result['word_count'],
+            'Subject_Length': result['subject_length'],
+            'Suggestion_Count': result['suggestion_count'],
+            'Priority_Issues': len(result['priority_issues']),
+            'Top_Issue': top_suggestion['type'] if top_suggestion else 'None',
+            'Top_Suggestion': top_suggestion['message'] if top_suggestion else 'No issues found',
+            'Quality_Score': result.get('quality_score', ''),
+            'Quality_Verdict': result.get('quality_verdict', '')
+        }
     
     def get_batch_result(self, batch_id: str):
         """Retrieve batch result by ID"""
         return self.batch_results.get(batch_id)
 
 
+class CsvEmailSource:
+    """Sized, re-iterable view of the emails in a CSV file on disk, parsed row by row"""
+    
+    def __init__(self, batch_analyzer: BatchAnalyzer, path: str):
+        self.batch_analyzer = batch_analyzer
+        self.path = path
+        self.email_count = None
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, 'r', encoding='utf-8', newline='') as csv_file:
+            yield from self.batch_analyzer.iter_csv_emails(csv_file)
+    
+    def __len__(self) -> int:
+        if self.email_count is None:
+            self.scan()
+        return self.email_count
+    
+    def scan(self, preview_size: int = 3) -> List[Dict[str, Any]]:
+        """Count the emails in one streaming pass and return the first few as a preview"""
+        preview = []
+        count = 0
+        for email_data in self:
+            if count < preview_size:
+                preview.append(email_data)
+            count += 1
+        self.email_count = count
+        return preview
+
+
+class BatchUploadStore:
+    """Keep uploaded CSV files on disk until they are analyzed, addressed by upload ID.
+    
+    A batch pins the upload it reads with pin() and lets go with release(); the file is
+    deleted once no batch needs it. Pinned uploads never expire, however long their job
+    waits in the queue.
+    """
+    
+    def __init__(self, upload_dir: Optional[str] = None, max_age_seconds: Optional[int] = None):
+        upload_dir = upload_dir or os.getenv("BATCH_UPLOAD_DIR")
+        self._owns_dir = not upload_dir
+        self.upload_dir = upload_dir or tempfile.mkdtemp(prefix="batch-uploads-")
+        os.makedirs(self.upload_dir, exist_ok=True)
+        if max_age_seconds is None:
+            max_age_seconds = int(os.getenv("BATCH_UPLOAD_TTL", "3600"))
+        self.max_age_seconds = max_age_seconds
+        self.uploads = {}
+        self._lock = threading.Lock()
+    
+    def create(self, filename: str) -> Dict[str, Any]:
+        """Register a new upload; the caller writes the file to the returned 'path'"""
+        self.expire_old()
+        upload_id = str(uuid.uuid4())
+        upload = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'path': os.path.join(self.upload_dir, f"{upload_id}.csv"),
+            'created_at': time.time(),
+            'emails': None,  # CsvEmailSource, attached once the file is written
+            'pins': 0  # Batches still reading the file
+        }
+        with self._lock:
+            self.uploads[upload_id] = upload
+        return upload
+    
+    def get(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Get an upload by ID"""
+        with self._lock:
+            return self.uploads.get(upload_id)
+    
+    def pin(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Claim a fully written upload for a batch; None if it is unknown, expired or still being written"""
+        with self._lock:
+            upload = self.uploads.get(upload_id)
+            if upload is None or upload['emails'] is None:
+                return None
+            upload['pins'] += 1
+            return upload
+    
+    def release(self, upload_id: str, delete: bool = True):
+        """Drop a pin taken with pin(). With `delete`, the upload is deleted once the last
+        batch using it is done; otherwise it is kept until it expires, e.g. for a retry."""
+        with self._lock:
+            upload = self.uploads.get(upload_id)
+            if upload is None:
+                return
+            upload['pins'] -= 1
+            if upload['pins'] > 0 or not delete:
+                return
+            del self.uploads[upload_id]
+        self._remove_file(upload)
+    
+    def delete(self, upload_id: str):
+        """Forget an upload and remove its file"""
+        with self._lock:
+            upload = self.uploads.pop(upload_id, None)
+        if upload:
+            self._remove_file(upload)
+    
+    def expire_old(self):
+        """Remove unpinned uploads older than max_age_seconds"""
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock:
+            expired = [upload_id for upload_id, upload in self.uploads.items()
+                       if upload['created_at'] < cutoff and not upload['pins']]
+            expired = [self.uploads.pop(upload_id) for upload_id in expired]
+        for upload in expired:
+            self._remove_file(upload)
+    
+    def _remove_file(self, upload: Dict[str, Any]):
+        try:
+            os.remove(upload['path'])
+        except OSError:
+            pass
+    
+    def shutdown(self):
+        """Remove all stored uploads"""
+        for upload_id in list(self.uploads):
+            self.delete(upload_id)
+        if self._owns_dir:
+            shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+
+class BatchQueueFullError(Exception):
+    """Raised when a batch job is submitted while the job queue is at capacity"""
+
+
+class BatchJobQueue:
+    """Run batch analyses in the background with progress tracking and cancellation.
+    
+    At most `max_running` jobs are scored at once and at most `max_queued` more may wait
+    behind them; further submissions are rejected, so large uploads can't crowd out the
+    interactive endpoints.
+    """
+    ACTIVE_STATUSES = ('queued', 'running')
+    
+    def __init__(self, batch_analyzer: BatchAnalyzer, max_running: Optional[int] = None,
+                 max_queued: Optional[int] = None, max_finished: int = 100):
+        if max_running is None:
+            max_running = int(os.getenv("BATCH_MAX_JOBS", "1"))
+        if max_queued is None:
+            max_queued = int(os.getenv("BATCH_MAX_QUEUED", "4"))
+        self.batch_analyzer = batch_analyzer
+        self.max_running = max(1, max_running)
+        self.max_queued = max(0, max_queued)
+        self.max_finished = max_finished  # Job records kept after they finish
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_running, thread_name_prefix="batch-job")
+    
+    def submit(self, emails: List[Dict[str, Any]], include_rewrite: bool = False,
+               on_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+               include_sentiment: bool = False,
+               on_finish: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Queue a batch and return its job record.
+        
+        `on_complete` runs with the result once the batch finishes in full. `on_finish`
+        runs whenever the job ends: completed, failed, or cancelled, even before it started.
+        """
+        with self._lock:
+            active = sum(1 for job in self.jobs.values() if job['status'] in self.ACTIVE_STATUSES)
+            if active >= self.max_running + self.max_queued:
+                raise BatchQueueFullError(f"Batch queue is full ({active} jobs running or queued)")
+            
+            batch_id = str(uuid.uuid4())
+            self.jobs[batch_id] = {
+                'batch_id': batch_id,
+                'status': 'queued',
+                'total_emails': len(emails),
+                'processed_emails': 0,
+                'submitted_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+                '_cancel': threading.Event(),
+                '_started': None,
+                '_finished': None
+            }
+            self._prune_finished()
+        
+        self._executor.submit(self._run_job, batch_id, emails, include_rewrite, on_complete, include_sentiment,
+                              on_finish)
+        return self.get_job(batch_id)
+    
+    def _run_job(self, batch_id: str, emails: List[Dict[str, Any]], include_rewrite: bool,
+                 on_complete: Optional[Callable[[Dict[str, Any]], None]], include_sentiment: bool,
+                 on_finish: Optional[Callable[[], None]] = None):
+        """Worker thread body for one job"""
+        try:
+            self._score_job(batch_id, emails, include_rewrite, on_complete, include_sentiment)
+        finally:
+            if on_finish:
+                on_finish()
+    
+    def _score_job(self, batch_id: str, emails: List[Dict[str, Any]], include_rewrite: bool,
+                   on_complete: Optional[Callable[[Dict[str, Any]], None]], include_sentiment: bool):
+        with self._lock:
+            job = self.jobs.get(batch_id)
+            if job is None:
+                return  # Cancelled while queued and already pruned
+            if job['_cancel'].is_set():
+                job['status'] = 'cancelled'
+                job['finished_at'] = job['finished_at'] or datetime.now().isoformat()
+                return
+            job['status'] = 'running'
+            job['started_at'] = datetime.now().isoformat()
+            job['_started'] = time.monotonic()
+        
+        def on_progress(processed: int):
+            job['processed_emails'] = processed
+        
+        try:
+            batch_result = self.batch_analyzer.analyze_batch(
+                emails, include_rewrite,
+                batch_id=batch_id,
+                progress_callback=on_progress,
+                cancel_event=job['_cancel'],
+                include_sentiment=include_sentiment
+            )
+            if batch_result['status'] == 'completed' and on_complete:
+                on_complete(batch_result)
+            status, error = batch_result['status'], None
+        except Exception as e:
+            print(f"WARNING: Batch job {batch_id} failed: {e}")
+            status, error = 'failed', str(e)
+        
+        with self._lock:
+            job['status'] = status
+            job['error'] = error
+            job['finished_at'] = datetime.now().isoformat()
+            job['_finished'] = time.monotonic()
+    
+    def cancel(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Ask a job to stop; a running job keeps the emails it has already scored"""
+        with self._lock:
+            job = self.jobs.get(batch_id)
+            if job is None:
+                return None
+            if job['status'] in self.ACTIVE_STATUSES:
+                job['_cancel'].set()
+                if job['status'] == 'queued':
+                    job['status'] = 'cancelled'
+                    job['finished_at'] = datetime.now().isoformat()
+        return self.get_job(batch_id)
+    
+    def get_job(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job's status with progress, rate (emails/second) and ETA"""
+        with self._lock:
+            job = self.jobs.get(batch_id)
+            if job is None:
+                return None
+            
+            snapshot = {key: value for key, value in job.items() if not key.startswith('_')}
+            elapsed = 0.0
+            if job['_started'] is not None:
+                elapsed = (job['_finished'] or time.monotonic()) - job['_started']
+        
+        processed = snapshot['processed_emails']
+        total = snapshot['total_emails']
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        
+        snapshot['progress'] = round(processed / total * 100, 1) if total else 100.0
+        snapshot['elapsed_seconds'] = round(elapsed, 1)
+        snapshot['emails_per_second'] = round(rate, 1)
+        snapshot['eta_seconds'] = None
+        if snapshot['status'] == 'running' and rate > 0:
+            snapshot['eta_seconds'] = round((total - processed) / rate, 1)
+        
+        return snapshot
+    
+    def _prune_finished(self):
+        """Forget the oldest finished jobs beyond `max_finished` (caller holds the lock)"""
+        finished = [batch_id for batch_id, job in self.jobs.items() if job['status'] not in self.ACTIVE_STATUSES]
+        for batch_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[batch_id]
+    
+    def shutdown(self):
+        """Cancel outstanding jobs and wait for the running ones to stop"""
+        with self._lock:
+            for job in self.jobs.values():
+                if job['status'] in self.ACTIVE_STATUSES:
+                    job['_cancel'].set()
+        self._executor.shutdown(wait=True)
+
+
 class CampaignTracker:
     def __init__(self):
         self.campaigns = {}
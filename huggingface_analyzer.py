@@ -1,84 +1,607 @@
 # huggingface_analyzer.py - Hugging Face AI integration for email analysis
 
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import os
 import re
-from typing import Dict
+import threading
+from typing import Dict, List, Optional, Tuple
 import time
+from collections import deque
+
+from analysis_cache import AnalysisCache
+from circuit_breaker import HALF_OPEN, CircuitBreaker
+from local_analyzer import LocalEmailAnalyzer
+
+try:
+    import httpx
+except ImportError:
+    httpx = None  # Async calls fall back to the blocking client on a worker thread
+
+DEFAULT_BASE_URL = "https://api-inference.huggingface.co/models/"
+# Sentiment models with POSITIVE/NEGATIVE labels, raced against the primary when it is slow
+DEFAULT_FALLBACK_MODELS = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+# Primary latencies needed before the hedge delay follows the observed percentile
+HEDGE_MIN_SAMPLES = 20
+# Sentiment sources reported by analyze_email_with_ai_async, besides fallback model names
+HUGGINGFACE_SOURCE = "huggingface"
+LEXICON_SOURCE = "lexicon"
+
+
+def apply_tone_adjustment(base_result: Dict, sentiment_data: Optional[Dict], source: str = "AI") -> Dict:
+    """Adjust the Professionalism score for sentiment and recalculate the overall score"""
+    if sentiment_data:
+        # Adjust scores based on sentiment
+        sentiment_score = sentiment_data.get('sentiment_score', 0)
+        
+        # Enhance professionalism score based on sentiment
+        for category in base_result["breakdown"]:
+            if category["name"] == "Professionalism":
+                if sentiment_score > 0.5:  # Positive sentiment
+                    category["score"] = min(10, category["score"] + 2)
+                    category["feedback"] += f" {source} detected positive tone (confidence: {sentiment_score:.2f})."
+                elif sentiment_score < -0.3:  # Negative sentiment
+                    category["score"] = max(0, category["score"] - 3)
+                    category["feedback"] += f" {source} detected negative tone (confidence: {abs(sentiment_score):.2f})."
+                else:
+                    category["feedback"] += f" {source} detected neutral tone."
+    
+    # Recalculate overall score
+    base_result["overallScore"] = sum(cat["score"] for cat in base_result["breakdown"])
+    return base_result
+
+
+class SentimentBatcher:
+    """Collect sentiment lookups arriving close together into one upstream call.
+    
+    Texts submitted within `max_wait` seconds of the first pending one (or until
+    `max_batch_size` are pending) are sent as a single list input; each caller gets
+    back the score for its own text.
+    """
+    
+    def __init__(self, fetch_many, max_batch_size: int = 32, max_wait: float = 0.01):
+        self.fetch_many = fetch_many  # async callable: list of texts -> list of results
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = []  # (text, future)
+        self._flush_handle = None
+        self._sending = set()  # Strong references, so the loop can't drop a send mid-flight
+    
+    async def submit(self, text: str) -> Optional[Dict]:
+        """Queue one text and wait for its sentiment"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        """Send everything pending as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+    
+    async def aclose(self):
+        """Send whatever is still pending and wait for every batch in flight"""
+        self._flush()
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+    
+    async def _send(self, batch):
+        try:
+            results = await self.fetch_many([text for text, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            print(f"Sentiment batch failed: {e}")
+            results = [None] * len(batch)
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
 
 class HuggingFaceAnalyzer:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: Optional[str] = None, pool_connections: Optional[int] = None,
+                 pool_maxsize: Optional[int] = None, max_retries: Optional[int] = None, cache=None,
+                 batch_size: Optional[int] = None, batch_wait_ms: Optional[int] = None,
+                 latency_budget_ms: Optional[int] = None, fallback_sentiment=None,
+                 fallback_models: Optional[List[str]] = None, hedge_percentile: Optional[float] = None,
+                 hedge_delay_ms: Optional[int] = None):
         self.api_key = api_key
-        self.base_url = "https://api-inference.huggingface.co/models/"
+        # Optional AnalysisCache shared by the local scores and the sentiment lookups
+        self.cache = cache
+        self.local_analyzer = LocalEmailAnalyzer(cache=cache)
+        # Overridable so tests can point at a local stand-in server
+        base_url = base_url or os.getenv("HF_BASE_URL", DEFAULT_BASE_URL)
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
         
         # Using reliable sentiment analysis model (always available)
         self.sentiment_model = "distilbert-base-uncased-finetuned-sst-2-english"
         # This is a very reliable model that's always available
         
+        # Hedging: if the primary hasn't answered after the hedge delay (its recent latency at
+        # hedge_percentile, hedge_delay_ms until enough calls were seen), the next fallback model
+        # is called in parallel and the first good answer wins. An empty list disables hedging.
+        if fallback_models is None:
+            fallback_models = [m.strip() for m in os.getenv("HF_FALLBACK_MODELS", DEFAULT_FALLBACK_MODELS).split(",")]
+        self.fallback_models = [m for m in fallback_models if m and m != self.sentiment_model]
+        if hedge_percentile is None:
+            hedge_percentile = float(os.getenv("HF_HEDGE_PERCENTILE", "95"))
+        if hedge_delay_ms is None:
+            hedge_delay_ms = int(os.getenv("HF_HEDGE_DELAY_MS", "1000"))
+        self.hedge_percentile = min(100.0, max(0.0, hedge_percentile))
+        self.hedge_delay_default = hedge_delay_ms / 1000
+        self._primary_latencies = deque(maxlen=200)
+        
+        # One keep-alive session per analyzer, so requests reuse pooled TCP/TLS connections
+        if pool_connections is None:
+            pool_connections = int(os.getenv("HF_POOL_CONNECTIONS", "4"))
+        if pool_maxsize is None:
+            pool_maxsize = int(os.getenv("HF_POOL_MAXSIZE", "20"))
+        if max_retries is None:
+            max_retries = int(os.getenv("HF_MAX_RETRIES", "2"))
+        
+        # Retry connection failures and gateway errors; 503 means "model loading" and is
+        # handled by the caller. Inference calls are idempotent, so POST is safe to retry.
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.2,
+            status_forcelist=(502, 504),
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+        
+        # Async counterpart for the event loop, created on first use
+        self._pool_maxsize = pool_maxsize
+        self._max_retries = max_retries
+        self._async_client = None
+        
+        # Single-flight: concurrent lookups for the same text share one upstream call
+        self._inflight = {}  # text hash -> {'done': threading.Event, 'result': ...}
+        self._inflight_async = {}  # text hash -> asyncio.Task
+        self._inflight_lock = threading.Lock()
+        self.sentiment_stats = {'upstream_calls': 0, 'coalesced_calls': 0, 'http_requests': 0,
+                                'hedged_requests': 0, 'hedge_wins': 0}
+        
+        # Micro-batching: lookups within batch_wait_ms share one list-input request (1 disables)
+        if batch_size is None:
+            batch_size = int(os.getenv("HF_BATCH_SIZE", "32"))
+        if batch_wait_ms is None:
+            batch_wait_ms = int(os.getenv("HF_BATCH_WAIT_MS", "10"))
+        self.batch_size = max(1, batch_size)
+        self.batch_wait_ms = batch_wait_ms
+        self._batcher = None  # Created on first use, inside the event loop
+        
+        # Stop calling the API while it is failing or slow; analyze_with_ai goes local meanwhile
+        self.breaker = CircuitBreaker("hf")
+        # How long the async path waits for sentiment before returning the local result alone
+        if latency_budget_ms is None:
+            latency_budget_ms = int(os.getenv("HF_LATENCY_BUDGET_MS", "2000"))
+        self.latency_budget = latency_budget_ms / 1000
+        # Optional offline scorer (LexiconSentimentAnalyzer) used whenever the API gives no answer
+        self.fallback_sentiment = fallback_sentiment
+    
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+    
+    async def aclose(self):
+        """Close pooled connections, including the async client's"""
+        if self._batcher is not None:
+            await self._batcher.aclose()
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        
     def analyze_email_with_ai(self, subject: str, body: str) -> Dict:
         """Use Hugging Face for sentiment analysis + local rules for structure"""
         
         # Get sentiment analysis from Hugging Face
-        sentiment_data = self._get_sentiment_analysis(subject + " " + body)
+        text = subject + " " + body
+        sentiment_data, source = self._fallback_sentiment(text, self._get_sentiment_analysis(text))
         
         # Use our local analyzer for the structured analysis
-        from local_analyzer import LocalEmailAnalyzer
-        local_analyzer = LocalEmailAnalyzer()
-        base_result = local_analyzer.analyze_email(subject, body)
-        
-        # Enhance with AI sentiment insights
-        if sentiment_data:
-            # Adjust scores based on sentiment
-            sentiment_score = sentiment_data.get('sentiment_score', 0)
-            
-            # Enhance professionalism score based on sentiment
-            for category in base_result["breakdown"]:
-                if category["name"] == "Professionalism":
-                    if sentiment_score > 0.5:  # Positive sentiment
-                        category["score"] = min(10, category["score"] + 2)
-                        category["feedback"] += f" AI detected positive tone (confidence: {sentiment_score:.2f})."
-                    elif sentiment_score < -0.3:  # Negative sentiment
-                        category["score"] = max(0, category["score"] - 3)
-                        category["feedback"] += f" AI detected negative tone (confidence: {abs(sentiment_score):.2f})."
-                    else:
-                        category["feedback"] += " AI detected neutral tone."
-        
-        # Recalculate overall score
-        base_result["overallScore"] = sum(cat["score"] for cat in base_result["breakdown"])
-        base_result["verdict"] = self._get_verdict(base_result["overallScore"]) + " (AI Enhanced)"
+        base_result = self.local_analyzer.analyze_email(subject, body)
+        
+        return self._apply_sentiment(base_result, sentiment_data, source)
+    
+    async def analyze_email_with_ai_async(self, subject: str, body: str) -> Tuple[Dict, Optional[str]]:
+        """Non-blocking analyze_email_with_ai: local rules are scored while the sentiment call is in flight.
+        
+        Returns (result, sentiment source); see _fallback_sentiment for the sources.
+        """
+        deadline = time.monotonic() + self.latency_budget
+        text = subject + " " + body
+        sentiment_task = asyncio.ensure_future(self._get_sentiment_analysis_async(text))
+        await asyncio.sleep(0)  # Let the request go out before scoring locally
+        
+        try:
+            base_result = self.local_analyzer.analyze_email(subject, body)
+        except BaseException:
+            sentiment_task.cancel()
+            raise
+        
+        try:
+            # Shielded: if the budget runs out the lookup still finishes and fills the cache
+            sentiment_data = await asyncio.wait_for(asyncio.shield(sentiment_task), max(0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            print(f"INFO: Sentiment missed the {self.latency_budget:.1f}s latency budget, using local result")
+            sentiment_data = None
+        
+        sentiment_data, source = self._fallback_sentiment(text, sentiment_data)
+        return self._apply_sentiment(base_result, sentiment_data, source), source
+    
+    @staticmethod
+    def is_ai_source(source: Optional[str]) -> bool:
+        """Whether the sentiment came from a Hugging Face model (the primary or a fallback)"""
+        return source not in (None, LEXICON_SOURCE)
+    
+    def _apply_sentiment(self, base_result: Dict, sentiment_data: Optional[Dict], source: Optional[str]) -> Dict:
+        """Merge sentiment insights into the local analysis result"""
+        if self.is_ai_source(source):
+            apply_tone_adjustment(base_result, sentiment_data, "AI")
+            suffix = " (AI Enhanced)"
+        else:
+            apply_tone_adjustment(base_result, sentiment_data, "Tone check")
+            suffix = " (Local Analysis)"
+        base_result["verdict"] = self._get_verdict(base_result["overallScore"]) + suffix
         
         return base_result
     
+    def _fallback_sentiment(self, text: str, sentiment_data: Optional[Dict]):
+        """Use the offline scorer when Hugging Face gave no answer; returns (data, source).
+        
+        The source is 'huggingface' for the primary model, the model's name for a hedged
+        fallback model, 'lexicon' for the offline scorer, or None if there is no sentiment.
+        """
+        if sentiment_data is not None:
+            return sentiment_data, sentiment_data.get('model', HUGGINGFACE_SOURCE)
+        if self.fallback_sentiment is not None:
+            return self.fallback_sentiment.analyze(text), LEXICON_SOURCE
+        return None, None
+    
     def _get_sentiment_analysis(self, text: str) -> Dict:
-        """Get sentiment analysis from Hugging Face"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        """Get sentiment analysis from Hugging Face, or from the cache"""
+        cache_key = self._sentiment_cache_key(text)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        sentiment_data = self._fetch_sentiment_coalesced(text)
+        if cache_key and sentiment_data is not None:
+            self.cache.set(cache_key, sentiment_data)
+        return sentiment_data
+    
+    async def _get_sentiment_analysis_async(self, text: str) -> Dict:
+        """Get sentiment analysis from Hugging Face or the cache, without blocking the event loop"""
+        cache_key = self._sentiment_cache_key(text)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        payload = {"inputs": text}
+        sentiment_data = await self._fetch_sentiment_coalesced_async(text)
+        # The key is the primary model's, so a hedged fallback model's answer isn't stored under it
+        if cache_key and sentiment_data is not None and 'model' not in sentiment_data:
+            self.cache.set(cache_key, sentiment_data)
+        return sentiment_data
+    
+    def _sentiment_cache_key(self, text: str) -> Optional[str]:
+        """Cache key for the primary model's sentiment of `text`"""
+        if self.cache is None:
+            return None
+        return self.cache.make_key('sentiment', self.sentiment_model, text)
+    
+    def _fetch_sentiment_coalesced(self, text: str) -> Dict:
+        """_fetch_sentiment, sharing one upstream call between threads asking for the same text"""
+        key = AnalysisCache.make_key(self.sentiment_model, text)
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = {'done': threading.Event(), 'result': None}
+                self._inflight[key] = flight
+                self.sentiment_stats['upstream_calls'] += 1
+            else:
+                self.sentiment_stats['coalesced_calls'] += 1
+        
+        if not leader:
+            flight['done'].wait()
+            return dict(flight['result']) if flight['result'] else None
         
         try:
-            response = requests.post(
-                f"{self.base_url}{self.sentiment_model}",
-                headers=headers,
-                json=payload,
+            flight['result'] = self._fetch_sentiment(text)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            flight['done'].set()
+        return flight['result']
+    
+    async def _fetch_sentiment_coalesced_async(self, text: str) -> Dict:
+        """_fetch_sentiment_async, sharing one upstream call between concurrent requests for the same text"""
+        key = AnalysisCache.make_key(self.sentiment_model, text)
+        task = self._inflight_async.get(key)
+        if task is None:
+            batcher = self._get_batcher()
+            fetch = batcher.submit if batcher else self._fetch_sentiment_async
+            task = asyncio.ensure_future(fetch(text))
+            self._inflight_async[key] = task
+            task.add_done_callback(lambda done: self._inflight_async.pop(key, None))
+            self.sentiment_stats['upstream_calls'] += 1
+        else:
+            self.sentiment_stats['coalesced_calls'] += 1
+        
+        # Shielded so one caller giving up doesn't cancel the call for the others
+        result = await asyncio.shield(task)
+        return dict(result) if result else None
+    
+    def get_sentiment_many(self, texts: List[str]) -> List[Optional[Dict]]:
+        """Sentiment for many texts (e.g. a CSV batch), sent batch_size texts per request.
+        
+        Cached texts are skipped and duplicates are looked up once. Texts the API gave
+        no answer for are scored by the fallback scorer, if one is set.
+        """
+        results = [None] * len(texts)
+        missing = {}  # text -> positions waiting for it
+        for i, text in enumerate(texts):
+            cache_key = self._sentiment_cache_key(text)
+            cached = self.cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.setdefault(text, []).append(i)
+        
+        unique_texts = list(missing)
+        for start in range(0, len(unique_texts), self.batch_size):
+            group = unique_texts[start:start + self.batch_size]
+            for text, sentiment_data in zip(group, self._fetch_sentiment_batch(group)):
+                cache_key = self._sentiment_cache_key(text)
+                if cache_key and sentiment_data is not None:
+                    self.cache.set(cache_key, sentiment_data)
+                if sentiment_data is None and self.fallback_sentiment is not None:
+                    sentiment_data = self.fallback_sentiment.analyze(text)
+                for i in missing[text]:
+                    results[i] = dict(sentiment_data) if sentiment_data else None
+        
+        return results
+    
+    def _get_batcher(self) -> Optional[SentimentBatcher]:
+        if self.batch_size <= 1:
+            return None
+        if self._batcher is None:
+            self._batcher = SentimentBatcher(self._fetch_sentiment_batch_async, self.batch_size, self.batch_wait_ms / 1000)
+        return self._batcher
+    
+    def _fetch_sentiment_batch(self, texts: List[str]) -> List[Optional[Dict]]:
+        """Call the Hugging Face sentiment model once for a list of texts"""
+        response = self._post_sentiment(texts)
+        if response is None:
+            return [None] * len(texts)
+        return self._handle_sentiment_batch_response(response, len(texts))
+    
+    async def _fetch_sentiment_batch_async(self, texts: List[str]) -> List[Optional[Dict]]:
+        """Call the Hugging Face sentiment model once for a list of texts, without blocking"""
+        response, model = await self._post_sentiment_hedged_async(texts)
+        if response is None:
+            return [None] * len(texts)
+        return [self._tag_model(result, model)
+                for result in self._handle_sentiment_batch_response(response, len(texts))]
+    
+    def _handle_sentiment_batch_response(self, response, count: int) -> List[Optional[Dict]]:
+        """Split a list-input response into one sentiment result per input"""
+        if response.status_code != 200:
+            return [self._handle_sentiment_response(response)] * count
+        
+        try:
+            result = response.json()
+        except ValueError as e:
+            print(f"Error processing sentiment: {e}")
+            return [None] * count
+        if not isinstance(result, list) or len(result) != count:
+            print(f"Unexpected sentiment batch response for {count} inputs")
+            return [None] * count
+        return [self._process_sentiment_response([item]) for item in result]
+    
+    def _fetch_sentiment(self, text: str) -> Dict:
+        """Call the Hugging Face sentiment model"""
+        response = self._post_sentiment(text)
+        if response is None:
+            return None
+        
+        try:
+            return self._handle_sentiment_response(response)
+        except Exception as e:
+            print(f"Sentiment analysis failed: {e}")
+            return None
+    
+    async def _fetch_sentiment_async(self, text: str) -> Dict:
+        """Call the Hugging Face sentiment model without blocking the event loop"""
+        response, model = await self._post_sentiment_hedged_async(text)
+        if response is None:
+            return None
+        
+        try:
+            return self._tag_model(self._handle_sentiment_response(response), model)
+        except Exception as e:
+            print(f"Sentiment analysis failed: {e}")
+            return None
+    
+    def _tag_model(self, sentiment_data: Optional[Dict], model: str) -> Optional[Dict]:
+        """Mark sentiment that came from a fallback model, so it is not cached as the primary's"""
+        if sentiment_data is not None and model != self.sentiment_model:
+            sentiment_data['model'] = model
+        return sentiment_data
+    
+    def _post_sentiment(self, inputs, model: Optional[str] = None):
+        """POST inputs to a sentiment model (the primary by default).
+        
+        Returns the response, or None if the breaker refused the call or it failed.
+        Only primary-model calls go through the circuit breaker; for it, anything but a
+        200 counts as a failure (503 included).
+        """
+        model = model or self.sentiment_model
+        primary = model == self.sentiment_model
+        if primary and not self.breaker.allow_request():
+            return None
+        self.sentiment_stats['http_requests'] += 1
+        started = time.monotonic()
+        
+        try:
+            response = self.session.post(
+                f"{self.base_url}{model}",
+                json={"inputs": inputs},
+                timeout=15
+            )
+        except Exception as e:
+            if primary:
+                self.breaker.record_failure(time.monotonic() - started)
+            print(f"Sentiment analysis failed: {e}")
+            return None
+        
+        if primary:
+            self._record_response(response, time.monotonic() - started)
+        return response
+    
+    async def _post_sentiment_async(self, inputs, model: Optional[str] = None):
+        """Non-blocking _post_sentiment.
+        
+        A primary call abandoned by its caller (a hedge that lost the race) is not reported
+        to the breaker, since that says nothing about the service's health. A half-open
+        probe is shielded instead: it runs to completion so its real outcome is recorded.
+        """
+        if httpx is None:
+            return await asyncio.to_thread(self._post_sentiment, inputs, model)
+        model = model or self.sentiment_model
+        primary = model == self.sentiment_model
+        if primary and not self.breaker.allow_request():
+            return None
+        call = self._send_sentiment_async(inputs, model, primary)
+        if primary and self.breaker.state == HALF_OPEN:
+            return await asyncio.shield(asyncio.ensure_future(call))
+        return await call
+    
+    async def _send_sentiment_async(self, inputs, model: str, primary: bool):
+        """The HTTP call behind _post_sentiment_async, recording primary outcomes in the breaker"""
+        self.sentiment_stats['http_requests'] += 1
+        started = time.monotonic()
+        
+        try:
+            response = await self._get_async_client().post(
+                f"{self.base_url}{model}",
+                json={"inputs": inputs},
                 timeout=15
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return self._process_sentiment_response(result)
-            elif response.status_code == 503:
-                print("Sentiment model loading, skipping AI enhancement...")
-                return None
-            else:
-                print(f"Sentiment API error: {response.status_code}")
-                return None
-                
         except Exception as e:
+            if primary:
+                self.breaker.record_failure(time.monotonic() - started)
             print(f"Sentiment analysis failed: {e}")
             return None
+        
+        if primary:
+            self._record_response(response, time.monotonic() - started)
+        return response
+    
+    async def _post_sentiment_hedged_async(self, inputs):
+        """_post_sentiment_async, racing the fallback models when the primary is slow or fails.
+        
+        Each time the hedge delay passes without a 200, the next fallback model is called
+        in parallel (at once if every call in flight already failed). The first 200 wins
+        and the calls still in flight are cancelled. Returns (response, model that sent
+        it); if none succeeds, the last failed response (or None) is returned.
+        """
+        models = [self.sentiment_model] + self.fallback_models
+        delay = self.hedge_delay()
+        pending = {}  # task -> model
+        failed = None, self.sentiment_model
+        try:
+            for position, model in enumerate(models):
+                if position > 0:
+                    self.sentiment_stats['hedged_requests'] += 1
+                pending[asyncio.ensure_future(self._post_sentiment_async(inputs, model))] = model
+                
+                last = position == len(models) - 1
+                deadline = None if last else time.monotonic() + delay
+                while pending:
+                    timeout = None if deadline is None else max(0, deadline - time.monotonic())
+                    done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        break  # Hedge delay passed: bring in the next model
+                    for task in done:
+                        winner = pending.pop(task)
+                        response = task.result()
+                        if response is not None and response.status_code == 200:
+                            if winner != self.sentiment_model:
+                                self.sentiment_stats['hedge_wins'] += 1
+                            return response, winner
+                        if response is not None:
+                            failed = response, winner
+            return failed
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def hedge_delay(self) -> float:
+        """Seconds to wait on a sentiment call before racing the next model"""
+        if len(self._primary_latencies) < HEDGE_MIN_SAMPLES:
+            return self.hedge_delay_default
+        latencies = sorted(self._primary_latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))
+        return latencies[index]
+    
+    def _record_response(self, response, latency: float):
+        if response.status_code == 200:
+            self.breaker.record_success(latency)
+            self._primary_latencies.append(latency)
+        else:
+            self.breaker.record_failure(latency)
+    
+    def _get_async_client(self):
+        """Create the pooled async client on first use"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                headers=dict(self.session.headers),
+                limits=httpx.Limits(max_connections=self._pool_maxsize, max_keepalive_connections=self._pool_maxsize),
+                # Retries connection failures only
+                transport=httpx.AsyncHTTPTransport(retries=self._max_retries)
+            )
+        return self._async_client
+    
+    def _handle_sentiment_response(self, response) -> Dict:
+        """Turn an inference API response (requests or httpx) into sentiment data"""
+        if response.status_code == 200:
+            result = response.json()
+            return self._process_sentiment_response(result)
+        elif response.status_code == 503:
+            print("Sentiment model loading, skipping AI enhancement...")
+            return None
+        else:
+            print(f"Sentiment API error: {response.status_code}")
+            return None
     
     def _process_sentiment_response(self, response) -> Dict:
         """Process sentiment response from Hugging Face"""
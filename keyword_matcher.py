@@ -0,0 +1,121 @@
+# keyword_matcher.py - Multi-pattern matcher for keyword lexicons
+
+import itertools
+from typing import Dict, Iterable, List, Sequence, Set
+
+try:
+    import ahocorasick  # pyahocorasick: C-backed Aho-Corasick automaton
+except ImportError:
+    ahocorasick = None
+
+
+class KeywordMatcher:
+    """Match every keyword from several named lists and return per-list hit sets.
+
+    Keywords are matched as plain substrings (the same semantics as `word in text`),
+    so results are identical to checking each keyword separately. Patterns are
+    lowercased when the matcher is built; callers pass already-lowercased text.
+
+    With pyahocorasick installed, all lists are matched in one pass over the text, so
+    cost scales with email length rather than lexicon size. Without it, each keyword
+    is checked with `in`, which is as fast as anything pure Python can do at the
+    current lexicon sizes (see bench_analyzer.py).
+    """
+
+    def __init__(self, lexicons: Dict[str, Iterable[str]]):
+        self.list_names = list(lexicons.keys())
+        self._lexicons = {
+            list_name: tuple(dict.fromkeys(keyword.lower() for keyword in keywords if keyword))
+            for list_name, keywords in lexicons.items()
+        }
+
+        self._automaton = None
+        if ahocorasick is not None:
+            owners = {}
+            for list_name, keywords in self._lexicons.items():
+                for keyword in keywords:
+                    owners.setdefault(keyword, []).append(list_name)
+            automaton = ahocorasick.Automaton()
+            for keyword, list_names in owners.items():
+                automaton.add_word(keyword, (keyword, tuple(list_names)))
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def match(self, text: str) -> Dict[str, Set[str]]:
+        """Return the set of keywords found in `text` for every list"""
+        if self._automaton is None:
+            return {list_name: {keyword for keyword in keywords if keyword in text}
+                    for list_name, keywords in self._lexicons.items()}
+
+        hits = {list_name: set() for list_name in self.list_names}
+        for _, (keyword, list_names) in self._automaton.iter(text):
+            for list_name in list_names:
+                hits[list_name].add(keyword)
+        return hits
+
+    def count_many(self, texts: Sequence[str]) -> Dict[str, List[int]]:
+        """Return, for every list, the number of distinct keywords found in each text.
+
+        The counts equal len() of match()'s sets for each text. With pyahocorasick the
+        texts are joined with newlines (no keyword contains one) and matched in a single
+        pass, saving a call and a set per text on large batches.
+        """
+        if self._automaton is None:
+            matches = [self.match(text) for text in texts]
+            return {list_name: [len(hits[list_name]) for hits in matches] for list_name in self.list_names}
+
+        counts = {list_name: [0] * len(texts) for list_name in self.list_names}
+        ends = list(itertools.accumulate(len(text) + 1 for text in texts))
+        row = 0
+        seen = set()
+        for end, (keyword, list_names) in self._automaton.iter("\n".join(texts)):
+            if end >= ends[row]:
+                while end >= ends[row]:
+                    row += 1
+                seen.clear()
+            if keyword not in seen:
+                seen.add(keyword)
+                for list_name in list_names:
+                    counts[list_name][row] += 1
+        return counts
+
+
+# --- Shared lexicons ---
+# Every keyword list checked by LocalEmailAnalyzer and EmailSuggestionEngine lives here,
+# so a single matcher built at import time covers all of them.
+SPAM_WORDS = [
+    'free', 'guarantee', 'act now', 'limited time', 'urgent', 'act fast',
+    'amazing deal', 'incredible offer', 'once in a lifetime', 'exclusive',
+    'make money fast', 'get rich', 'no risk', 'risk free'
+]
+PROFESSIONAL_WORDS = [
+    'please', 'thank you', 'appreciate', 'respect', 'understand',
+    'consider', 'opportunity', 'collaboration', 'partnership'
+]
+VALUE_WORDS = [
+    'save', 'increase', 'improve', 'reduce', 'optimize', 'streamline',
+    'boost', 'enhance', 'grow', 'scale', 'efficiency', 'productivity'
+]
+RESEARCH_INDICATORS = [
+    'noticed', 'saw', 'read', 'found', 'discovered', 'recent', 'expansion',
+    'launch', 'announcement', 'news', 'article', 'post', 'comment', 'background'
+]
+GENERIC_PHRASES = ['love your company', 'great company', 'amazing work', 'impressed by']
+
+# EmailSuggestionEngine rule keywords
+SUGGESTION_VALUE_WORDS = ['help', 'increase', 'improve', 'save', 'grow']
+SOCIAL_PROOF_WORDS = ['helped', 'clients', 'customers', 'companies']
+SUGGESTION_MARKERS = ['{name}', 'hi there', 'call', '?']
+
+LEXICONS = {
+    'spam_words': SPAM_WORDS,
+    'professional_words': PROFESSIONAL_WORDS,
+    'value_words': VALUE_WORDS,
+    'research_indicators': RESEARCH_INDICATORS,
+    'generic_phrases': GENERIC_PHRASES,
+    'suggestion_value_words': SUGGESTION_VALUE_WORDS,
+    'social_proof_words': SOCIAL_PROOF_WORDS,
+    'suggestion_markers': SUGGESTION_MARKERS,
+}
+
+KEYWORD_MATCHER = KeywordMatcher(LEXICONS)
@@ -0,0 +1,110 @@
+# lexicon_sentiment.py - Offline lexicon-based sentiment scorer (no external API needed)
+
+import math
+import re
+from typing import Dict, List
+
+# Word -> valence (-3 very negative ... +3 very positive), tuned for outreach email tone
+SENTIMENT_LEXICON = {
+    # Positive
+    'appreciate': 2.0, 'appreciated': 2.0, 'awesome': 2.5, 'benefit': 1.5, 'benefits': 1.5,
+    'best': 2.0, 'better': 1.5, 'brilliant': 2.5, 'congrats': 2.5, 'congratulations': 2.5,
+    'delighted': 2.5, 'easy': 1.2, 'effective': 1.5, 'enjoy': 1.8, 'enjoyed': 1.8,
+    'excellent': 2.7, 'excited': 2.0, 'exciting': 2.0, 'fantastic': 2.6, 'glad': 2.0,
+    'good': 1.9, 'grateful': 2.2, 'great': 2.5, 'grow': 1.0, 'growth': 1.2,
+    'happy': 2.2, 'help': 1.0, 'helpful': 1.8, 'impressed': 2.0, 'impressive': 2.2,
+    'improve': 1.2, 'improved': 1.4, 'inspiring': 2.2, 'interested': 1.4, 'interesting': 1.6,
+    'love': 2.8, 'loved': 2.8, 'nice': 1.8, 'opportunity': 1.3, 'perfect': 2.5,
+    'pleasure': 2.2, 'pleased': 2.2, 'positive': 1.8, 'recommend': 1.6, 'reliable': 1.6,
+    'save': 1.0, 'simple': 1.0, 'smooth': 1.4, 'success': 2.0, 'successful': 2.0,
+    'support': 1.3, 'thank': 1.8, 'thanks': 1.8, 'thrilled': 2.8, 'useful': 1.6,
+    'valuable': 2.0, 'welcome': 1.6, 'win': 1.8, 'wonderful': 2.7, 'worth': 1.2,
+    # Negative
+    'angry': -2.5, 'annoying': -2.0, 'awful': -2.8, 'bad': -2.3, 'broken': -1.8,
+    'complaint': -1.8, 'concern': -1.0, 'concerned': -1.2, 'confusing': -1.6, 'costly': -1.4,
+    'difficult': -1.4, 'disappointed': -2.2, 'disappointing': -2.2, 'expensive': -1.2, 'fail': -2.0,
+    'failed': -2.0, 'failing': -2.0, 'failure': -2.2, 'frustrated': -2.2, 'frustrating': -2.2,
+    'hate': -2.8, 'horrible': -2.8, 'ignore': -1.4, 'ignored': -1.6, 'issue': -0.8,
+    'issues': -0.8, 'lose': -1.6, 'losing': -1.6, 'loss': -1.8, 'mistake': -1.6,
+    'pain': -1.6, 'poor': -2.0, 'problem': -1.4, 'problems': -1.4, 'risk': -1.0,
+    'sorry': -0.8, 'spam': -2.0, 'struggle': -1.6, 'struggling': -1.6, 'terrible': -2.8,
+    'unfortunately': -1.6, 'unhappy': -2.2, 'urgent': -1.0, 'useless': -2.4, 'waste': -2.0,
+    'wasted': -2.0, 'worried': -1.6, 'worse': -2.0, 'worst': -2.8, 'wrong': -1.8,
+}
+
+NEGATIONS = {
+    'not', 'no', 'never', 'none', 'nobody', 'nothing', 'neither', 'nor', 'without', 'hardly',
+    'cannot', "can't", "don't", "doesn't", "didn't", "isn't", "aren't", "wasn't", "weren't",
+    "won't", "wouldn't", "shouldn't", "couldn't", "haven't", "hasn't",
+}
+
+# Multipliers for the next sentiment word
+INTENSIFIERS = {
+    'very': 1.3, 'really': 1.3, 'extremely': 1.5, 'incredibly': 1.5, 'truly': 1.3,
+    'so': 1.2, 'super': 1.3, 'highly': 1.3, 'absolutely': 1.4, 'slightly': 0.6, 'somewhat': 0.7,
+}
+
+NEGATION_SCOPE = 3  # Tokens after a negation whose valence is flipped
+NEGATION_FACTOR = -0.74  # "not great" is mildly negative, not the opposite of great
+BUT_BEFORE, BUT_AFTER = 0.5, 1.5  # The clause after "but" carries the sentiment
+NORMALIZATION_ALPHA = 15  # Squashes the raw valence sum into (-1, 1)
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+class LexiconSentimentAnalyzer:
+    """Weighted-lexicon sentiment with negation, intensifier and "but" handling.
+
+    Runs in-process in microseconds and returns the same shape as the Hugging Face
+    sentiment results, so it can stand in for them.
+    """
+
+    def __init__(self, lexicon: Dict[str, float] = None):
+        self.lexicon = lexicon or SENTIMENT_LEXICON
+
+    def analyze(self, text: str) -> Dict:
+        """Score text: sentiment_score in [-1, 1] plus positive/negative confidences summing to 1"""
+        tokens = _TOKEN.findall(text.lower())
+
+        valences = []
+        but_index = None
+        negated_until = -1
+        boost = 1.0
+        for i, token in enumerate(tokens):
+            if token in NEGATIONS or token.endswith("n't"):
+                negated_until = i + NEGATION_SCOPE
+                continue
+            if token in INTENSIFIERS:
+                boost *= INTENSIFIERS[token]
+                continue
+            if token == 'but':
+                but_index = len(valences)
+                continue
+
+            valence = self.lexicon.get(token)
+            if valence is None:
+                continue
+            valence *= boost
+            boost = 1.0
+            if i <= negated_until:
+                valence *= NEGATION_FACTOR
+            valences.append(valence)
+
+        if but_index is not None:
+            valences = ([v * BUT_BEFORE for v in valences[:but_index]] +
+                        [v * BUT_AFTER for v in valences[but_index:]])
+
+        total = sum(valences)
+        compound = total / math.sqrt(total * total + NORMALIZATION_ALPHA)
+        positive_confidence = (1 + compound) / 2
+        negative_confidence = 1 - positive_confidence
+
+        return {
+            'sentiment_score': positive_confidence - negative_confidence,
+            'positive_confidence': positive_confidence,
+            'negative_confidence': negative_confidence
+        }
+
+    def get_sentiment_many(self, texts: List[str]) -> List[Dict]:
+        """Sentiment for many texts, same interface as HuggingFaceAnalyzer.get_sentiment_many"""
+        return [self.analyze(text) for text in texts]
@@ -1,207 +1,387 @@
 # local_analyzer.py - v1.1 - Rule-based email analyzer (no external API needed)
 
+import itertools
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for LocalEmailAnalyzer.analyze_many
+    np = None
+
+from keyword_matcher import (
+    KEYWORD_MATCHER, SPAM_WORDS, PROFESSIONAL_WORDS, VALUE_WORDS,
+    RESEARCH_INDICATORS, GENERIC_PHRASES
+)
+
+# Bump whenever scoring rules or feedback text change; it is part of every cache key
+ANALYZER_VERSION = "1.1"
+
+# --- Regex registry ---
+# Every pattern is compiled once at import time. Rule families are kept as separately
+# compiled alternatives rather than one combined alternation: each literal-led pattern
+# then gets the regex engine's fast literal-prefix search, and every alternative that
+# matches is reported, even when matches overlap (see bench_analyzer.py).
+GOOD_CTA_PATTERNS = {
+    'open_to': r'open to.*\?',
+    'interested_in': r'interested in.*\?',
+    'would_you': r'would you.*\?',
+    'quick_question': r'quick question',
+    'brief_chat': r'brief chat',
+    'quick_call': r'quick call',
+    'thoughts_on': r'thoughts on',
+}
+BAD_CTA_PATTERNS = {
+    'book_demo': r'book.*demo',
+    'schedule_meeting': r'schedule.*meeting',
+    'sign_up': r'sign up',
+    'buy_now': r'buy now',
+    'call_me': r'call me',
+    'download_now': r'download.*now',
+}
+
+PATTERNS = {
+    'greeting': re.compile(r'^(hi|hello)\s+([a-z]+),', re.IGNORECASE),
+    # Only ever searched for presence, so '\d+%|\d+x|\$\d+' needs no more than one digit
+    # on the number side; the shorter form scans about twice as fast
+    'metric': re.compile(r'\d[%x]|\$\d'),
+    # One scan counts both sides; m.lastgroup says which one a match belongs to
+    'pronoun': re.compile(r'\b(?:(?P<self_focus>i|we|our|my)|(?P<recipient_focus>you|your))\b'),
+}
+
+PATTERN_FAMILIES = {
+    'good_cta': {name: re.compile(pattern) for name, pattern in GOOD_CTA_PATTERNS.items()},
+    'bad_cta': {name: re.compile(pattern) for name, pattern in BAD_CTA_PATTERNS.items()},
+}
+
+# --- Scoring rules ---
+# Shared by the per-email analyze_* methods and by analyze_many's array scoring. Each
+# category starts at `base`; every rule adds the points of its first tier whose
+# condition holds (None always holds) and the total is clamped to [0, max]. Conditions
+# and callable points use operators that work on plain values and NumPy arrays alike.
+# Feedback messages are formatted with the email's features.
+SCORING_RULES = {
+    'relevance': {
+        'name': "Relevance & Hook", 'base': 0, 'max': 45,
+        'rules': [
+            [(lambda f: f['has_greeting'], 15, "Good start with a personalized greeting ('{greeting}')."),
+             (None, 0, "Lacks a direct, personalized greeting like 'Hi [Name],'.")],
+            [(lambda f: f['research_hits'] >= 2, 20, "Strong evidence of specific research about the recipient."),
+             (lambda f: f['research_hits'] == 1, 10, "Shows some research effort."),
+             (None, 0, "No clear signs of research beyond the name.")],
+            [(lambda f: f['generic_hits'] > 0, -5, "Relies on generic flattery, which can feel insincere."),
+             (None, 10, "Avoids generic flattery, making the personalization feel more authentic.")],
+        ],
+    },
+    'value': {
+        'name': "Value Proposition", 'base': 0, 'max': 30,
+        'rules': [
+            [(lambda f: f['value_hits'] >= 2, 15, "Clear value proposition with specific benefit-oriented words."),
+             (lambda f: f['value_hits'] == 1, 8, "Some value mentioned but could be stronger and more direct."),
+             (None, 0, "Weak or unclear value proposition. Focus on benefits like 'saving time' or 'increasing revenue'.")],
+            [(lambda f: f['has_metric'], 10, "Includes specific metrics which adds credibility."),
+             (None, 0, "Could be strengthened by including specific metrics or numbers.")],
+            # Only penalize clearly self-focused language
+            [(lambda f: f['you_count'] >= f['i_we_count'], 5, "Good recipient-focused language."),
+             (lambda f: f['i_we_count'] > f['you_count'] + 1, -5,
+              "Language is too self-focused. Use 'you' and 'your' more often to center the recipient.")],
+        ],
+    },
+    'cta': {
+        'name': "Call to Action (CTA)", 'base': 0, 'max': 15,
+        'rules': [
+            [(lambda f: f['good_cta'], 10, "Uses a low-friction, interest-gauging approach.")],
+            [(lambda f: f['bad_cta'], -5, "Contains high-friction demands, which can scare prospects away.")],
+            [(lambda f: f['question_count'] >= 1, 5, "Includes engaging questions."),
+             (None, 0, "Could benefit from an engaging question to prompt a reply.")],
+            [(lambda f: (f['good_cta'] | f['bad_cta']) == 0, 0, "No clear call to action was identified.")],
+        ],
+    },
+    'professionalism': {
+        'name': "Professionalism", 'base': 10, 'max': 10,
+        'rules': [
+            [(lambda f: f['spam_hits'] > 0, lambda f: -2 * f['spam_hits'], "Contains {spam_hits} spam-like words."),
+             (None, 0, "Avoids spam-like language.")],
+            [(lambda f: f['professional_hits'] >= 1, 0, "Uses courteous language."),
+             (None, -2, "Tone could be improved with more courteous language (e.g., 'thank you', 'appreciate').")],
+            [(lambda f: (f['word_count'] >= 50) & (f['word_count'] <= 150), 0, "Good length for a cold email."),
+             (lambda f: f['word_count'] < 50, -2, "Email might be too brief to convey value."),
+             (None, -2, "Email is lengthy and could be more concise.")],
+        ],
+    },
+}
+
+# (minimum overall score, verdict), lowest first
+VERDICTS = [
+    (0, "Very Poor - This email needs a complete rewrite"),
+    (30, "Poor - Major issues that will hurt response rates"),
+    (50, "Fair - Decent foundation but needs significant improvements"),
+    (70, "Good - Strong email with minor improvements needed"),
+    (85, "Excellent - This email is highly likely to get responses"),
+]
+
+def match_family(family: str, text: str) -> set:
+    """Return the names of the alternatives in a pattern family that matched `text`"""
+    return {name for name, pattern in PATTERN_FAMILIES[family].items() if pattern.search(text)}
+
+def normalize_subject(subject: str) -> str:
+    """Subject with surrounding whitespace stripped and inner runs collapsed to one space"""
+    return " ".join(subject.split())
 
 class LocalEmailAnalyzer:
-    def __init__(self):
-        # Keyword and pattern lists remain the same
-        self.spam_words = [
-            'free', 'guarantee', 'act now', 'limited time', 'urgent', 'act fast',
-            'amazing deal', 'incredible offer', 'once in a lifetime', 'exclusive',
-            'make money fast', 'get rich', 'no risk', 'risk free'
-        ]
-        self.professional_words = [
-            'please', 'thank you', 'appreciate', 'respect', 'understand',
-            'consider', 'opportunity', 'collaboration', 'partnership'
-        ]
-        self.value_words = [
-            'save', 'increase', 'improve', 'reduce', 'optimize', 'streamline',
-            'boost', 'enhance', 'grow', 'scale', 'efficiency', 'productivity'
-        ]
-        self.good_cta_patterns = [
-            r'open to.*\?', r'interested in.*\?', r'would you.*\?',
-            r'quick question', r'brief chat', r'quick call', r'thoughts on'
-        ]
-        self.bad_cta_patterns = [
-            r'book.*demo', r'schedule.*meeting', r'sign up', r'buy now',
-            r'call me', r'download.*now'
-        ]
-
-    def analyze_relevance_and_hook(self, subject: str, body: str) -> Tuple[int, str]:
-        """Analyze relevance and personalization (max 45 points)"""
-        score = 0
-        feedback_parts = []
-        
-        # --- REFINED LOGIC v1.1 ---
-        # 1. Check for a personalized greeting
-        greeting_pattern = re.search(r'^(hi|hello)\s+([a-z]+),', body, re.IGNORECASE)
-        if greeting_pattern:
-            score += 15
-            feedback_parts.append(f"Good start with a personalized greeting ('{greeting_pattern.group(0)}').")
-        else:
-            feedback_parts.append("Lacks a direct, personalized greeting like 'Hi [Name],'.")
-            
-        # 2. Check for research indicators
-        research_indicators = [
-            'noticed', 'saw', 'read', 'found', 'discovered', 'recent', 'expansion',
-            'launch', 'announcement', 'news', 'article', 'post', 'comment', 'background'
-        ]
-        research_found = sum(1 for word in research_indicators if word.lower() in body.lower())
+    def __init__(self, cache=None):
+        # Optional AnalysisCache; analyze_email results are reused for identical emails
+        self.cache = cache
+        # Keyword lists are shared with the module-level matcher in keyword_matcher
+        self.spam_words = SPAM_WORDS
+        self.professional_words = PROFESSIONAL_WORDS
+        self.value_words = VALUE_WORDS
+        self.good_cta_patterns = list(GOOD_CTA_PATTERNS.values())
+        self.bad_cta_patterns = list(BAD_CTA_PATTERNS.values())
+        self.research_indicators = RESEARCH_INDICATORS
+        self.generic_phrases = GENERIC_PHRASES
+
+    def extract_features(self, subject: str, body: str) -> Dict:
+        """Scan the email once and collect every signal the scorers need"""
+        body_lower = body.lower()
         
-        if research_found >= 2:
-            score += 20
-            feedback_parts.append("Strong evidence of specific research about the recipient.")
-        elif research_found == 1:
-            score += 10
-            feedback_parts.append("Shows some research effort.")
-        else:
-            feedback_parts.append("No clear signs of research beyond the name.")
-            
-        # 3. Penalize/reward generic praise
-        generic_phrases = ['love your company', 'great company', 'amazing work', 'impressed by']
-        if any(phrase in body.lower() for phrase in generic_phrases):
-            score -= 5
-            feedback_parts.append("Relies on generic flattery, which can feel insincere.")
-        else:
-            score += 10
-            feedback_parts.append("Avoids generic flattery, making the personalization feel more authentic.")
+        keyword_hits = KEYWORD_MATCHER.match(body_lower)
+        greeting_match = PATTERNS['greeting'].search(body)
+        pronoun_counts = {'self_focus': 0, 'recipient_focus': 0}
+        for match in PATTERNS['pronoun'].finditer(body_lower):
+            pronoun_counts[match.lastgroup] += 1
         
-        feedback = " ".join(feedback_parts)
-        return max(0, min(45, score)), feedback
+        return {
+            "greeting": greeting_match.group(0) if greeting_match else None,
+            "has_greeting": greeting_match is not None,
+            "research_hits": len(keyword_hits['research_indicators']),
+            "generic_hits": len(keyword_hits['generic_phrases']),
+            "value_hits": len(keyword_hits['value_words']),
+            "spam_hits": len(keyword_hits['spam_words']),
+            "professional_hits": len(keyword_hits['professional_words']),
+            "has_metric": PATTERNS['metric'].search(body) is not None,
+            "i_we_count": pronoun_counts['self_focus'],
+            "you_count": pronoun_counts['recipient_focus'],
+            "good_cta": bool(match_family('good_cta', body_lower)),
+            "bad_cta": bool(match_family('bad_cta', body_lower)),
+            "question_count": body.count('?'),
+            "word_count": len(body.split()),
+        }
+
+    def analyze_relevance_and_hook(self, subject: str, body: str, features: Optional[Dict] = None) -> Tuple[int, str]:
+        """Analyze relevance and personalization (max 45 points)"""
+        return self._score_category('relevance', subject, body, features)
 
-    def analyze_value_proposition(self, subject: str, body: str) -> Tuple[int, str]:
+    def analyze_value_proposition(self, subject: str, body: str, features: Optional[Dict] = None) -> Tuple[int, str]:
         """Analyze value proposition (max 30 points)"""
-        score = 0
-        feedback_parts = []
-        
-        # Check for value words
-        value_mentions = sum(1 for word in self.value_words if word.lower() in body.lower())
-        if value_mentions >= 2:
-            score += 15
-            feedback_parts.append("Clear value proposition with specific benefit-oriented words.")
-        elif value_mentions == 1:
-            score += 8
-            feedback_parts.append("Some value mentioned but could be stronger and more direct.")
-        else:
-            feedback_parts.append("Weak or unclear value proposition. Focus on benefits like 'saving time' or 'increasing revenue'.")
-            
-        # Check for metrics/numbers
-        if re.search(r'\d+%|\d+x|\$\d+', body):
-            score += 10
-            feedback_parts.append("Includes specific metrics which adds credibility.")
-        else:
-            feedback_parts.append("Could be strengthened by including specific metrics or numbers.")
-            
-        # --- REFINED LOGIC v1.1 ---
-        # Penalize "I/we" focused language more intelligently
-        i_we_count = len(re.findall(r'\b(i|we|our|my)\b', body.lower()))
-        you_count = len(re.findall(r'\b(you|your)\b', body.lower()))
-        
-        if you_count >= i_we_count:
-            score += 5
-            feedback_parts.append("Good recipient-focused language.")
-        elif i_we_count > you_count + 1: # Only penalize if significantly self-focused
-            score -= 5
-            feedback_parts.append("Language is too self-focused. Use 'you' and 'your' more often to center the recipient.")
-            
-        feedback = " ".join(feedback_parts)
-        return max(0, min(30, score)), feedback
-
-    def analyze_call_to_action(self, subject: str, body: str) -> Tuple[int, str]:
+        return self._score_category('value', subject, body, features)
+
+    def analyze_call_to_action(self, subject: str, body: str, features: Optional[Dict] = None) -> Tuple[int, str]:
         """Analyze call to action (max 15 points)"""
-        # This function's logic is solid, no changes needed
-        score = 0
-        feedback_parts = []
-        
-        good_cta_found = any(re.search(pattern, body.lower()) for pattern in self.good_cta_patterns)
-        if good_cta_found:
-            score += 10
-            feedback_parts.append("Uses a low-friction, interest-gauging approach.")
-        
-        bad_cta_found = any(re.search(pattern, body.lower()) for pattern in self.bad_cta_patterns)
-        if bad_cta_found:
-            score -= 5
-            feedback_parts.append("Contains high-friction demands, which can scare prospects away.")
-        
-        question_count = body.count('?')
-        if question_count >= 1:
-            score += 5
-            feedback_parts.append("Includes engaging questions.")
-        else:
-            feedback_parts.append("Could benefit from an engaging question to prompt a reply.")
-            
-        if not good_cta_found and not bad_cta_found:
-            feedback_parts.append("No clear call to action was identified.")
-            
-        feedback = " ".join(feedback_parts)
-        return max(0, min(15, score)), feedback
-
-    def analyze_professionalism(self, subject: str, body: str) -> Tuple[int, str]:
+        return self._score_category('cta', subject, body, features)
+
+    def analyze_professionalism(self, subject: str, body: str, features: Optional[Dict] = None) -> Tuple[int, str]:
         """Analyze professionalism and clarity (max 10 points)"""
-        # This function's logic is solid, no changes needed
-        score = 10
+        return self._score_category('professionalism', subject, body, features)
+
+    def _score_category(self, category: str, subject: str, body: str, features: Optional[Dict]) -> Tuple[int, str]:
+        """Apply one category of SCORING_RULES to a single email"""
+        if features is None:
+            features = self.extract_features(subject, body)
+        spec = SCORING_RULES[category]
+        score = spec['base']
         feedback_parts = []
         
-        spam_found = sum(1 for word in self.spam_words if word.lower() in body.lower())
-        if spam_found > 0:
-            score -= spam_found * 2
-            feedback_parts.append(f"Contains {spam_found} spam-like words.")
-        else:
-            feedback_parts.append("Avoids spam-like language.")
-            
-        professional_found = sum(1 for word in self.professional_words if word.lower() in body.lower())
-        if professional_found >= 1:
-            feedback_parts.append("Uses courteous language.")
-        else:
-            score -= 2
-            feedback_parts.append("Tone could be improved with more courteous language (e.g., 'thank you', 'appreciate').")
-            
-        word_count = len(body.split())
-        if 50 <= word_count <= 150:
-            feedback_parts.append("Good length for a cold email.")
-        elif word_count < 50:
-            score -= 2
-            feedback_parts.append("Email might be too brief to convey value.")
-        else:
-            score -= 2
-            feedback_parts.append("Email is lengthy and could be more concise.")
-            
-        feedback = " ".join(feedback_parts)
-        return max(0, min(10, score)), feedback
+        for tiers in spec['rules']:
+            for condition, points, message in tiers:
+                if condition is None or condition(features):
+                    score += points(features) if callable(points) else points
+                    if message:
+                        feedback_parts.append(message.format_map(features))
+                    break
+        
+        return max(0, min(spec['max'], score)), " ".join(feedback_parts)
 
     def get_verdict(self, overall_score: int) -> str:
         """Generate verdict based on overall score"""
-        # This function's logic is solid, no changes needed
-        if overall_score >= 85:
-            return "Excellent - This email is highly likely to get responses"
-        elif overall_score >= 70:
-            return "Good - Strong email with minor improvements needed"
-        elif overall_score >= 50:
-            return "Fair - Decent foundation but needs significant improvements"
-        elif overall_score >= 30:
-            return "Poor - Major issues that will hurt response rates"
-        else:
-            return "Very Poor - This email needs a complete rewrite"
+        for min_score, verdict in reversed(VERDICTS):
+            if overall_score >= min_score:
+                return verdict
+        return VERDICTS[0][1]
 
     def analyze_email(self, subject: str, body: str) -> Dict:
         """Main analysis function"""
-        # This function's logic is solid, no changes needed
-        relevance_score, relevance_feedback = self.analyze_relevance_and_hook(subject, body)
-        value_score, value_feedback = self.analyze_value_proposition(subject, body)
-        cta_score, cta_feedback = self.analyze_call_to_action(subject, body)
-        prof_score, prof_feedback = self.analyze_professionalism(subject, body)
-        
-        overall_score = relevance_score + value_score + cta_score + prof_score
-        verdict = self.get_verdict(overall_score)
+        if self.cache is None:
+            return self._analyze_email_uncached(subject, body)
+        # The scores don't depend on the subject's spacing, so equivalent subjects share an entry
+        cache_key = self.cache.make_key('local', ANALYZER_VERSION, normalize_subject(subject), body)
+        return self.cache.get_or_compute(cache_key, lambda: self._analyze_email_uncached(subject, body))
+
+    def _analyze_email_uncached(self, subject: str, body: str) -> Dict:
+        # Extract features once and share them across all four scorers
+        features = self.extract_features(subject, body)
+        return self._build_result(subject, body, features)
+
+    def _build_result(self, subject: str, body: str, features: Dict) -> Dict:
+        """Score one email from its extracted features, including feedback text"""
+        breakdown = []
+        for category, spec in SCORING_RULES.items():
+            score, feedback = self._score_category(category, subject, body, features)
+            breakdown.append({"name": spec['name'], "score": score, "maxScore": spec['max'], "feedback": feedback})
         
+        overall_score = sum(item["score"] for item in breakdown)
         return {
             "overallScore": overall_score,
-            "verdict": verdict,
-            "breakdown": [
-                {"name": "Relevance & Hook", "score": relevance_score, "maxScore": 45, "feedback": relevance_feedback},
-                {"name": "Value Proposition", "score": value_score, "maxScore": 30, "feedback": value_feedback},
-                {"name": "Call to Action (CTA)", "score": cta_score, "maxScore": 15, "feedback": cta_feedback},
-                {"name": "Professionalism", "score": prof_score, "maxScore": 10, "feedback": prof_feedback},
-            ]
-        }
\ No newline at end of file
+            "verdict": self.get_verdict(overall_score),
+            "breakdown": breakdown,
+        }
+
+    def analyze_many(self, subjects: Sequence[str], bodies: Sequence[str]) -> "AnalysisBatch":
+        """Score a whole batch of emails with the rules applied as NumPy array operations.
+
+        Features are extracted for the batch at once (see _extract_batch_features), then
+        every SCORING_RULES tier, the clamping and the verdict thresholds run over whole
+        columns. Feedback text is only built for the rows requested from the returned
+        AnalysisBatch. Results bypass the analysis cache.
+        """
+        if np is None:
+            raise ImportError("analyze_many requires numpy. Install it with 'pip install numpy'.")
+        if len(subjects) != len(bodies):
+            raise ValueError("subjects and bodies must have the same length")
+        
+        columns = self._extract_batch_features(bodies)
+        category_scores = []
+        tier_choices = {}
+        for category, spec in SCORING_RULES.items():
+            score = np.full(len(bodies), spec['base'], dtype=np.int64)
+            for rule_index, tiers in enumerate(spec['rules']):
+                conditions = [np.broadcast_to(condition(columns), score.shape)
+                              for condition, _, _ in tiers if condition is not None]
+                points = [points(columns) if callable(points) else points for _, points, _ in tiers]
+                # A trailing None tier is the default; without one, rows matching no tier get nothing
+                default_tier = len(tiers) - 1 if tiers[-1][0] is None else -1
+                default_points = points[-1] if default_tier >= 0 else 0
+                score += np.select(conditions, points[:len(conditions)], default_points)
+                tier_choices[(category, rule_index)] = np.select(
+                    conditions, list(range(len(conditions))), default_tier).astype(np.int8)
+            category_scores.append(np.clip(score, 0, spec['max']))
+        
+        category_scores = np.stack(category_scores, axis=1)
+        overall_scores = category_scores.sum(axis=1)
+        verdict_codes = np.digitize(overall_scores, [min_score for min_score, _ in VERDICTS[1:]])
+        return AnalysisBatch(columns, category_scores, overall_scores, verdict_codes, tier_choices)
+
+    def _extract_batch_features(self, bodies: Sequence[str]) -> Dict:
+        """The extract_features signals for a whole batch, as NumPy columns.
+
+        The lowered bodies are joined with newlines and each pattern scans the joined
+        text once; match offsets are mapped back to rows. No keyword contains a newline
+        and no pattern can match across one, so a match never spans two rows. lower()
+        may change a string's length, so the original and lowered texts keep separate
+        row offsets.
+        """
+        count = len(bodies)
+        lowered = list(map(str.lower, bodies))
+        batch_text = "\n".join(bodies)
+        batch_lower = "\n".join(lowered)
+        text_starts = _row_starts(bodies)
+        lower_starts = _row_starts(lowered)
+        
+        def match_rows(pattern, text, starts):
+            """Row of every match of `pattern` in a joined text"""
+            positions = np.fromiter(map(re.Match.start, pattern.finditer(text)), dtype=np.int64)
+            return np.searchsorted(starts, positions, side='right') - 1
+        
+        def present(pattern, text, starts):
+            column = np.zeros(count, dtype=bool)
+            column[match_rows(pattern, text, starts)] = True
+            return column
+        
+        keyword_counts = KEYWORD_MATCHER.count_many(lowered)
+        pronoun_rows = {'self_focus': [], 'recipient_focus': []}
+        for match in PATTERNS['pronoun'].finditer(batch_lower):
+            pronoun_rows[match.lastgroup].append(match.start())
+        greetings = [match.group(0) if match else None for match in map(PATTERNS['greeting'].search, bodies)]
+        
+        columns = {
+            "greeting": greetings,
+            "has_greeting": np.array([greeting is not None for greeting in greetings], dtype=bool),
+            "research_hits": np.array(keyword_counts['research_indicators'], dtype=np.int64),
+            "generic_hits": np.array(keyword_counts['generic_phrases'], dtype=np.int64),
+            "value_hits": np.array(keyword_counts['value_words'], dtype=np.int64),
+            "spam_hits": np.array(keyword_counts['spam_words'], dtype=np.int64),
+            "professional_hits": np.array(keyword_counts['professional_words'], dtype=np.int64),
+            "has_metric": present(PATTERNS['metric'], batch_text, text_starts),
+            "question_count": np.fromiter(map(str.count, bodies, itertools.repeat('?')), dtype=np.int64, count=count),
+            "word_count": np.fromiter(map(len, map(str.split, bodies)), dtype=np.int64, count=count),
+        }
+        for feature, group in (("i_we_count", 'self_focus'), ("you_count", 'recipient_focus')):
+            rows = np.searchsorted(lower_starts, np.array(pronoun_rows[group], dtype=np.int64), side='right') - 1
+            columns[feature] = np.bincount(rows, minlength=count)
+        for family in ('good_cta', 'bad_cta'):
+            column = np.zeros(count, dtype=bool)
+            for pattern in PATTERN_FAMILIES[family].values():
+                column |= present(pattern, batch_lower, lower_starts)
+            columns[family] = column
+        return columns
+
+
+def _row_starts(rows: Sequence[str]):
+    """Offset of each row in "\\n".join(rows)"""
+    lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    starts = np.zeros(len(rows), dtype=np.int64)
+    np.cumsum(lengths[:-1] + 1, out=starts[1:])
+    return starts
+
+
+class AnalysisBatch:
+    """Scores for a batch of emails from analyze_many, with feedback built per row on demand"""
+
+    def __init__(self, columns, category_scores, overall_scores, verdict_codes, tier_choices):
+        self.columns = columns
+        self.category_scores = category_scores
+        self.overall_scores = overall_scores
+        self.verdict_codes = verdict_codes
+        self.tier_choices = tier_choices  # (category, rule index) -> chosen tier per row, -1 for none
+
+    def __len__(self) -> int:
+        return len(self.overall_scores)
+
+    def score(self, index: int) -> int:
+        """Overall score of one row"""
+        return int(self.overall_scores[index])
+
+    def verdict(self, index: int) -> str:
+        """Verdict text for one row"""
+        return VERDICTS[self.verdict_codes[index]][1]
+
+    def features(self, index: int) -> Dict:
+        """extract_features-style record for one row"""
+        return {name: column[index] if name == "greeting" else column[index].item()
+                for name, column in self.columns.items()}
+
+    def breakdown(self, index: int) -> List[Dict]:
+        """Per-category scores and feedback for one row, as in analyze_email's breakdown"""
+        features = self.features(index)
+        breakdown = []
+        for position, (category, spec) in enumerate(SCORING_RULES.items()):
+            feedback_parts = []
+            for rule_index, tiers in enumerate(spec['rules']):
+                tier = self.tier_choices[(category, rule_index)][index]
+                if tier >= 0 and tiers[tier][2]:
+                    feedback_parts.append(tiers[tier][2].format_map(features))
+            breakdown.append({"name": spec['name'], "score": int(self.category_scores[index, position]),
+                              "maxScore": spec['max'], "feedback": " ".join(feedback_parts)})
+        return breakdown
+
+    def result(self, index: int) -> Dict:
+        """Full analyze_email-style result for one row, feedback included"""
+        return {"overallScore": self.score(index), "verdict": self.verdict(index),
+                "breakdown": self.breakdown(index)}
+
+    def results(self, indices: Optional[Iterable[int]] = None) -> Iterator[Dict]:
+        """Lazily yield full results for the given rows (all rows by default)"""
+        if indices is None:
+            indices = range(len(self))
+        for index in indices:
+            yield self.result(index)
@@ -5,12 +5,15 @@ import os
 import sys
 import json
 import time
+import asyncio
+import codecs
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import FastAPI, HTTPException, Request, Depends, status, UploadFile, File
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -25,7 +28,14 @@ from fastapi import status
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from local_analyzer import LocalEmailAnalyzer
-from huggingface_analyzer import HuggingFaceAnalyzer
+from huggingface_analyzer import HuggingFaceAnalyzer, apply_tone_adjustment
+from lexicon_sentiment import LexiconSentimentAnalyzer
+from analysis_cache import AnalysisCache
+from usage_log_queue import UsageLogWriter
+from stats_cache import StatsCache
+from dashboard_feed import DashboardFeed, error_label
+from request_metrics import RequestMetrics
+from usage_rollup import requests_by_hour, summarize_rollup
 
 # Load environment variables from .env file
 load_dotenv()
@@ -33,7 +43,7 @@ load_dotenv()
 # --- DATABASE CONFIGURATION ---
 # Try to initialize Supabase first, fallback to SQLite
 try:
-    from supabase_db import get_db
+    from supabase_db import get_db, USAGE_LOG_ERROR_COLUMNS
     db = get_db()
     print("SUCCESS: Supabase PostgreSQL database connected successfully!")
     DB_TYPE = "supabase"
@@ -44,6 +54,28 @@ except Exception as e:
     db = AnalyticsDB()
     DB_TYPE = "sqlite"
 
+# /qualify logs through a write-behind queue instead of a Supabase round trip per request
+usage_log_writer = UsageLogWriter(db) if DB_TYPE == "supabase" else None
+
+# Dashboard statistics are shared by every open admin tab and refreshed in the background
+stats_cache = StatsCache()
+
+# Recent per-second/per-minute request metrics, read before going to usage_logs
+request_metrics = RequestMetrics()
+
+# Live counters pushed to dashboards over /admin/stream; recording a request here
+# also adds it to request_metrics
+dashboard_feed = DashboardFeed(request_metrics)
+STREAM_INTERVAL = int(os.getenv("ADMIN_STREAM_INTERVAL_MS", "500")) / 1000
+STREAM_SNAPSHOT_SECONDS = int(os.getenv("ADMIN_STREAM_SNAPSHOT_SECONDS", "60"))
+STREAM_HEARTBEAT_SECONDS = 15
+
+def rollup_window(period: timedelta):
+    """(start, end) strings covering the last `period` in whole hours, for db.get_usage_rollup"""
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    return ((now - period).strftime('%Y-%m-%d %H:%M:%S'),
+            (now + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S'))
+
 # --- HUGGINGFACE API MONITORING ---
 class HuggingFaceMonitor:
     def __init__(self):
@@ -56,33 +88,14 @@ class HuggingFaceMonitor:
             return {"error": "No API key configured"}
         
         try:
-            if DB_TYPE == "supabase":
-                # Get real usage data from Supabase
-                thirty_days_ago = datetime.now() - timedelta(days=30)
-                
-                # Query for AI-enhanced requests in the last 30 days
-                try:
-                    response = db.supabase.table('usage_logs').select('*').gte('timestamp', thirty_days_ago.isoformat()).eq('ai_model', 'huggingface').execute()
-                    requests_last_30_days = len(response.data) if response.data else 0
-                except Exception as e:
-                    print(f"WARNING: Error querying Supabase for API usage: {e}")
-                    requests_last_30_days = 0
-            else:
-                # SQLite fallback
-                import sqlite3
-                try:
-                    conn = sqlite3.connect("analytics.db")
-                    cursor = conn.cursor()
-                    thirty_days_ago = datetime.now() - timedelta(days=30)
-                    cursor.execute('''
-                        SELECT COUNT(*) FROM usage_logs 
-                        WHERE ai_enhanced = 1 AND timestamp >= ?
-                    ''', (thirty_days_ago,))
-                    requests_last_30_days = cursor.fetchone()[0]
-                    conn.close()
-                except Exception as e:
-                    print(f"WARNING: Error querying SQLite for API usage: {e}")
-                    requests_last_30_days = 0
+            # AI-enhanced requests in the last 30 days, from the hourly rollup (Supabase or SQLite)
+            try:
+                start, end = rollup_window(timedelta(days=30))
+                rows = db.get_usage_rollup(start, end)
+                requests_last_30_days = summarize_rollup(rows)['requests_by_model'].get('huggingface', 0)
+            except Exception as e:
+                print(f"WARNING: Error querying {DB_TYPE} for API usage: {e}")
+                requests_last_30_days = 0
             
             # Estimate tokens (rough calculation based on average email analysis)
             estimated_tokens_per_request = 100  # More realistic estimate
@@ -112,7 +125,7 @@ hf_monitor = HuggingFaceMonitor()
 # --- EMAIL ALERTS CONFIGURATION ---
 try:
     from email_alerts import EmailAlertSystem
-    email_alerts = EmailAlertSystem(db)
+    email_alerts = EmailAlertSystem(db, metrics=request_metrics)
     print("SUCCESS: Email alert system initialized")
 except Exception as e:
     print(f"WARNING: Email alerts initialization failed: {e}")
@@ -129,6 +142,23 @@ except Exception as e:
     print(f"ERROR: Error loading API keys: {e}")
     hf_api_key = None
 
+# Identical emails (resubmissions, /complete-rewrite re-scoring) reuse earlier results
+analysis_cache = AnalysisCache()
+local_analyzer = LocalEmailAnalyzer(cache=analysis_cache)
+
+# Sentiment source: "auto" (Hugging Face when a key is set, offline lexicon otherwise and as
+# its fallback), "lexicon" (offline only, no API calls) or "huggingface" (no lexicon fallback)
+SENTIMENT_MODE = os.getenv("SENTIMENT_MODE", "auto").lower()
+if SENTIMENT_MODE not in ("auto", "lexicon", "huggingface"):
+    print(f"WARNING: Unknown SENTIMENT_MODE '{SENTIMENT_MODE}', using 'auto'")
+    SENTIMENT_MODE = "auto"
+lexicon_sentiment = LexiconSentimentAnalyzer() if SENTIMENT_MODE != "huggingface" else None
+
+# One analyzer per process so AI requests share its pooled keep-alive connections
+hf_analyzer = None
+if hf_api_key and SENTIMENT_MODE != "lexicon":
+    hf_analyzer = HuggingFaceAnalyzer(hf_api_key, cache=analysis_cache, fallback_sentiment=lexicon_sentiment)
+
 # --- App Setup & CORS ---
 app = FastAPI(
     title="InboxQualify API", 
@@ -143,6 +173,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("shutdown")
+async def close_hf_analyzer():
+    """Close the Hugging Face analyzer's pooled connections and the analysis cache"""
+    if hf_analyzer:
+        await hf_analyzer.aclose()
+    analysis_cache.close()
+
+@app.on_event("shutdown")
+def flush_usage_logs():
+    """Write out queued usage log rows"""
+    if usage_log_writer:
+        usage_log_writer.close()
+    stats_cache.close()
+
 # Mount static files
 app.mount("/css", StaticFiles(directory="css"), name="css")
 app.mount("/js", StaticFiles(directory="js"), name="js")
@@ -215,25 +259,28 @@ async def analyze_with_ai(subject: str, body: str, request: Request) -> Analysis
     ai_model = None
     error_message = None
     
-    # Try Hugging Face first
-    if hf_api_key:
+    # Try Hugging Face first, unless its circuit breaker is open
+    if hf_analyzer and hf_analyzer.breaker.is_open():
+        print("INFO: Hugging Face circuit breaker open, skipping AI analysis")
+    elif hf_analyzer:
         try:
             print("INFO: Using Hugging Face AI for analysis...")
-            ai_model = "huggingface"
-            hf_analyzer = HuggingFaceAnalyzer(hf_api_key)
-            result_data = hf_analyzer.analyze_email_with_ai(subject, body)
+            result_data, sentiment_source = await hf_analyzer.analyze_email_with_ai_async(subject, body)
+            # Fallback models are Hugging Face calls too; the lexicon or no sentiment at all is local
+            ai_model = "huggingface" if hf_analyzer.is_ai_source(sentiment_source) else "local"
             
             response_time = time.time() - start_time
+            dashboard_feed.record(result_data["overallScore"], ai_model, response_time)
             
-            # Log to database if Supabase is available
-            if DB_TYPE == "supabase":
+            # Queue the usage log row; it is written to Supabase in the background
+            if usage_log_writer:
                 try:
                     classification = {
                         "breakdown": [cat.model_dump() for cat in AnalysisResult(**result_data).breakdown],
                         "verdict": result_data["verdict"]
                     }
                     
-                    db.log_email_analysis(
+                    usage_log_writer.log(
                         ip_address=ip_address,
                         email_content=f"Subject: {subject}\\n\\nBody: {body}",
                         sender_name="Unknown",
@@ -257,21 +304,24 @@ async def analyze_with_ai(subject: str, body: str, request: Request) -> Analysis
     # Fallback to local analyzer
     print("INFO: Using local rule-based analyzer...")
     ai_model = "local"
-    local_analyzer = LocalEmailAnalyzer()
     result_data = local_analyzer.analyze_email(subject, body)
+    if lexicon_sentiment:
+        apply_tone_adjustment(result_data, lexicon_sentiment.analyze(subject + " " + body), "Tone check")
+        result_data["verdict"] = local_analyzer.get_verdict(result_data["overallScore"])
     result_data["verdict"] += " (Local Analysis)"
     
     response_time = time.time() - start_time
+    dashboard_feed.record(result_data["overallScore"], ai_model, response_time, error_message or "")
     
-    # Log to database if Supabase is available
-    if DB_TYPE == "supabase":
+    # Queue the usage log row; it is written to Supabase in the background
+    if usage_log_writer:
         try:
             classification = {
                 "breakdown": result_data["breakdown"],
                 "verdict": result_data["verdict"]
             }
             
-            db.log_email_analysis(
+            usage_log_writer.log(
                 ip_address=ip_address,
                 email_content=f"Subject: {subject}\\n\\nBody: {body}",
                 sender_name="Unknown",
@@ -361,7 +411,12 @@ def health_check():
             "supabase": DB_TYPE == "supabase",
             "email_alerts": email_alerts is not None,
             "huggingface_ai": hf_api_key is not None
-        }
+        },
+        "sentiment_mode": SENTIMENT_MODE,
+        "analysis_cache": analysis_cache.stats(),
+        "usage_log_queue": usage_log_writer.stats() if usage_log_writer else None,
+        "stats_cache": stats_cache.stats(),
+        "sentiment_requests": hf_analyzer.sentiment_stats if hf_analyzer else None
     }
 
 @app.get("/app", response_class=HTMLResponse)
@@ -418,22 +473,41 @@ async def admin_dashboard(admin_user = Depends(get_current_admin)):
     except Exception as e:
         return HTMLResponse(f"<h1>Dashboard Error</h1><p>{str(e)}</p>", status_code=500)
 
+def load_dashboard_stats() -> dict:
+    """Overview statistics for the dashboard (cached, see stats_cache), plus this process's `live` figures"""
+    if DB_TYPE == "supabase":
+        stats = dict(stats_cache.get('stats', db.get_usage_stats))
+    else:
+        stats = {
+            "total_requests": 0,
+            "error_rate": 0,
+            "unique_users": 0,
+            "average_score": 0,
+            "ai_enhanced_requests": 0,
+            "avg_processing_time": 250,
+            "last_24h_requests": 0
+        }
+    
+    # request_metrics only sees this process, so it feeds the `live` block and never the database totals
+    last_5m = request_metrics.window(300, partial=True)
+    recent = request_metrics.window(24 * 3600, partial=True)
+    stats["live"] = {
+        "window_seconds": round(last_5m["window_seconds"]),
+        "requests": last_5m["total_requests"],
+        "requests_per_minute": round(last_5m["total_requests"] * 60 / max(last_5m["window_seconds"], 60), 2),
+        "error_rate": round(100 - last_5m["success_rate"], 2) if last_5m["total_requests"] else 0,
+        "ai_enhanced_requests": last_5m["requests_by_model"].get("huggingface", 0),
+        "response_time_p50": last_5m["response_time_p50"],
+        "response_time_p95": last_5m["response_time_p95"],
+        "avg_processing_time": round(recent["avg_response_time"] * 1000, 1) if recent["total_requests"] else None
+    }
+    return stats
+
 @app.get("/admin/stats")
 async def get_admin_stats(admin_user = Depends(get_current_admin), request: Request = None):
     """Get admin dashboard statistics"""
     try:
-        if DB_TYPE == "supabase":
-            stats = db.get_usage_stats()
-        else:
-            stats = {
-                "total_requests": 0,
-                "error_rate": 0,
-                "unique_users": 0,
-                "average_score": 0,
-                "ai_enhanced_requests": 0,
-                "avg_processing_time": 250,
-                "last_24h_requests": 0
-            }
+        stats = await run_in_threadpool(load_dashboard_stats)
         
         # Log admin action if supported
         try:
@@ -448,31 +522,72 @@ async def get_admin_stats(admin_user = Depends(get_current_admin), request: Requ
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Stats error: {str(e)}")
 
+@app.get("/admin/stream")
+async def stream_dashboard(request: Request, admin_user = Depends(get_current_admin)):
+    """Server-Sent Events feed for the dashboard.
+    
+    Sends a `snapshot` event (database statistics plus this process's live counters) on
+    connect and every ADMIN_STREAM_SNAPSHOT_SECONDS, and in between a `delta` event with
+    the requests answered since the previous event, at most every ADMIN_STREAM_INTERVAL_MS.
+    """
+    def event(name: str, data: dict) -> str:
+        return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+    
+    async def snapshot_event():
+        try:
+            stats = await run_in_threadpool(load_dashboard_stats)
+        except Exception as e:
+            print(f"WARNING: Dashboard stream snapshot failed: {e}")
+            stats = None
+        live = dashboard_feed.snapshot()
+        return live, event("snapshot", {"stats": stats, "live": live, "timestamp": datetime.now().isoformat()})
+    
+    async def events():
+        live, message = await snapshot_event()
+        yield "retry: 3000\n\n" + message
+        next_snapshot = time.monotonic() + STREAM_SNAPSHOT_SECONDS
+        next_heartbeat = time.monotonic() + STREAM_HEARTBEAT_SECONDS
+        while not await request.is_disconnected():
+            await asyncio.sleep(STREAM_INTERVAL)
+            now = time.monotonic()
+            if now >= next_snapshot:
+                live, message = await snapshot_event()
+                yield message
+                next_snapshot = now + STREAM_SNAPSHOT_SECONDS
+                next_heartbeat = now + STREAM_HEARTBEAT_SECONDS
+                continue
+            current = dashboard_feed.snapshot()
+            if current['seq'] != live['seq']:
+                yield event("delta", DashboardFeed.delta(live, current))
+                live = current
+                next_heartbeat = now + STREAM_HEARTBEAT_SECONDS
+            elif now >= next_heartbeat:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": heartbeat\n\n"
+                next_heartbeat = now + STREAM_HEARTBEAT_SECONDS
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/admin/analytics/daily")
-async def get_daily_analytics(admin_user = Depends(get_current_admin)):
-    """Get daily analytics for the last 7 days"""
+async def get_daily_analytics(days: int = 7, admin_user = Depends(get_current_admin)):
+    """Get daily analytics for the last `days` days (default 7)"""
     try:
         if DB_TYPE == "supabase" and hasattr(db, 'supabase'):
-            # Get daily stats from Supabase
-            daily_data = []
+            # One grouped query in Postgres instead of downloading every row of every day
+            days = min(max(days, 1), 366)
+            today = datetime.now().date()
+            start_date = (today - timedelta(days=days - 1)).isoformat()
+            end_date = (today + timedelta(days=1)).isoformat()
             
-            for i in range(6, -1, -1):  # Last 7 days
-                date = datetime.now() - timedelta(days=i)
-                start_date = date.strftime('%Y-%m-%d 00:00:00')
-                end_date = date.strftime('%Y-%m-%d 23:59:59')
-                
-                response = db.supabase.table('usage_logs').select('*').gte('timestamp', start_date).lte('timestamp', end_date).execute()
-                
-                total_requests = len(response.data) if response.data else 0
-                ai_enhanced_requests = len([log for log in response.data if log.get('ai_model') and log.get('ai_model') != 'none']) if response.data else 0
-                
-                daily_data.append({
-                    'date': date.strftime('%b %d'),
-                    'total_requests': total_requests,
-                    'ai_enhanced_requests': ai_enhanced_requests
-                })
-                
-            return daily_data
+            usage = await run_in_threadpool(
+                stats_cache.get, ('daily', start_date, end_date), lambda: db.get_daily_usage(start_date, end_date))
+            
+            return [{
+                'date': datetime.strptime(row['day'], '%Y-%m-%d').strftime('%b %d'),
+                'total_requests': row['total_requests'],
+                'ai_enhanced_requests': row['ai_enhanced_requests']
+            } for row in usage]
         else:
             # SQLite fallback or error - generate realistic dummy data
             import random
@@ -505,30 +620,15 @@ async def get_daily_analytics(admin_user = Depends(get_current_admin)):
 async def get_hourly_analytics(admin_user = Depends(get_current_admin)):
     """Get hourly analytics for today"""
     try:
-        if DB_TYPE == "supabase" and hasattr(db, 'supabase'):
-            # Get today's hourly stats from Supabase
+        if hasattr(db, 'get_usage_rollup'):
+            # Today's per-hour counts from the hourly rollup
             today = datetime.now()
             start_of_day = today.strftime('%Y-%m-%d 00:00:00')
-            end_of_day = today.strftime('%Y-%m-%d 23:59:59')
+            end_of_day = (today + timedelta(days=1)).strftime('%Y-%m-%d 00:00:00')
             
-            # Get all requests for today
-            response = db.supabase.table('usage_logs').select('*').gte('timestamp', start_of_day).lte('timestamp', end_of_day).execute()
-            
-            # Group by hour
-            hourly_data = {}
-            for hour in range(24):
-                hourly_data[hour] = 0
-            
-            if response.data:
-                for log in response.data:
-                    try:
-                        # Parse timestamp and extract hour
-                        log_time = datetime.fromisoformat(log['timestamp'].replace('Z', '+00:00'))
-                        hour = log_time.hour
-                        hourly_data[hour] = hourly_data.get(hour, 0) + 1
-                    except Exception as e:
-                        print(f"Error parsing timestamp: {e}")
-                        continue
+            rows = await run_in_threadpool(
+                stats_cache.get, ('hourly', start_of_day), lambda: db.get_usage_rollup(start_of_day, end_of_day))
+            hourly_data = {hour.hour: count for hour, count in requests_by_hour(rows).items()}
             
             # Format for frontend (only show hours up to current hour)
             current_hour = datetime.now().hour
@@ -541,7 +641,6 @@ async def get_hourly_analytics(admin_user = Depends(get_current_admin)):
             
             return formatted_data
         else:
-            # SQLite fallback - return empty data with message
             return []
             
     except Exception as e:
@@ -557,26 +656,19 @@ async def get_error_analytics(admin_user = Depends(get_current_admin)):
             # Get errors from the last 30 days
             thirty_days_ago = datetime.now() - timedelta(days=30)
             
-            response = db.supabase.table('usage_logs').select('error_message').gte('timestamp', thirty_days_ago.isoformat()).neq('error_message', '').neq('error_message', None).execute()
-            
-            # Aggregate errors
-            error_counts = {}
-            if response.data:
-                for log in response.data:
-                    error_msg = log.get('error_message', '').strip()
+            def count_errors():
+                # Stream the error rows page by page so all 30 days are counted
+                error_counts = {}
+                for log in db.iter_usage_logs(USAGE_LOG_ERROR_COLUMNS, thirty_days_ago.isoformat(), errors_only=True):
+                    error_msg = (log.get('error_message') or '').strip()
                     if error_msg and error_msg != '':
                         # Simplify error messages for grouping
-                        simplified_error = error_msg[:100]  # Truncate long errors
-                        if 'timeout' in error_msg.lower():
-                            simplified_error = 'API timeout'
-                        elif 'rate limit' in error_msg.lower():
-                            simplified_error = 'Rate limit exceeded'
-                        elif 'authentication' in error_msg.lower():
-                            simplified_error = 'Authentication failed'
-                        elif 'invalid' in error_msg.lower():
-                            simplified_error = 'Invalid request format'
-                        
+                        simplified_error = error_label(error_msg)
                         error_counts[simplified_error] = error_counts.get(simplified_error, 0) + 1
+                return error_counts
+            
+            # Aggregate errors
+            error_counts = await run_in_threadpool(stats_cache.get, 'errors', count_errors)
             
             # Convert to list and sort by count
             error_list = [{'error': error, 'count': count} for error, count in error_counts.items()]
@@ -605,12 +697,16 @@ async def get_advanced_analytics(
     try:
         if DB_TYPE == "supabase":
             # Convert None values to proper defaults for the Supabase method
-            analytics = db.get_advanced_analytics(
-                start_date=start_date,
-                end_date=end_date, 
-                ip_filter=ip_filter,
-                min_score=min_score,
-                max_score=max_score
+            analytics = await run_in_threadpool(
+                stats_cache.get,
+                ('advanced', start_date, end_date, ip_filter, min_score, max_score),
+                lambda: db.get_advanced_analytics(
+                    start_date=start_date,
+                    end_date=end_date, 
+                    ip_filter=ip_filter,
+                    min_score=min_score,
+                    max_score=max_score
+                )
             )
             
             # If no data found, provide sample data for testing
@@ -920,25 +1016,15 @@ async def generate_pdf_report(admin_user = Depends(get_current_admin), request:
     """Generate PDF report with analytics data"""
     try:
         # Get analytics data for the report
-        if DB_TYPE == "supabase":
-            # Get stats from Supabase
-            thirty_days_ago = (datetime.now() - timedelta(days=30)).isoformat()
-            
-            # Get usage stats
-            response = db.supabase.table('usage_logs').select('*').gte('timestamp', thirty_days_ago).execute()
-            usage_data = response.data if response.data else []
-            
-            # Calculate stats
-            total_requests = len(usage_data)
-            error_count = sum(1 for log in usage_data if log.get('error_message') is not None)
-            success_rate = ((total_requests - error_count) / total_requests * 100) if total_requests > 0 else 0
+        if hasattr(db, 'get_usage_rollup'):
+            # Last 30 days from the hourly rollup, plus one server-side distinct-IP count
+            start, end = rollup_window(timedelta(days=30))
+            summary = summarize_rollup(await run_in_threadpool(db.get_usage_rollup, start, end))
             
-            # Get unique IPs
-            unique_ips = len(set(log.get('ip_address') for log in usage_data if log.get('ip_address')))
-            
-            # Get average score
-            scores = [log.get('score') for log in usage_data if log.get('score') is not None]
-            avg_score = sum(scores) / len(scores) if scores else 0
+            total_requests = summary['total_requests']
+            success_rate = summary['success_rate']
+            unique_ips = await run_in_threadpool(db.get_unique_ip_count_between, start, end)
+            avg_score = summary['avg_score']
             
         else:
             # Fallback to SQLite
@@ -1079,8 +1165,7 @@ async def get_audit_log(admin_user = Depends(get_current_admin), request: Reques
     try:
         if DB_TYPE == "supabase" and hasattr(db, 'supabase'):
             # Get admin audit log from Supabase
-            response = db.supabase.table('admin_audit_log').select('*').order('timestamp', desc=True).limit(100).execute()
-            audit_logs = response.data if response.data else []
+            audit_logs = await run_in_threadpool(db.get_admin_audit_log, 100)
         else:
             # Return empty audit log for now
             audit_logs = []
@@ -1121,6 +1206,8 @@ async def admin_health_check(admin_user = Depends(get_current_admin)):
         health["database_type"] = DB_TYPE
         health["email_alerts"] = email_alerts is not None
         health["ai_service"] = "huggingface" if hf_api_key else "local"
+        if hf_analyzer:
+            health["ai_circuit_breaker"] = hf_analyzer.breaker.stats()
         
         return health
     except Exception as e:
@@ -1154,19 +1241,11 @@ async def create_test_data(admin_user = Depends(get_current_admin)):
                 }
                 test_entries.append(test_entry)
             
-            # Insert test data
-            for entry in test_entries:
-                db.log_email_analysis(
-                    entry["ip_address"],
-                    entry["email_content"], 
-                    entry["sender_name"],
-                    entry["sender_email"],
-                    entry["score"],
-                    entry["response_time"],
-                    entry["ai_model"],
-                    entry["error_message"],
-                    entry["classification"]
-                )
+            # Insert test data in one multi-row request
+            db.log_email_analyses([
+                {key: value for key, value in entry.items() if key != "timestamp"}
+                for entry in test_entries
+            ])
             
             return {"message": f"Created {len(test_entries)} test entries successfully"}
         else:
@@ -1177,15 +1256,29 @@ async def create_test_data(admin_user = Depends(get_current_admin)):
 # --- EMAIL TEMPLATES & SUGGESTIONS ENDPOINTS ---
 
 # Import template classes
-from enhanced_features import EmailTemplateGenerator, EmailSuggestionEngine, EmailRewriter, BatchAnalyzer, CampaignTracker
+from enhanced_features import (
+    EmailTemplateGenerator, EmailSuggestionEngine, EmailRewriter, BatchAnalyzer,
+    BatchJobQueue, BatchQueueFullError, BatchUploadStore, CsvEmailSource, CampaignTracker
+)
 
 # Initialize template and suggestion engines
 template_generator = EmailTemplateGenerator()
 suggestion_engine = EmailSuggestionEngine()
 email_rewriter = EmailRewriter()
-batch_analyzer = BatchAnalyzer(suggestion_engine, email_rewriter)
+batch_analyzer = BatchAnalyzer(suggestion_engine, email_rewriter, sentiment_analyzer=hf_analyzer or lexicon_sentiment,
+                               local_analyzer=local_analyzer)
+batch_job_queue = BatchJobQueue(batch_analyzer)
+batch_upload_store = BatchUploadStore()
 campaign_tracker = CampaignTracker()
 
+@app.on_event("shutdown")
+def shutdown_batch_workers():
+    """Stop background batch jobs and the batch analysis worker processes"""
+    batch_job_queue.shutdown()
+    batch_analyzer.shutdown()
+    batch_analyzer.batch_results.close()
+    batch_upload_store.shutdown()
+
 class TemplateRequest(BaseModel):
     industry: str
     variables: Optional[dict] = None
@@ -1200,10 +1293,13 @@ class RewriteRequest(BaseModel):
     context: Optional[dict] = None
 
 class BatchAnalysisRequest(BaseModel):
-    csv_content: str
+    upload_id: Optional[str] = None  # From /batch/upload-csv
+    csv_content: Optional[str] = None  # Inline CSV, for small batches
     include_rewrite: bool = False
+    include_sentiment: bool = False  # AI tone per email; needs HUGGINGFACE_API_KEY
     campaign_name: Optional[str] = None
     campaign_description: Optional[str] = None
+    background: bool = True  # Set to False to wait for the full result in this request
 
 @app.get("/templates")
 async def get_all_templates():
@@ -1421,117 +1517,241 @@ async def complete_email_rewrite(request: RewriteRequest, user_request: Request)
 
 # --- BATCH ANALYSIS ENDPOINTS ---
 
+# Bytes read from an uploaded CSV at a time
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 @app.post("/batch/upload-csv")
 async def upload_csv_batch(file: UploadFile = File(...)):
     """Upload CSV file for batch analysis"""
+    upload = None
     try:
         # Validate file type
         if not file.filename or not file.filename.endswith('.csv'):
             raise HTTPException(status_code=400, detail="File must be a CSV")
         
-        # Read CSV content
-        content = await file.read()
-        csv_content = content.decode('utf-8')
-        
-        # Parse and validate CSV
-        emails = batch_analyzer.parse_csv_content(csv_content)
-        
-        if not emails:
+        # Stream the file to disk chunk by chunk, checking it decodes as UTF-8 on the way
+        upload = batch_upload_store.create(file.filename)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            with open(upload['path'], 'wb') as upload_file:
+                while True:
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    decoder.decode(chunk)
+                    upload_file.write(chunk)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="CSV file must be UTF-8 encoded")
+        
+        # Parse and validate CSV without loading it all into memory
+        emails = CsvEmailSource(batch_analyzer, upload['path'])
+        preview = await run_in_threadpool(emails.scan)
+        
+        if not len(emails):
             raise HTTPException(status_code=400, detail="No valid email data found in CSV")
+        upload['emails'] = emails
         
         return {
             "data": {
+                "upload_id": upload['upload_id'],  # Pass to /batch/analyze
                 "filename": file.filename,
                 "email_count": len(emails),
-                "preview": emails[:3],  # First 3 emails as preview
-                "csv_content": csv_content  # Store for analysis
+                "preview": preview  # First 3 emails as preview
             },
             "status": "success",
             "timestamp": datetime.now().isoformat(),
             "message": f"CSV uploaded successfully with {len(emails)} emails"
         }
         
+    except HTTPException:
+        if upload:
+            batch_upload_store.delete(upload['upload_id'])
+        raise
     except Exception as e:
+        if upload:
+            batch_upload_store.delete(upload['upload_id'])
         raise HTTPException(status_code=500, detail=f"CSV upload failed: {str(e)}")
 
 @app.post("/batch/analyze")
 async def analyze_batch_emails(request: BatchAnalysisRequest):
-    """Analyze a batch of emails from CSV content"""
+    """Queue a batch of emails from CSV content for analysis"""
+    upload_id = None
+    analyzed = False  # Set once a batch has run over the upload
+    handed_off = False  # Set once a queued job owns the upload's pin
     try:
-        # Parse emails from CSV
-        emails = batch_analyzer.parse_csv_content(request.csv_content)
+        if request.upload_id:
+            # Pinned so it can't expire while the job waits; released when the batch is done
+            upload = batch_upload_store.pin(request.upload_id)
+            if not upload:
+                raise HTTPException(status_code=404, detail="Upload not found or expired, please upload the CSV again")
+            upload_id = upload['upload_id']
+            emails = upload['emails']
+        elif request.csv_content:
+            # Parse emails from CSV
+            emails = batch_analyzer.parse_csv_content(request.csv_content)
+        else:
+            raise HTTPException(status_code=400, detail="Provide an upload_id or csv_content")
         
-        if not emails:
+        if not len(emails):
             raise HTTPException(status_code=400, detail="No valid emails to analyze")
         
-        # Perform batch analysis
-        batch_result = batch_analyzer.analyze_batch(emails, request.include_rewrite)
-        
-        # Create campaign if specified
-        if request.campaign_name:
-            campaign_id = campaign_tracker.create_campaign(
-                request.campaign_name, 
-                request.campaign_description or ""
+        def create_campaign(batch_result):
+            """Create campaign if specified"""
+            if request.campaign_name:
+                campaign_id = campaign_tracker.create_campaign(
+                    request.campaign_name, 
+                    request.campaign_description or ""
+                )
+                campaign_tracker.add_batch_to_campaign(campaign_id, batch_result)
+                batch_result['campaign_id'] = campaign_id
+        
+        if not request.background:
+            # Synchronous mode runs off the event loop so other requests aren't blocked
+            analyzed = True
+            batch_result = await run_in_threadpool(
+                batch_analyzer.analyze_batch, emails, request.include_rewrite,
+                include_sentiment=request.include_sentiment
             )
-            campaign_tracker.add_batch_to_campaign(campaign_id, batch_result)
-            batch_result['campaign_id'] = campaign_id
+            create_campaign(batch_result)
+            return {
+                "data": batch_result,
+                "status": "success",
+                "timestamp": datetime.now().isoformat(),
+                "message": f"Analyzed {batch_result['summary']['processed_emails']} emails successfully"
+            }
+        
+        def release_upload():
+            if upload_id:
+                batch_upload_store.release(upload_id)
+        
+        job = batch_job_queue.submit(
+            emails, request.include_rewrite, on_complete=create_campaign,
+            include_sentiment=request.include_sentiment, on_finish=release_upload
+        )
+        handed_off = True
         
         return {
-            "data": batch_result,
+            "data": {"batch_id": job["batch_id"], "job": job},
             "status": "success",
             "timestamp": datetime.now().isoformat(),
-            "message": f"Analyzed {batch_result['summary']['processed_emails']} emails successfully"
+            "message": f"Batch of {len(emails)} emails queued for analysis"
         }
         
+    except HTTPException:
+        raise
+    except BatchQueueFullError as e:
+        raise HTTPException(status_code=429, detail=f"{str(e)}, please try again later")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
+    finally:
+        if upload_id and not handed_off:
+            # Kept for a retry (e.g. after a 429) unless a batch already ran over it
+            batch_upload_store.release(upload_id, delete=analyzed)
 
 @app.get("/batch/result/{batch_id}")
 async def get_batch_result(batch_id: str):
-    """Get batch analysis result by ID"""
+    """Get batch analysis result by ID, or its progress while it is still running"""
     try:
-        result = batch_analyzer.get_batch_result(batch_id)
+        job = batch_job_queue.get_job(batch_id)
+        result = await run_in_threadpool(batch_analyzer.get_batch_result, batch_id)
         
-        if not result:
+        if not job and not result:
             raise HTTPException(status_code=404, detail="Batch result not found")
         
+        data = dict(result) if result else {"batch_id": batch_id}
+        if job:
+            data["job"] = job
+        
+        status_name = job["status"] if job else result["status"]
+        if status_name in ("queued", "running"):
+            message = f"Batch is {status_name}: {job['processed_emails']}/{job['total_emails']} emails analyzed"
+        elif status_name == "cancelled":
+            message = "Batch was cancelled; partial results retrieved" if result else "Batch was cancelled"
+        elif status_name == "failed":
+            message = f"Batch analysis failed: {job['error']}"
+        else:
+            message = "Batch result retrieved successfully"
+        
         return {
-            "data": result,
+            "data": data,
             "status": "success",
             "timestamp": datetime.now().isoformat(),
-            "message": "Batch result retrieved successfully"
+            "message": message
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve batch result: {str(e)}")
 
+@app.post("/batch/cancel/{batch_id}")
+async def cancel_batch(batch_id: str):
+    """Cancel a queued or running batch; emails already analyzed are kept"""
+    try:
+        job = batch_job_queue.cancel(batch_id)
+        
+        if not job:
+            raise HTTPException(status_code=404, detail="Batch job not found")
+        
+        return {
+            "data": job,
+            "status": "success",
+            "timestamp": datetime.now().isoformat(),
+            "message": "Cancellation requested" if job["status"] == "running" else f"Batch is {job['status']}"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to cancel batch: {str(e)}")
+
 @app.get("/batch/export/{batch_id}")
-async def export_batch_csv(batch_id: str):
-    """Export batch analysis results as CSV"""
+async def export_batch_csv(batch_id: str, gzip: bool = False):
+    """Export batch analysis results as CSV, streamed in chunks (gzip-compressed with ?gzip=true)"""
     try:
-        result = batch_analyzer.get_batch_result(batch_id)
+        result = await run_in_threadpool(batch_analyzer.get_batch_result, batch_id)
         
         if not result:
             raise HTTPException(status_code=404, detail="Batch result not found")
         
-        csv_content = batch_analyzer.generate_csv_report(result)
-        
-        # Create streaming response
-        def iter_csv():
-            yield csv_content
-        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"email_analysis_batch_{batch_id[:8]}_{timestamp}.csv"
+        if gzip:
+            filename += ".gz"
         
         return StreamingResponse(
-            iter_csv(),
-            media_type="text/csv",
+            batch_analyzer.iter_csv_report(result, compress=gzip),
+            media_type="application/gzip" if gzip else "text/csv",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"CSV export failed: {str(e)}")
 
+@app.get("/admin/batch/stats")
+async def get_batch_stats(admin_user = Depends(get_current_admin)):
+    """Get batch job and batch result store statistics"""
+    try:
+        job_counts = {}
+        for job in list(batch_job_queue.jobs.values()):
+            job_counts[job['status']] = job_counts.get(job['status'], 0) + 1
+        
+        return {
+            "data": {
+                "jobs": job_counts,
+                "result_store": batch_analyzer.batch_results.stats()
+            },
+            "status": "success",
+            "timestamp": datetime.now().isoformat(),
+            "message": "Batch statistics retrieved successfully"
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get batch statistics: {str(e)}")
+
 # --- CAMPAIGN TRACKING ENDPOINTS ---
 
 @app.post("/campaigns/create")
@@ -1605,7 +1825,7 @@ async def list_campaigns():
 async def get_huggingface_usage(admin_user = Depends(get_current_admin)):
     """Get Hugging Face API usage information"""
     try:
-        usage_data = hf_monitor.get_api_usage()
+        usage_data = await run_in_threadpool(stats_cache.get, 'huggingface_usage', hf_monitor.get_api_usage)
         return {
             "data": usage_data,
             "status": "success",
@@ -0,0 +1,150 @@
+# request_metrics.py - Fixed-size in-memory time series of request metrics
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from usage_rollup import RESPONSE_TIME_BUCKETS, SCORE_BUCKETS, SUM_COLUMNS, summarize_rollup
+
+MODELS = ('huggingface', 'local')
+_INDEX = {column: i for i, column in enumerate(SUM_COLUMNS)}
+
+
+class MetricsRing:
+    """`slots` buckets of `resolution` seconds, reused as time comes round again.
+
+    Each bucket holds, per ai_model, the same columns as a usage_rollup_hourly row
+    (see usage_rollup.py), so windows summarize exactly like the database rollup.
+    """
+
+    def __init__(self, resolution: int, slots: int):
+        self.resolution = resolution
+        self.slots = max(1, slots)
+        self._bucket = [-1] * self.slots  # Which bucket number each slot currently holds
+        self._sums = [[[0] * len(SUM_COLUMNS) for _ in MODELS] for _ in range(self.slots)]
+        self._extremes = [[[None, None, None] for _ in MODELS] for _ in range(self.slots)]  # score min/max, rt max
+
+    @property
+    def span(self) -> int:
+        """Seconds of history the ring holds"""
+        return self.resolution * self.slots
+
+    def add(self, now: float, model: int, sample: List[float], score: Optional[float],
+            response_time: Optional[float]):
+        bucket = int(now // self.resolution)
+        slot = bucket % self.slots
+        if self._bucket[slot] != bucket:
+            self._bucket[slot] = bucket
+            for sums, extremes in zip(self._sums[slot], self._extremes[slot]):
+                sums[:] = [0] * len(SUM_COLUMNS)
+                extremes[:] = [None, None, None]
+
+        sums = self._sums[slot][model]
+        for i, amount in enumerate(sample):
+            if amount:
+                sums[i] += amount
+        extremes = self._extremes[slot][model]
+        if score is not None:
+            extremes[0] = score if extremes[0] is None else min(extremes[0], score)
+            extremes[1] = score if extremes[1] is None else max(extremes[1], score)
+        if response_time is not None:
+            extremes[2] = response_time if extremes[2] is None else max(extremes[2], response_time)
+
+    def rows(self, start: float, end: float) -> List[Dict[str, Any]]:
+        """One rollup-shaped row per ai_model, covering the buckets from start to end"""
+        first = max(int(start // self.resolution), int(end // self.resolution) - self.slots + 1)
+        last = int(end // self.resolution)
+        totals = [[0] * len(SUM_COLUMNS) for _ in MODELS]
+        extremes = [[None, None, None] for _ in MODELS]
+        for bucket in range(first, last + 1):
+            slot = bucket % self.slots
+            if self._bucket[slot] != bucket:
+                continue
+            for model in range(len(MODELS)):
+                totals[model] = [a + b for a, b in zip(totals[model], self._sums[slot][model])]
+                low, high, slowest = self._extremes[slot][model]
+                current = extremes[model]
+                if low is not None:
+                    current[0] = low if current[0] is None else min(current[0], low)
+                    current[1] = high if current[1] is None else max(current[1], high)
+                if slowest is not None:
+                    current[2] = slowest if current[2] is None else max(current[2], slowest)
+
+        return [{
+            'ai_model': name,
+            **dict(zip(SUM_COLUMNS, totals[model])),
+            'score_min': extremes[model][0],
+            'score_max': extremes[model][1],
+            'response_time_max': extremes[model][2]
+        } for model, name in enumerate(MODELS)]
+
+
+class RequestMetrics:
+    """Per-second and per-minute time series of the requests this process answers.
+
+    `record` is called on the request path as each analysis completes and costs a few
+    microseconds under a short lock. Memory is fixed by the slot counts, whatever the
+    traffic. `window(seconds)` summarizes the last `seconds` in the same shape as
+    usage_rollup.summarize_rollup, or returns None when the buffer cannot answer it
+    (longer than the ring, or than this process has been running) and the caller
+    should go to the database. Counts cover this process only.
+    """
+
+    def __init__(self, second_slots: Optional[int] = None, minute_slots: Optional[int] = None):
+        if second_slots is None:
+            second_slots = int(os.getenv("METRICS_SECOND_SLOTS", "300"))
+        if minute_slots is None:
+            minute_slots = int(os.getenv("METRICS_MINUTE_SLOTS", "1440"))
+        self.seconds = MetricsRing(1, second_slots)
+        self.minutes = MetricsRing(60, minute_slots)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, score: Optional[float], ai_model: str, response_time: Optional[float],
+               error_message: str = "", now: Optional[float] = None):
+        """Count one completed request"""
+        sample = [0] * len(SUM_COLUMNS)
+        sample[_INDEX['request_count']] = 1
+        if error_message:
+            sample[_INDEX['error_count']] = 1
+        if score is not None:
+            sample[_INDEX['score_count']] = 1
+            sample[_INDEX['score_sum']] = score
+            sample[_INDEX['score_sum_sq']] = score * score
+            for _, column, low, high in SCORE_BUCKETS:
+                if low <= score <= high:
+                    sample[_INDEX[column]] = 1
+                    break
+        if response_time is not None:
+            sample[_INDEX['response_time_count']] = 1
+            sample[_INDEX['response_time_sum']] = response_time
+            for bound, column in RESPONSE_TIME_BUCKETS:
+                if bound is None or response_time <= bound:
+                    sample[_INDEX[column]] = 1
+                    break
+        model = MODELS.index(ai_model) if ai_model in MODELS else MODELS.index('local')
+
+        now = time.time() if now is None else now
+        with self._lock:
+            self.seconds.add(now, model, sample, score, response_time)
+            self.minutes.add(now, model, sample, score, response_time)
+
+    def covers(self, seconds: float, now: Optional[float] = None) -> bool:
+        """Whether the last `seconds` are fully in the buffer"""
+        now = time.time() if now is None else now
+        return seconds <= self.minutes.span and now - seconds >= self.started_at
+
+    def window(self, seconds: float, partial: bool = False, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Summary of the last `seconds`; None if not covered, unless `partial` accepts what is held"""
+        now = time.time() if now is None else now
+        if not self.covers(seconds, now):
+            if not partial:
+                return None
+            seconds = min(seconds, self.minutes.span, now - self.started_at)
+        ring = self.seconds if seconds <= self.seconds.span else self.minutes
+        with self._lock:
+            rows = ring.rows(now - seconds, now)
+        summary = summarize_rollup(rows)
+        summary['window_seconds'] = seconds
+        return summary
@@ -0,0 +1,123 @@
+# stats_cache.py - TTL cache with stale-while-revalidate for admin dashboard statistics
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class StatsCache:
+    """Serve dashboard statistics from memory so N open dashboards cost one set of queries.
+
+    `get(key, loader)` returns the cached value while it is younger than `ttl_seconds`.
+    Once it is older, the old value is still returned immediately and a refresh is queued
+    on a single background thread, so at most one refresh runs at a time and a key is never
+    queued twice. Values older than `max_stale_seconds`, and keys not cached yet, are loaded
+    in the caller's thread; concurrent callers for the same key wait for that one load.
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_stale_seconds: Optional[int] = None,
+                 max_items: Optional[int] = None):
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv("ADMIN_STATS_TTL", "30"))
+        if max_stale_seconds is None:
+            max_stale_seconds = int(os.getenv("ADMIN_STATS_MAX_STALE", "600"))
+        if max_items is None:
+            max_items = int(os.getenv("ADMIN_STATS_CACHE_SIZE", "256"))
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max(ttl_seconds, max_stale_seconds)
+        self.max_items = max(1, max_items)
+
+        self._entries = OrderedDict()  # key -> (loaded_at, value)
+        self._lock = threading.Lock()
+        # key -> [lock held while loading it in a caller's thread, callers holding or waiting on it]
+        self._key_locks = {}
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stats-cache")
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Cached value for key, calling loader() to fill or refresh it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry[0]
+                if age < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return entry[1]
+                if age < self.max_stale_seconds:
+                    self._entries.move_to_end(key)
+                    self.counters['stale_hits'] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._refresher.submit(self._refresh, key, loader)
+                    return entry[1]
+            # The lock is only dropped once nobody holds or waits on it, so after a failed
+            # load the waiters still retry one at a time instead of all at once
+            key_lock = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+
+        try:
+            with key_lock[0]:
+                # Another caller may have loaded it while we waited
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+                        self.counters['hits'] += 1
+                        return entry[1]
+                    self.counters['misses'] += 1
+                value = loader()
+                self._store(key, value)
+                return value
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[key]
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or everything"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and hit counters"""
+        with self._lock:
+            return {
+                **self.counters,
+                'entries': len(self._entries),
+                'refreshing': len(self._refreshing),
+                'ttl_seconds': self.ttl_seconds
+            }
+
+    def close(self):
+        """Stop the refresh thread (queued refreshes are skipped)"""
+        self._refresher.shutdown(wait=False, cancel_futures=True)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]):
+        try:
+            self._store(key, loader())
+            with self._lock:
+                self.counters['refreshes'] += 1
+        except Exception as e:
+            # Keep serving the stale value; the next read past the TTL queues another try
+            print(f"WARNING: Stats refresh for {key!r} failed: {e}")
+            with self._lock:
+                self.counters['refresh_errors'] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
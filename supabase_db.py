@@ -5,15 +5,34 @@ Enhanced database management with cloud PostgreSQL for seamless deployment
 
 import os
 import hashlib
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterator
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
+from usage_rollup import SCORE_BUCKETS, is_ai_enhanced, requests_by_hour, summarize_rollup
 from dotenv import load_dotenv
 import json
 
 # Load environment variables
 load_dotenv()
 
+# Explicit column lists per use case, so reads never drag email_content / classification
+# over the wire unless they are needed. Lists used with iter_usage_logs include id and timestamp.
+USAGE_LOG_LIST_COLUMNS = 'id,timestamp,ip_address,sender_name,sender_email,score,response_time,ai_model,error_message'
+USAGE_LOG_STATS_COLUMNS = 'id,timestamp,ip_address,score,error_message'
+USAGE_LOG_ERROR_COLUMNS = 'id,timestamp,error_message'
+AUDIT_LOG_COLUMNS = 'id,timestamp,admin_username,action,details,ip_address'
+ADMIN_USER_COLUMNS = 'id,username,email,role,is_active,created_at,last_login'
+
+# How _insert_chunk treats a failed bulk insert, by SQLSTATE class (the code's first two characters):
+# data exceptions and constraint violations are row-level, so splitting the chunk isolates the bad
+# rows; connection, rollback, resource and operator-intervention errors are worth retrying.
+ROW_ERROR_SQLSTATE_CLASSES = ('22', '23')
+TRANSIENT_SQLSTATE_CLASSES = ('08', '40', '53', '57')
+# PostgREST's own codes for not reaching the database (503/504)
+TRANSIENT_POSTGREST_CODES = ('PGRST000', 'PGRST001', 'PGRST002', 'PGRST003')
+
 class SupabaseDB:
     def __init__(self):
         """Initialize Supabase client with configuration from environment variables"""
@@ -31,6 +50,13 @@ class SupabaseDB:
             # Still create client, but with awareness of potential SSL issues
             self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
         
+        # Bulk inserts: rows per request, approximate JSON payload cap and retries per request
+        self.bulk_max_rows = int(os.getenv('SUPABASE_BULK_MAX_ROWS', '500'))
+        self.bulk_max_bytes = int(os.getenv('SUPABASE_BULK_MAX_KB', '1024')) * 1024
+        self.bulk_retries = int(os.getenv('SUPABASE_BULK_RETRIES', '2'))
+        # Rows per page for keyset-paginated scans (keep at or below PostgREST's max-rows)
+        self.page_size = int(os.getenv('SUPABASE_PAGE_SIZE', '1000'))
+        
         # Initialize database schema on first connection
         self.initialize_database()
     
@@ -132,6 +158,147 @@ class SupabaseDB:
         CREATE INDEX IF NOT EXISTS idx_usage_logs_score ON usage_logs(score);
         CREATE INDEX IF NOT EXISTS idx_admin_audit_timestamp ON admin_audit_log(timestamp);
         CREATE INDEX IF NOT EXISTS idx_admin_users_username ON admin_users(username);
+
+        -- Per-day request counts for the admin dashboard, aggregated server-side
+        CREATE OR REPLACE FUNCTION get_daily_usage(start_ts TIMESTAMP WITH TIME ZONE, end_ts TIMESTAMP WITH TIME ZONE)
+        RETURNS TABLE (day DATE, total_requests BIGINT, ai_enhanced_requests BIGINT)
+        LANGUAGE sql STABLE AS $$
+            SELECT date_trunc('day', timestamp)::date AS day,
+                   COUNT(*) AS total_requests,
+                   COUNT(*) FILTER (WHERE ai_model IS NOT NULL AND ai_model <> 'none') AS ai_enhanced_requests
+            FROM usage_logs
+            WHERE timestamp >= start_ts AND timestamp < end_ts
+            GROUP BY 1
+            ORDER BY 1;
+        $$;
+
+        -- Hourly rollup of usage_logs per ai_model, maintained by the trigger below so dashboards
+        -- read one row per hour instead of scanning raw logs (buckets match usage_rollup.py)
+        CREATE TABLE IF NOT EXISTS usage_rollup_hourly (
+            hour TIMESTAMP WITH TIME ZONE NOT NULL,
+            ai_model TEXT NOT NULL,
+            request_count BIGINT NOT NULL DEFAULT 0,
+            error_count BIGINT NOT NULL DEFAULT 0,
+            score_count BIGINT NOT NULL DEFAULT 0,
+            score_sum BIGINT NOT NULL DEFAULT 0,
+            score_sum_sq BIGINT NOT NULL DEFAULT 0,
+            score_min INTEGER,
+            score_max INTEGER,
+            score_0_20 BIGINT NOT NULL DEFAULT 0,
+            score_21_40 BIGINT NOT NULL DEFAULT 0,
+            score_41_60 BIGINT NOT NULL DEFAULT 0,
+            score_61_80 BIGINT NOT NULL DEFAULT 0,
+            score_81_100 BIGINT NOT NULL DEFAULT 0,
+            response_time_count BIGINT NOT NULL DEFAULT 0,
+            response_time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            response_time_max REAL,
+            rt_le_250ms BIGINT NOT NULL DEFAULT 0,
+            rt_le_500ms BIGINT NOT NULL DEFAULT 0,
+            rt_le_1s BIGINT NOT NULL DEFAULT 0,
+            rt_le_2s BIGINT NOT NULL DEFAULT 0,
+            rt_le_5s BIGINT NOT NULL DEFAULT 0,
+            rt_gt_5s BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, ai_model)
+        );
+
+        -- Fold each INSERT statement's rows (one or many) into the rollup with a single upsert
+        CREATE OR REPLACE FUNCTION rollup_usage_logs() RETURNS TRIGGER
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO usage_rollup_hourly AS r (
+                    hour, ai_model, request_count, error_count, score_count, score_sum, score_sum_sq,
+                    score_min, score_max, score_0_20, score_21_40, score_41_60, score_61_80, score_81_100,
+                    response_time_count, response_time_sum, response_time_max,
+                    rt_le_250ms, rt_le_500ms, rt_le_1s, rt_le_2s, rt_le_5s, rt_gt_5s)
+                SELECT date_trunc('hour', timestamp), COALESCE(ai_model, 'none'),
+                       COUNT(*),
+                       COUNT(*) FILTER (WHERE error_message IS NOT NULL AND error_message <> ''),
+                       COUNT(score), COALESCE(SUM(score), 0), COALESCE(SUM(score::BIGINT * score), 0),
+                       MIN(score), MAX(score),
+                       COUNT(*) FILTER (WHERE score BETWEEN 0 AND 20),
+                       COUNT(*) FILTER (WHERE score BETWEEN 21 AND 40),
+                       COUNT(*) FILTER (WHERE score BETWEEN 41 AND 60),
+                       COUNT(*) FILTER (WHERE score BETWEEN 61 AND 80),
+                       COUNT(*) FILTER (WHERE score BETWEEN 81 AND 100),
+                       COUNT(response_time), COALESCE(SUM(response_time), 0), MAX(response_time),
+                       COUNT(*) FILTER (WHERE response_time <= 0.25),
+                       COUNT(*) FILTER (WHERE response_time > 0.25 AND response_time <= 0.5),
+                       COUNT(*) FILTER (WHERE response_time > 0.5 AND response_time <= 1),
+                       COUNT(*) FILTER (WHERE response_time > 1 AND response_time <= 2),
+                       COUNT(*) FILTER (WHERE response_time > 2 AND response_time <= 5),
+                       COUNT(*) FILTER (WHERE response_time > 5)
+                FROM new_rows
+                GROUP BY 1, 2
+            ON CONFLICT (hour, ai_model) DO UPDATE SET
+                request_count = r.request_count + EXCLUDED.request_count,
+                error_count = r.error_count + EXCLUDED.error_count,
+                score_count = r.score_count + EXCLUDED.score_count,
+                score_sum = r.score_sum + EXCLUDED.score_sum,
+                score_sum_sq = r.score_sum_sq + EXCLUDED.score_sum_sq,
+                score_min = LEAST(r.score_min, EXCLUDED.score_min),
+                score_max = GREATEST(r.score_max, EXCLUDED.score_max),
+                score_0_20 = r.score_0_20 + EXCLUDED.score_0_20,
+                score_21_40 = r.score_21_40 + EXCLUDED.score_21_40,
+                score_41_60 = r.score_41_60 + EXCLUDED.score_41_60,
+                score_61_80 = r.score_61_80 + EXCLUDED.score_61_80,
+                score_81_100 = r.score_81_100 + EXCLUDED.score_81_100,
+                response_time_count = r.response_time_count + EXCLUDED.response_time_count,
+                response_time_sum = r.response_time_sum + EXCLUDED.response_time_sum,
+                response_time_max = GREATEST(r.response_time_max, EXCLUDED.response_time_max),
+                rt_le_250ms = r.rt_le_250ms + EXCLUDED.rt_le_250ms,
+                rt_le_500ms = r.rt_le_500ms + EXCLUDED.rt_le_500ms,
+                rt_le_1s = r.rt_le_1s + EXCLUDED.rt_le_1s,
+                rt_le_2s = r.rt_le_2s + EXCLUDED.rt_le_2s,
+                rt_le_5s = r.rt_le_5s + EXCLUDED.rt_le_5s,
+                rt_gt_5s = r.rt_gt_5s + EXCLUDED.rt_gt_5s;
+            RETURN NULL;
+        END;
+        $$;
+
+        DROP TRIGGER IF EXISTS usage_logs_rollup ON usage_logs;
+        CREATE TRIGGER usage_logs_rollup
+            AFTER INSERT ON usage_logs
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION rollup_usage_logs();
+
+        -- Recompute the rollup from usage_logs (run once after creating it, or to repair it)
+        CREATE OR REPLACE FUNCTION rebuild_usage_rollup() RETURNS VOID
+        LANGUAGE sql AS $$
+            TRUNCATE usage_rollup_hourly;
+            INSERT INTO usage_rollup_hourly (
+                    hour, ai_model, request_count, error_count, score_count, score_sum, score_sum_sq,
+                    score_min, score_max, score_0_20, score_21_40, score_41_60, score_61_80, score_81_100,
+                    response_time_count, response_time_sum, response_time_max,
+                    rt_le_250ms, rt_le_500ms, rt_le_1s, rt_le_2s, rt_le_5s, rt_gt_5s)
+                SELECT date_trunc('hour', timestamp), COALESCE(ai_model, 'none'),
+                       COUNT(*),
+                       COUNT(*) FILTER (WHERE error_message IS NOT NULL AND error_message <> ''),
+                       COUNT(score), COALESCE(SUM(score), 0), COALESCE(SUM(score::BIGINT * score), 0),
+                       MIN(score), MAX(score),
+                       COUNT(*) FILTER (WHERE score BETWEEN 0 AND 20),
+                       COUNT(*) FILTER (WHERE score BETWEEN 21 AND 40),
+                       COUNT(*) FILTER (WHERE score BETWEEN 41 AND 60),
+                       COUNT(*) FILTER (WHERE score BETWEEN 61 AND 80),
+                       COUNT(*) FILTER (WHERE score BETWEEN 81 AND 100),
+                       COUNT(response_time), COALESCE(SUM(response_time), 0), MAX(response_time),
+                       COUNT(*) FILTER (WHERE response_time <= 0.25),
+                       COUNT(*) FILTER (WHERE response_time > 0.25 AND response_time <= 0.5),
+                       COUNT(*) FILTER (WHERE response_time > 0.5 AND response_time <= 1),
+                       COUNT(*) FILTER (WHERE response_time > 1 AND response_time <= 2),
+                       COUNT(*) FILTER (WHERE response_time > 2 AND response_time <= 5),
+                       COUNT(*) FILTER (WHERE response_time > 5)
+                FROM usage_logs
+                GROUP BY 1, 2;
+        $$;
+
+        SELECT rebuild_usage_rollup();
+
+        -- Distinct client IPs in a time range (COUNT DISTINCT can't come from the rollup)
+        CREATE OR REPLACE FUNCTION count_unique_ips(start_ts TIMESTAMP WITH TIME ZONE, end_ts TIMESTAMP WITH TIME ZONE)
+        RETURNS BIGINT
+        LANGUAGE sql STABLE AS $$
+            SELECT COUNT(DISTINCT ip_address) FROM usage_logs WHERE timestamp >= start_ts AND timestamp < end_ts;
+        $$;
         """
         
         # Save migration script for manual execution
@@ -147,17 +314,8 @@ class SupabaseDB:
                           classification: dict = None):
         """Log email analysis to Supabase PostgreSQL"""
         try:
-            data = {
-                "ip_address": ip_address,
-                "email_content": email_content,
-                "sender_name": sender_name,
-                "sender_email": sender_email,
-                "score": score,
-                "response_time": response_time,
-                "ai_model": ai_model,
-                "error_message": error_message,
-                "classification": json.dumps(classification) if classification else None
-            }
+            data = self._usage_log_row(ip_address, email_content, sender_name, sender_email, score,
+                                       response_time, ai_model, error_message, classification)
             
             result = self.supabase.table('usage_logs').insert(data).execute()
             return result.data[0]['id'] if result.data else None
@@ -166,6 +324,101 @@ class SupabaseDB:
             print(f"❌ Error logging to Supabase: {str(e)}")
             return None
     
+    def log_email_analyses(self, records: List[Dict[str, Any]]) -> int:
+        """Log many email analyses (each a dict of log_email_analysis arguments) with multi-row inserts.
+        
+        Returns the number of rows written.
+        """
+        return self._bulk_insert('usage_logs', [self._usage_log_row(**record) for record in records])
+    
+    @staticmethod
+    def _usage_log_row(ip_address: str, email_content: str, sender_name: str, sender_email: str,
+                       score: int, response_time: float, ai_model: str = "gemini",
+                       error_message: str = None, classification: dict = None) -> Dict[str, Any]:
+        return {
+            "ip_address": ip_address,
+            "email_content": email_content,
+            "sender_name": sender_name,
+            "sender_email": sender_email,
+            "score": score,
+            "response_time": response_time,
+            "ai_model": ai_model,
+            "error_message": error_message,
+            "classification": json.dumps(classification) if classification else None
+        }
+    
+    def _bulk_insert(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        """Insert rows in as few requests as the row and payload limits allow; returns rows written"""
+        inserted = 0
+        chunk, chunk_bytes = [], 2
+        for row in rows:
+            row_bytes = len(json.dumps(row, default=str)) + 1
+            if chunk and (len(chunk) >= self.bulk_max_rows or chunk_bytes + row_bytes > self.bulk_max_bytes):
+                inserted += self._insert_chunk(table, chunk)
+                chunk, chunk_bytes = [], 2
+            chunk.append(row)
+            chunk_bytes += row_bytes
+        if chunk:
+            inserted += self._insert_chunk(table, chunk)
+        return inserted
+    
+    def _insert_chunk(self, table: str, chunk: List[Dict[str, Any]]) -> int:
+        """Insert one multi-row chunk; returns rows written.
+        
+        What a failure leads to depends on its kind (see _insert_error_kind): a chunk with
+        invalid rows is split in half and each half retried, so only the offending rows
+        are lost; a chunk the server finds too large (413) is split the same way, and later
+        chunks are kept below its size; transient failures (5xx, connection errors) are
+        retried with progressive backoff. Anything else loses the chunk.
+        """
+        for attempt in range(self.bulk_retries + 1):
+            try:
+                self.supabase.table(table).insert(chunk).execute()
+                return len(chunk)
+            except APIError as e:
+                kind, error = self._insert_error_kind(e), e
+            except Exception as e:
+                kind, error = 'retry', e  # Connection errors and timeouts
+            
+            if kind in ('split', 'shrink') and len(chunk) > 1:
+                if kind == 'shrink':
+                    chunk_bytes = len(json.dumps(chunk, default=str))
+                    self.bulk_max_bytes = min(self.bulk_max_bytes, max(1024, chunk_bytes // 2))
+                middle = len(chunk) // 2
+                return self._insert_chunk(table, chunk[:middle]) + self._insert_chunk(table, chunk[middle:])
+            if kind == 'retry' and attempt < self.bulk_retries:
+                print(f"🔄 Bulk insert into {table} failed on attempt {attempt + 1}, retrying in {attempt + 1}s...")
+                time.sleep(attempt + 1)  # Progressive backoff, as in _execute_with_retry
+                continue
+            print(f"❌ Bulk insert of {len(chunk)} rows into {table} failed: {error}")
+            return 0
+        return 0
+    
+    @staticmethod
+    def _insert_error_kind(error: APIError) -> str:
+        """'split' (some rows are invalid), 'shrink' (payload too large), 'retry' (transient) or 'fail'.
+        
+        PostgREST errors carry a SQLSTATE or PGRST code; errors without a JSON body carry
+        the HTTP status instead.
+        """
+        code = str(error.code or '')
+        if code.isdigit() and len(code) == 3:
+            status = int(code)
+            if status == 413:
+                return 'shrink'
+            if status >= 500:
+                return 'retry'
+            return 'split' if status in (400, 409, 422) else 'fail'
+        if code in TRANSIENT_POSTGREST_CODES:
+            return 'retry'
+        if code.startswith('PGRST'):
+            return 'fail'  # Malformed request, schema cache or JWT problems affect every row alike
+        if code[:2] in ROW_ERROR_SQLSTATE_CLASSES:
+            return 'split'
+        if code[:2] in TRANSIENT_SQLSTATE_CLASSES:
+            return 'retry'
+        return 'fail'
+    
     def get_usage_stats(self) -> Dict[str, Any]:
         """Get comprehensive usage statistics from Supabase"""
         import logging
@@ -176,7 +429,7 @@ class SupabaseDB:
             
             # Total requests with retry logic for SSL issues
             total_result = self._execute_with_retry(
-                lambda: self.supabase.table('usage_logs').select('id', count='exact').execute()
+                lambda: self.supabase.table('usage_logs').select('id', count='exact', head=True).execute()
             )
             total_requests = total_result.count if total_result else 0
             
@@ -184,7 +437,7 @@ class SupabaseDB:
             today = datetime.now().date()
             today_result = self._execute_with_retry(
                 lambda: self.supabase.table('usage_logs')\
-                    .select('id', count='exact')\
+                    .select('id', count='exact', head=True)\
                     .gte('timestamp', today.isoformat())\
                     .execute()
             )
@@ -199,7 +452,7 @@ class SupabaseDB:
             # Error rate
             error_result = self._execute_with_retry(
                 lambda: self.supabase.table('usage_logs')\
-                    .select('id', count='exact')\
+                    .select('id', count='exact', head=True)\
                     .not_.is_('error_message', 'null')\
                     .execute()
             )
@@ -246,44 +499,122 @@ class SupabaseDB:
                     "message": "Unable to retrieve statistics"
                 }
     
-    def get_usage_logs(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get recent usage logs from Supabase"""
+    def get_usage_logs(self, limit: int = 100, columns: str = USAGE_LOG_LIST_COLUMNS) -> List[Dict[str, Any]]:
+        """Get recent usage logs from Supabase (newest first)"""
         try:
-            result = self.supabase.table('usage_logs')\
-                .select('*')\
-                .order('timestamp', desc=True)\
-                .limit(limit)\
-                .execute()
-            
-            return result.data
+            logs = []
+            for log in self.iter_usage_logs(columns, newest_first=True, page_size=min(limit, self.page_size)):
+                logs.append(log)
+                if len(logs) >= limit:
+                    break
+            return logs
             
         except Exception as e:
             print(f"❌ Error getting usage logs: {str(e)}")
             return []
     
+    def iter_usage_logs(self, columns: str, start: Optional[str] = None, end: Optional[str] = None,
+                        errors_only: bool = False, filters: Optional[Callable] = None,
+                        newest_first: bool = False, page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream usage_logs rows with start <= timestamp < end, one page at a time.
+        
+        Pages are fetched with keyset pagination on (timestamp, id), so scans are complete
+        however many rows match (no silent truncation at PostgREST's row cap) and only one
+        page is held in memory. `filters` may add further conditions to the query.
+        """
+        def apply_filters(query):
+            query = self._usage_log_filters(query, start, end, errors_only)
+            return filters(query) if filters else query
+        
+        return self._iter_keyset('usage_logs', columns, apply_filters, newest_first, page_size)
+    
+    def count_usage_logs(self, start: Optional[str] = None, end: Optional[str] = None,
+                         errors_only: bool = False) -> int:
+        """Count usage_logs rows with start <= timestamp < end without fetching any"""
+        query = self.supabase.table('usage_logs').select('id', count='exact', head=True)
+        return self._usage_log_filters(query, start, end, errors_only).execute().count or 0
+    
+    @staticmethod
+    def _usage_log_filters(query, start: Optional[str], end: Optional[str], errors_only: bool):
+        if start:
+            query = query.gte('timestamp', start)
+        if end:
+            query = query.lt('timestamp', end)
+        if errors_only:
+            query = query.not_.is_('error_message', 'null').neq('error_message', '')
+        return query
+    
+    def _iter_keyset(self, table: str, columns: str, apply_filters: Callable, newest_first: bool = False,
+                     page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield rows of `table` ordered by (timestamp, id), fetching one page per request"""
+        page_size = page_size or self.page_size
+        direction = 'lt' if newest_first else 'gt'
+        last = None
+        while True:
+            query = apply_filters(self.supabase.table(table).select(columns))
+            if last is not None:
+                # Rows strictly after the last one seen, in (timestamp, id) order
+                timestamp = f'"{last["timestamp"]}"'
+                query = query.or_(f'timestamp.{direction}.{timestamp},'
+                                  f'and(timestamp.eq.{timestamp},id.{direction}.{last["id"]})')
+            page = query.order('timestamp', desc=newest_first)\
+                .order('id', desc=newest_first)\
+                .limit(page_size)\
+                .execute().data or []
+            yield from page
+            if len(page) < page_size:
+                return
+            last = page[-1]
+    
     def get_advanced_analytics(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
                              ip_filter: Optional[str] = None, min_score: Optional[int] = None, 
                              max_score: Optional[int] = None) -> Dict[str, Any]:
         """Get advanced analytics with filtering from Supabase"""
         try:
-            query = self.supabase.table('usage_logs').select('*')
-            
-            # Apply filters
-            if start_date:
-                query = query.gte('timestamp', start_date)
-            if end_date:
-                query = query.lte('timestamp', end_date)
-            if ip_filter:
-                query = query.eq('ip_address', ip_filter)
-            if min_score is not None:
-                query = query.gte('score', min_score)
-            if max_score is not None:
-                query = query.lte('score', max_score)
-            
-            result = query.execute()
-            logs = result.data
-            
-            if not logs:
+            if not ip_filter and min_score is None and max_score is None:
+                # Time-range-only filters can be answered from the hourly rollup
+                return self._advanced_analytics_from_rollup(start_date, end_date)
+            
+            def extra_filters(query):
+                if end_date:
+                    query = query.lte('timestamp', end_date)
+                if ip_filter:
+                    query = query.eq('ip_address', ip_filter)
+                if min_score is not None:
+                    query = query.gte('score', min_score)
+                if max_score is not None:
+                    query = query.lte('score', max_score)
+                return query
+            
+            # Aggregate while streaming pages, so large ranges are complete and bounded in memory
+            total_requests = 0
+            error_count = 0
+            score_count = score_sum = 0
+            score_min = score_max = None
+            unique_ips = set()
+            hourly_data = {}
+            buckets = {label: 0 for label, _, _, _ in SCORE_BUCKETS}
+            
+            for log in self.iter_usage_logs(USAGE_LOG_STATS_COLUMNS, start_date, filters=extra_filters):
+                total_requests += 1
+                if log['error_message']:
+                    error_count += 1
+                if log['ip_address']:
+                    unique_ips.add(log['ip_address'])
+                if log['timestamp']:
+                    hour = datetime.fromisoformat(log['timestamp'].replace('Z', '+00:00')).hour
+                    hourly_data[hour] = hourly_data.get(hour, 0) + 1
+                score = log['score']
+                if score is not None:
+                    score_count += 1
+                    score_sum += score
+                    score_min = score if score_min is None else min(score_min, score)
+                    score_max = score if score_max is None else max(score_max, score)
+                    for label, _, low, high in SCORE_BUCKETS:
+                        if low <= score <= high:
+                            buckets[label] += 1
+            
+            if not total_requests:
                 return {
                     "filtered_requests": 0,
                     "filtered_stats": {
@@ -301,51 +632,33 @@ class SupabaseDB:
                     "score_distribution": []
                 }
             
-            # Calculate statistics
-            scores = [log['score'] for log in logs if log['score'] is not None]
-            
+            avg_score = score_sum / score_count if score_count else 0
             score_stats = {
-                "min_score": min(scores) if scores else 0,
-                "max_score": max(scores) if scores else 0,
-                "avg_score": sum(scores) / len(scores) if scores else 0,
-                "total_requests": len(logs)
+                "min_score": score_min or 0,
+                "max_score": score_max or 0,
+                "avg_score": avg_score,
+                "total_requests": total_requests
             }
             
-            # Hourly distribution
-            hourly_data = {}
-            for log in logs:
-                if log['timestamp']:
-                    hour = datetime.fromisoformat(log['timestamp'].replace('Z', '+00:00')).hour
-                    hourly_data[hour] = hourly_data.get(hour, 0) + 1
-            
             hourly_list = [{"hour": h, "requests": hourly_data.get(h, 0)} for h in range(24)]
             
             # Score distribution for chart
-            score_distribution = []
-            if scores:
-                ranges = [
-                    {"range": "0-20", "count": len([s for s in scores if 0 <= s <= 20])},
-                    {"range": "21-40", "count": len([s for s in scores if 21 <= s <= 40])},
-                    {"range": "41-60", "count": len([s for s in scores if 41 <= s <= 60])},
-                    {"range": "61-80", "count": len([s for s in scores if 61 <= s <= 80])},
-                    {"range": "81-100", "count": len([s for s in scores if 81 <= s <= 100])},
-                ]
-                score_distribution = [r for r in ranges if r["count"] > 0]
+            score_distribution = [{"range": label, "count": count} for label, count in buckets.items() if count > 0]
             
             return {
-                "filtered_requests": len(logs),
+                "filtered_requests": total_requests,
                 "filtered_stats": {
-                    "total_requests": len(logs),
-                    "min_score": min(scores) if scores else 0,
-                    "max_score": max(scores) if scores else 0,
-                    "avg_score": round(sum(scores) / len(scores), 2) if scores else 0,
-                    "unique_ips": len(set(log['ip_address'] for log in logs if log['ip_address'])),
-                    "error_count": len([log for log in logs if log['error_message']])
+                    "total_requests": total_requests,
+                    "min_score": score_min or 0,
+                    "max_score": score_max or 0,
+                    "avg_score": round(avg_score, 2),
+                    "unique_ips": len(unique_ips),
+                    "error_count": error_count
                 },
                 "score_stats": score_stats,
                 "hourly_data": hourly_list,
-                "unique_ips": len(set(log['ip_address'] for log in logs if log['ip_address'])),
-                "error_count": len([log for log in logs if log['error_message']]),
+                "unique_ips": len(unique_ips),
+                "error_count": error_count,
                 "score_distribution": score_distribution
             }
             
@@ -410,7 +723,7 @@ class SupabaseDB:
             password_hash = hashlib.sha256(password.encode()).hexdigest()
             
             result = self.supabase.table('admin_users')\
-                .select('*')\
+                .select(ADMIN_USER_COLUMNS)\
                 .eq('username', username)\
                 .eq('password_hash', password_hash)\
                 .eq('is_active', True)\
@@ -459,11 +772,24 @@ class SupabaseDB:
         except Exception as e:
             print(f"❌ Error logging admin action: {str(e)}")
     
+    def log_admin_actions(self, records: List[Dict[str, Any]]) -> int:
+        """Log many admin actions (each a dict of log_admin_action arguments) with multi-row inserts.
+        
+        Returns the number of rows written.
+        """
+        rows = [{
+            "admin_username": record["admin_username"],
+            "action": record["action"],
+            "details": record.get("details"),
+            "ip_address": record.get("ip_address")
+        } for record in records]
+        return self._bulk_insert('admin_audit_log', rows)
+    
     def get_admin_audit_log(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Get admin audit log from Supabase"""
         try:
             result = self.supabase.table('admin_audit_log')\
-                .select('*')\
+                .select(AUDIT_LOG_COLUMNS)\
                 .order('timestamp', desc=True)\
                 .limit(limit)\
                 .execute()
@@ -474,6 +800,54 @@ class SupabaseDB:
             print(f"❌ Error getting audit log: {str(e)}")
             return []
     
+    def _advanced_analytics_from_rollup(self, start_date: Optional[str], end_date: Optional[str]) -> Dict[str, Any]:
+        """get_advanced_analytics for a time range, computed from usage_rollup_hourly"""
+        start = start_date or '1970-01-01'
+        end = end_date or (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        rows = self.get_usage_rollup(start, end)
+        summary = summarize_rollup(rows)
+        total = summary['total_requests']
+        unique_ips = self.get_unique_ip_count_between(start, end) if total else 0
+        
+        filtered_stats = {
+            "total_requests": total,
+            "min_score": summary['min_score'],
+            "max_score": summary['max_score'],
+            "avg_score": round(summary['avg_score'], 2),
+            "unique_ips": unique_ips,
+            "error_count": summary['error_count']
+        }
+        if not total:
+            return {
+                "filtered_requests": 0,
+                "filtered_stats": filtered_stats,
+                "score_stats": {},
+                "hourly_data": [],
+                "unique_ips": 0,
+                "error_count": 0,
+                "score_distribution": []
+            }
+        
+        # Hour-of-day distribution
+        hourly_data = {}
+        for hour, count in requests_by_hour(rows).items():
+            hourly_data[hour.hour] = hourly_data.get(hour.hour, 0) + count
+        
+        return {
+            "filtered_requests": total,
+            "filtered_stats": filtered_stats,
+            "score_stats": {
+                "min_score": summary['min_score'],
+                "max_score": summary['max_score'],
+                "avg_score": summary['avg_score'],
+                "total_requests": total
+            },
+            "hourly_data": [{"hour": h, "requests": hourly_data.get(h, 0)} for h in range(24)],
+            "unique_ips": unique_ips,
+            "error_count": summary['error_count'],
+            "score_distribution": [r for r in summary['score_distribution'] if r["count"] > 0]
+        }
+    
     # Utility methods
     def get_unique_ip_count(self) -> int:
         """Get count of unique IP addresses"""
@@ -482,25 +856,77 @@ class SupabaseDB:
             return result.data if result.data else 0
         except:
             # Fallback method
-            result = self.supabase.table('usage_logs').select('ip_address').execute()
-            unique_ips = set(log['ip_address'] for log in result.data if log['ip_address'])
+            unique_ips = set(log['ip_address'] for log in self.iter_usage_logs('id,timestamp,ip_address')
+                             if log['ip_address'])
             return len(unique_ips)
     
     def get_recent_requests_count(self, hours: int = 24) -> int:
         """Get count of requests in the last N hours"""
         try:
             cutoff_time = datetime.now() - timedelta(hours=hours)
-            result = self.supabase.table('usage_logs')\
-                .select('id', count='exact')\
-                .gte('timestamp', cutoff_time.isoformat())\
-                .execute()
-            
-            return result.count
+            return self.count_usage_logs(cutoff_time.isoformat())
             
         except Exception as e:
             print(f"❌ Error getting recent requests count: {str(e)}")
             return 0
     
+    def get_usage_rollup(self, start: str, end: str) -> List[Dict[str, Any]]:
+        """Hourly rollup rows (see usage_rollup.py) with start <= hour < end"""
+        rows = []
+        page_size = self.page_size
+        while True:
+            result = self.supabase.table('usage_rollup_hourly')\
+                .select('*')\
+                .gte('hour', start)\
+                .lt('hour', end)\
+                .order('hour')\
+                .order('ai_model')\
+                .range(len(rows), len(rows) + page_size - 1)\
+                .execute()
+            rows.extend(result.data or [])
+            if len(result.data or []) < page_size:
+                return rows
+    
+    def get_unique_ip_count_between(self, start: str, end: str) -> int:
+        """Count distinct IP addresses with start <= timestamp < end"""
+        try:
+            result = self.supabase.rpc('count_unique_ips', {'start_ts': start, 'end_ts': end}).execute()
+            return result.data or 0
+        except Exception as e:
+            print(f"❌ Error counting unique IPs: {str(e)}")
+            return 0
+    
+    def get_daily_usage(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        """Per-day total and AI-enhanced request counts for [start_date, end_date) (YYYY-MM-DD).
+        
+        Days without requests are included with zero counts.
+        """
+        try:
+            result = self.supabase.rpc('get_daily_usage', {'start_ts': start_date, 'end_ts': end_date}).execute()
+            counts = {row['day']: row for row in result.data or []}
+        except Exception as e:
+            # Fallback method (get_daily_usage not installed yet): fetch only the two columns needed
+            print(f"⚠️ get_daily_usage unavailable, aggregating locally: {e}")
+            counts = {}
+            for log in self.iter_usage_logs('id,timestamp,ai_model', start_date, end_date):
+                day = counts.setdefault(log['timestamp'][:10], {'total_requests': 0, 'ai_enhanced_requests': 0})
+                day['total_requests'] += 1
+                if is_ai_enhanced(log.get('ai_model')):
+                    day['ai_enhanced_requests'] += 1
+        
+        daily = []
+        day = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        while day < end:
+            row = counts.get(day.strftime('%Y-%m-%d'), {})
+            daily.append({
+                'day': day.strftime('%Y-%m-%d'),
+                'total_requests': row.get('total_requests', 0),
+                'ai_enhanced_requests': row.get('ai_enhanced_requests', 0)
+            })
+            day += timedelta(days=1)
+        return daily
+    
     def health_check(self) -> Dict[str, Any]:
         """Check Supabase database health and connectivity"""
         try:
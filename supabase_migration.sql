@@ -53,4 +53,145 @@
         CREATE INDEX IF NOT EXISTS idx_usage_logs_score ON usage_logs(score);
         CREATE INDEX IF NOT EXISTS idx_admin_audit_timestamp ON admin_audit_log(timestamp);
         CREATE INDEX IF NOT EXISTS idx_admin_users_username ON admin_users(username);
+
+        -- Per-day request counts for the admin dashboard, aggregated server-side
+        CREATE OR REPLACE FUNCTION get_daily_usage(start_ts TIMESTAMP WITH TIME ZONE, end_ts TIMESTAMP WITH TIME ZONE)
+        RETURNS TABLE (day DATE, total_requests BIGINT, ai_enhanced_requests BIGINT)
+        LANGUAGE sql STABLE AS $$
+            SELECT date_trunc('day', timestamp)::date AS day,
+                   COUNT(*) AS total_requests,
+                   COUNT(*) FILTER (WHERE ai_model IS NOT NULL AND ai_model <> 'none') AS ai_enhanced_requests
+            FROM usage_logs
+            WHERE timestamp >= start_ts AND timestamp < end_ts
+            GROUP BY 1
+            ORDER BY 1;
+        $$;
+
+        -- Hourly rollup of usage_logs per ai_model, maintained by the trigger below so dashboards
+        -- read one row per hour instead of scanning raw logs (buckets match usage_rollup.py)
+        CREATE TABLE IF NOT EXISTS usage_rollup_hourly (
+            hour TIMESTAMP WITH TIME ZONE NOT NULL,
+            ai_model TEXT NOT NULL,
+            request_count BIGINT NOT NULL DEFAULT 0,
+            error_count BIGINT NOT NULL DEFAULT 0,
+            score_count BIGINT NOT NULL DEFAULT 0,
+            score_sum BIGINT NOT NULL DEFAULT 0,
+            score_sum_sq BIGINT NOT NULL DEFAULT 0,
+            score_min INTEGER,
+            score_max INTEGER,
+            score_0_20 BIGINT NOT NULL DEFAULT 0,
+            score_21_40 BIGINT NOT NULL DEFAULT 0,
+            score_41_60 BIGINT NOT NULL DEFAULT 0,
+            score_61_80 BIGINT NOT NULL DEFAULT 0,
+            score_81_100 BIGINT NOT NULL DEFAULT 0,
+            response_time_count BIGINT NOT NULL DEFAULT 0,
+            response_time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            response_time_max REAL,
+            rt_le_250ms BIGINT NOT NULL DEFAULT 0,
+            rt_le_500ms BIGINT NOT NULL DEFAULT 0,
+            rt_le_1s BIGINT NOT NULL DEFAULT 0,
+            rt_le_2s BIGINT NOT NULL DEFAULT 0,
+            rt_le_5s BIGINT NOT NULL DEFAULT 0,
+            rt_gt_5s BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, ai_model)
+        );
+
+        -- Fold each INSERT statement's rows (one or many) into the rollup with a single upsert
+        CREATE OR REPLACE FUNCTION rollup_usage_logs() RETURNS TRIGGER
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO usage_rollup_hourly AS r (
+                    hour, ai_model, request_count, error_count, score_count, score_sum, score_sum_sq,
+                    score_min, score_max, score_0_20, score_21_40, score_41_60, score_61_80, score_81_100,
+                    response_time_count, response_time_sum, response_time_max,
+                    rt_le_250ms, rt_le_500ms, rt_le_1s, rt_le_2s, rt_le_5s, rt_gt_5s)
+                SELECT date_trunc('hour', timestamp), COALESCE(ai_model, 'none'),
+                       COUNT(*),
+                       COUNT(*) FILTER (WHERE error_message IS NOT NULL AND error_message <> ''),
+                       COUNT(score), COALESCE(SUM(score), 0), COALESCE(SUM(score::BIGINT * score), 0),
+                       MIN(score), MAX(score),
+                       COUNT(*) FILTER (WHERE score BETWEEN 0 AND 20),
+                       COUNT(*) FILTER (WHERE score BETWEEN 21 AND 40),
+                       COUNT(*) FILTER (WHERE score BETWEEN 41 AND 60),
+                       COUNT(*) FILTER (WHERE score BETWEEN 61 AND 80),
+                       COUNT(*) FILTER (WHERE score BETWEEN 81 AND 100),
+                       COUNT(response_time), COALESCE(SUM(response_time), 0), MAX(response_time),
+                       COUNT(*) FILTER (WHERE response_time <= 0.25),
+                       COUNT(*) FILTER (WHERE response_time > 0.25 AND response_time <= 0.5),
+                       COUNT(*) FILTER (WHERE response_time > 0.5 AND response_time <= 1),
+                       COUNT(*) FILTER (WHERE response_time > 1 AND response_time <= 2),
+                       COUNT(*) FILTER (WHERE response_time > 2 AND response_time <= 5),
+                       COUNT(*) FILTER (WHERE response_time > 5)
+                FROM new_rows
+                GROUP BY 1, 2
+            ON CONFLICT (hour, ai_model) DO UPDATE SET
+                request_count = r.request_count + EXCLUDED.request_count,
+                error_count = r.error_count + EXCLUDED.error_count,
+                score_count = r.score_count + EXCLUDED.score_count,
+                score_sum = r.score_sum + EXCLUDED.score_sum,
+                score_sum_sq = r.score_sum_sq + EXCLUDED.score_sum_sq,
+                score_min = LEAST(r.score_min, EXCLUDED.score_min),
+                score_max = GREATEST(r.score_max, EXCLUDED.score_max),
+                score_0_20 = r.score_0_20 + EXCLUDED.score_0_20,
+                score_21_40 = r.score_21_40 + EXCLUDED.score_21_40,
+                score_41_60 = r.score_41_60 + EXCLUDED.score_41_60,
+                score_61_80 = r.score_61_80 + EXCLUDED.score_61_80,
+                score_81_100 = r.score_81_100 + EXCLUDED.score_81_100,
+                response_time_count = r.response_time_count + EXCLUDED.response_time_count,
+                response_time_sum = r.response_time_sum + EXCLUDED.response_time_sum,
+                response_time_max = GREATEST(r.response_time_max, EXCLUDED.response_time_max),
+                rt_le_250ms = r.rt_le_250ms + EXCLUDED.rt_le_250ms,
+                rt_le_500ms = r.rt_le_500ms + EXCLUDED.rt_le_500ms,
+                rt_le_1s = r.rt_le_1s + EXCLUDED.rt_le_1s,
+                rt_le_2s = r.rt_le_2s + EXCLUDED.rt_le_2s,
+                rt_le_5s = r.rt_le_5s + EXCLUDED.rt_le_5s,
+                rt_gt_5s = r.rt_gt_5s + EXCLUDED.rt_gt_5s;
+            RETURN NULL;
+        END;
+        $$;
+
+        DROP TRIGGER IF EXISTS usage_logs_rollup ON usage_logs;
+        CREATE TRIGGER usage_logs_rollup
+            AFTER INSERT ON usage_logs
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION rollup_usage_logs();
+
+        -- Recompute the rollup from usage_logs (run once after creating it, or to repair it)
+        CREATE OR REPLACE FUNCTION rebuild_usage_rollup() RETURNS VOID
+        LANGUAGE sql AS $$
+            TRUNCATE usage_rollup_hourly;
+            INSERT INTO usage_rollup_hourly (
+                    hour, ai_model, request_count, error_count, score_count, score_sum, score_sum_sq,
+                    score_min, score_max, score_0_20, score_21_40, score_41_60, score_61_80, score_81_100,
+                    response_time_count, response_time_sum, response_time_max,
+                    rt_le_250ms, rt_le_500ms, rt_le_1s, rt_le_2s, rt_le_5s, rt_gt_5s)
+                SELECT date_trunc('hour', timestamp), COALESCE(ai_model, 'none'),
+                       COUNT(*),
+                       COUNT(*) FILTER (WHERE error_message IS NOT NULL AND error_message <> ''),
+                       COUNT(score), COALESCE(SUM(score), 0), COALESCE(SUM(score::BIGINT * score), 0),
+                       MIN(score), MAX(score),
+                       COUNT(*) FILTER (WHERE score BETWEEN 0 AND 20),
+                       COUNT(*) FILTER (WHERE score BETWEEN 21 AND 40),
+                       COUNT(*) FILTER (WHERE score BETWEEN 41 AND 60),
+                       COUNT(*) FILTER (WHERE score BETWEEN 61 AND 80),
+                       COUNT(*) FILTER (WHERE score BETWEEN 81 AND 100),
+                       COUNT(response_time), COALESCE(SUM(response_time), 0), MAX(response_time),
+                       COUNT(*) FILTER (WHERE response_time <= 0.25),
+                       COUNT(*) FILTER (WHERE response_time > 0.25 AND response_time <= 0.5),
+                       COUNT(*) FILTER (WHERE response_time > 0.5 AND response_time <= 1),
+                       COUNT(*) FILTER (WHERE response_time > 1 AND response_time <= 2),
+                       COUNT(*) FILTER (WHERE response_time > 2 AND response_time <= 5),
+                       COUNT(*) FILTER (WHERE response_time > 5)
+                FROM usage_logs
+                GROUP BY 1, 2;
+        $$;
+
+        SELECT rebuild_usage_rollup();
+
+        -- Distinct client IPs in a time range (COUNT DISTINCT can't come from the rollup)
+        CREATE OR REPLACE FUNCTION count_unique_ips(start_ts TIMESTAMP WITH TIME ZONE, end_ts TIMESTAMP WITH TIME ZONE)
+        RETURNS BIGINT
+        LANGUAGE sql STABLE AS $$
+            SELECT COUNT(DISTINCT ip_address) FROM usage_logs WHERE timestamp >= start_ts AND timestamp < end_ts;
+        $$;
         
\ No newline at end of file
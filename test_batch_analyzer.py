@@ -0,0 +1,223 @@
+# test_batch_analyzer.py - BatchAnalyzer must read lazy sources chunk by chunk and stop on cancel
+
+import os
+import threading
+import time
+
+import pytest
+
+from enhanced_features import (
+    QUALITY_FEEDBACK_BELOW, BatchAnalyzer, BatchJobQueue, BatchUploadStore, CsvEmailSource, EmailRewriter,
+    EmailSuggestionEngine
+)
+from local_analyzer import LocalEmailAnalyzer
+
+
+class CountingSource:
+    """Sized email source that records how many emails have been read from it"""
+
+    def __init__(self, count):
+        self.count = count
+        self.read = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            self.read += 1
+            yield {'id': i + 1, 'subject': f"Quick question {i}",
+                   'body': "Hi Sam, would you be open to a quick call?",
+                   'sender_name': "Ana", 'sender_email': "ana@example.com", 'company': "Acme", 'industry': "SaaS"}
+
+
+@pytest.fixture
+def analyzer():
+    batch_analyzer = BatchAnalyzer(EmailSuggestionEngine(), EmailRewriter(), max_workers=2, chunk_size=10)
+    yield batch_analyzer
+    batch_analyzer.shutdown()
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_source_is_read_lazily(analyzer, parallel):
+    source = CountingSource(500)
+    read_at_progress = []
+    result = analyzer.analyze_batch(source, parallel=parallel,
+                                    progress_callback=lambda done: read_at_progress.append(source.read))
+
+    assert result['status'] == 'completed'
+    assert [row['id'] for row in result['results']] == list(range(1, 501))
+    # At most max_workers * 2 chunks are read ahead of the first result
+    window = analyzer.max_workers * 2 if parallel else 1
+    assert read_at_progress[0] == window * analyzer.chunk_size
+    assert read_at_progress[-1] == 500
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_cancel_stops_reading(analyzer, parallel):
+    source = CountingSource(500)
+    cancel_event = threading.Event()
+
+    def on_progress(done):
+        if done >= 30:
+            cancel_event.set()
+
+    result = analyzer.analyze_batch(source, parallel=parallel, progress_callback=on_progress,
+                                    cancel_event=cancel_event)
+
+    assert result['status'] == 'cancelled'
+    # Chunks scored before the cancel are kept, and no chunk is read after it
+    read_ahead = (analyzer.max_workers * 2 - 1) * analyzer.chunk_size if parallel else 0
+    assert source.read == 30 + read_ahead
+    # In parallel mode, read-ahead chunks the pool had already finished are kept too
+    kept = len(result['results'])
+    assert 30 <= kept <= 30 + read_ahead
+    assert [row['id'] for row in result['results']] == list(range(1, kept + 1))
+    assert result['summary']['processed_emails'] == kept
+
+
+def test_cancel_keeps_finished_chunks_in_parallel_mode(analyzer):
+    source = CountingSource(500)
+    cancel_event = threading.Event()
+
+    def on_progress(done):
+        if done == analyzer.chunk_size:
+            time.sleep(0.5)  # Let the pool finish the chunks read ahead
+            cancel_event.set()
+
+    result = analyzer.analyze_batch(source, parallel=True, progress_callback=on_progress,
+                                    cancel_event=cancel_event)
+
+    assert result['status'] == 'cancelled'
+    window = analyzer.max_workers * 2 * analyzer.chunk_size
+    assert source.read == window
+    assert [row['id'] for row in result['results']] == list(range(1, window + 1))
+
+
+def test_cancel_before_start_reads_nothing(analyzer):
+    source = CountingSource(50)
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    result = analyzer.analyze_batch(source, parallel=False, cancel_event=cancel_event)
+
+    assert result['status'] == 'cancelled'
+    assert result['results'] == []
+    assert source.read == 0
+
+
+def test_job_pruned_before_it_starts(analyzer):
+    queue = BatchJobQueue(analyzer, max_running=1, max_finished=0)
+    try:
+        job = queue.submit([])
+        queue.cancel(job['batch_id'])
+        with queue._lock:
+            queue._prune_finished()
+        assert queue.get_job(job['batch_id']) is None
+
+        # The worker thread may still pick the job up; it must skip it quietly
+        queue._run_job(job['batch_id'], [], False, None, False)
+    finally:
+        queue.shutdown()
+
+
+def test_rows_carry_local_quality_scores(analyzer):
+    sender = {'sender_name': "Ana", 'sender_email': "ana@example.com", 'company': "Acme", 'industry': "SaaS"}
+    emails = [
+        {'id': 1, 'subject': "Quick question", 'body': "Hi Sam, would you be open to a quick call?", **sender},
+        {'id': 2, 'subject': "Deal", 'body': "Buy now! Free guarantee, act now.", **sender},
+        {'id': 3, 'subject': "Your launch", 'body': (
+            "Hi Sam, I noticed your recent product launch and read the article about your expansion. "
+            "We help teams like yours save hours and increase productivity by 30%. Would you be open to "
+            "a quick call next week to see if this could improve your onboarding? I appreciate your time "
+            "and thank you for considering it. Your team has clearly put a lot of thought into your "
+            "roadmap, and you could see results within a month."), **sender},
+    ]
+    result = analyzer.analyze_batch(emails, parallel=False)
+
+    local = LocalEmailAnalyzer()
+    for row, email_data in zip(result['results'], emails):
+        expected = local.analyze_email(email_data['subject'], email_data['body'])
+        assert row['quality_score'] == expected['overallScore']
+        assert row['quality_verdict'] == expected['verdict']
+        # Feedback is only built for rows that need work
+        if expected['overallScore'] < QUALITY_FEEDBACK_BELOW:
+            assert row['quality_breakdown'] == expected['breakdown']
+        else:
+            assert 'quality_breakdown' not in row
+
+
+def make_upload(store, analyzer):
+    upload = store.create("emails.csv")
+    with open(upload['path'], 'w', encoding='utf-8') as f:
+        f.write("subject,body\nQuick question,Hi Sam - would you be open to a quick call?\n")
+    upload['emails'] = CsvEmailSource(analyzer, upload['path'])
+    return upload
+
+
+def test_pinned_upload_outlives_its_ttl(analyzer, tmp_path):
+    store = BatchUploadStore(upload_dir=str(tmp_path), max_age_seconds=0)
+    upload = make_upload(store, analyzer)
+    assert store.pin(upload['upload_id']) is upload
+
+    upload['created_at'] -= 10
+    store.expire_old()
+    assert store.get(upload['upload_id']) is upload
+
+    store.release(upload['upload_id'])
+    assert store.get(upload['upload_id']) is None
+    assert not os.path.exists(upload['path'])
+
+
+def test_upload_is_deleted_after_its_last_batch(analyzer, tmp_path):
+    store = BatchUploadStore(upload_dir=str(tmp_path))
+    upload = make_upload(store, analyzer)
+    store.pin(upload['upload_id'])
+    store.pin(upload['upload_id'])
+
+    store.release(upload['upload_id'])
+    assert os.path.exists(upload['path'])
+    store.release(upload['upload_id'])
+    assert not os.path.exists(upload['path'])
+
+
+def test_released_upload_can_be_kept_for_a_retry(analyzer, tmp_path):
+    store = BatchUploadStore(upload_dir=str(tmp_path))
+    upload = make_upload(store, analyzer)
+    store.pin(upload['upload_id'])
+
+    store.release(upload['upload_id'], delete=False)
+    assert store.pin(upload['upload_id']) is upload
+
+
+def test_unwritten_upload_cannot_be_pinned(tmp_path):
+    store = BatchUploadStore(upload_dir=str(tmp_path))
+    upload = store.create("emails.csv")
+    assert store.pin(upload['upload_id']) is None
+    assert store.pin("missing") is None
+
+
+def test_job_queue_runs_on_finish_however_the_job_ends(analyzer):
+    queue = BatchJobQueue(analyzer, max_running=1)
+    finished = []
+    done = threading.Semaphore(0)
+    blocker = threading.Event()
+
+    def on_finish(name):
+        finished.append(name)
+        done.release()
+
+    try:
+        # Holds the only worker so the second job is cancelled while still queued
+        first = queue.submit(CountingSource(10), on_complete=lambda result: blocker.wait(1),
+                             on_finish=lambda: on_finish('first'))
+        second = queue.submit(CountingSource(10), on_finish=lambda: on_finish('second'))
+        queue.cancel(second['batch_id'])
+        blocker.set()
+        assert done.acquire(timeout=5) and done.acquire(timeout=5)
+    finally:
+        queue.shutdown()
+
+    assert sorted(finished) == ['first', 'second']
+    assert queue.get_job(first['batch_id'])['status'] == 'completed'
+    assert queue.get_job(second['batch_id'])['status'] == 'cancelled'
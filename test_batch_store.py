@@ -0,0 +1,122 @@
+# test_batch_store.py - BatchResultStore LRU/TTL eviction and the SQLite spill tier
+
+import os
+
+import pytest
+
+import batch_store
+from batch_store import BatchResultStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(batch_store, "time", fake)
+    return fake
+
+
+def make_store(tmp_path, **kwargs):
+    options = dict(max_items=2, max_bytes=10 ** 9, ttl_seconds=3600, retention_seconds=86400)
+    options.update(kwargs)
+    return BatchResultStore(spill_path=str(tmp_path / "spill.db"), **options)
+
+
+def batch(batch_id, rows=1):
+    return {'batch_id': batch_id, 'status': 'completed',
+            'results': [{'id': i, 'subject': f"Subject {i}", 'score': i % 100} for i in range(rows)]}
+
+
+def test_least_recently_used_result_spills_and_round_trips(tmp_path, clock):
+    store = make_store(tmp_path)
+    store.put('a', batch('a'))
+    store.put('b', batch('b'))
+    store.get('a')  # 'b' is now the least recently used
+    store.put('c', batch('c'))
+
+    stats = store.stats()
+    assert stats['items_in_memory'] == 2
+    assert stats['items_on_disk'] == 1
+    assert stats['evictions'] == 1
+
+    assert store.get('b') == batch('b')
+    assert store.stats()['disk_hits'] == 1
+    store.close()
+
+
+def test_byte_budget_spills_but_keeps_the_newest(tmp_path, clock):
+    store = make_store(tmp_path, max_items=10, max_bytes=2000)
+    store.put('small', batch('small'))
+    store.put('large', batch('large', rows=100))
+
+    # The newest result stays in memory even though it alone is over budget
+    stats = store.stats()
+    assert stats['items_in_memory'] == 1
+    assert stats['items_on_disk'] == 1
+    assert store.get('small') == batch('small')
+    store.close()
+
+
+def test_results_past_ttl_leave_memory(tmp_path, clock):
+    store = make_store(tmp_path, ttl_seconds=60)
+    store.put('a', batch('a'))
+    clock.now += 61
+
+    assert store.get('a') == batch('a')
+    stats = store.stats()
+    assert stats['expirations'] == 1
+    assert stats['disk_hits'] == 1
+    store.close()
+
+
+def test_reloaded_result_is_not_written_twice(tmp_path, clock):
+    store = make_store(tmp_path, max_items=1)
+    store.put('a', batch('a'))
+    store.put('b', batch('b'))
+    store.get('a')  # Back in memory, spilling 'b'
+    store.put('c', batch('c'))  # Spills 'a' again without a new write
+
+    assert store.stats()['items_on_disk'] == 2
+    assert store.get('a') == batch('a')
+    assert store.get('b') == batch('b')
+    store.close()
+
+
+def test_spilled_results_are_dropped_after_retention(tmp_path, clock):
+    store = make_store(tmp_path, max_items=1, retention_seconds=100)
+    store.put('old', batch('old'))
+    store.put('a', batch('a'))  # Spills 'old'
+    clock.now += 101
+    store.put('b', batch('b'))  # Spills 'a' and prunes 'old'
+
+    assert store.get('old') is None
+    assert store.get('a') == batch('a')
+    assert store.stats()['misses'] == 1
+    store.close()
+
+
+def test_put_replaces_an_existing_result(tmp_path, clock):
+    store = make_store(tmp_path)
+    store.put('a', batch('a'))
+    store.put('a', batch('a', rows=3))
+
+    assert store.get('a') == batch('a', rows=3)
+    assert store.stats()['items_in_memory'] == 1
+    store.close()
+
+
+def test_close_removes_a_spill_file_it_created():
+    store = BatchResultStore(max_items=1)
+    store.put('a', batch('a'))
+    store.put('b', batch('b'))
+    assert os.path.exists(store.spill_path)
+
+    store.close()
+    assert not os.path.exists(store.spill_path)
@@ -0,0 +1,124 @@
+# test_circuit_breaker.py - CircuitBreaker open/half-open/close transitions
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test", window_seconds=60, min_calls=4, failure_rate_threshold=0.5,
+                          slow_call_seconds=2, slow_rate_threshold=0.5, open_seconds=30)
+
+
+def call(breaker, succeeded=True, latency=0.1):
+    assert breaker.allow_request()
+    if succeeded:
+        breaker.record_success(latency)
+    else:
+        breaker.record_failure(latency)
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        call(breaker, succeeded=False)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_min_calls(breaker):
+    for _ in range(breaker.min_calls - 1):
+        call(breaker, succeeded=False)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_failure_rate(breaker):
+    call(breaker)
+    call(breaker)
+    call(breaker, succeeded=False)
+    assert breaker.state == CLOSED
+    call(breaker, succeeded=False)
+    assert breaker.state == OPEN
+    assert breaker.counters['trips'] == 1
+
+
+def test_opens_on_slow_call_rate(breaker):
+    for _ in range(breaker.min_calls):
+        call(breaker, latency=3)
+    assert breaker.state == OPEN
+
+
+def test_old_outcomes_leave_the_window(breaker, clock):
+    call(breaker, succeeded=False)
+    call(breaker, succeeded=False)
+    clock.now += 61
+    call(breaker)
+    call(breaker)
+    call(breaker)
+    call(breaker, succeeded=False)
+    assert breaker.state == CLOSED
+
+
+def test_open_breaker_rejects_calls(breaker, clock):
+    trip(breaker)
+    assert breaker.is_open()
+    assert not breaker.allow_request()
+    assert breaker.counters['rejected'] == 1
+
+
+def test_half_open_allows_one_probe(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    assert not breaker.is_open()
+    assert breaker.stats()['state'] == HALF_OPEN
+
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+
+
+def test_successful_probe_closes(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    call(breaker)
+    assert breaker.state == CLOSED
+    assert breaker.stats()['window_calls'] == 0
+
+
+@pytest.mark.parametrize("succeeded, latency", [(False, 0.1), (True, 3)])
+def test_failed_or_slow_probe_reopens(breaker, clock, succeeded, latency):
+    trip(breaker)
+    clock.now += 30
+    call(breaker, succeeded=succeeded, latency=latency)
+    assert breaker.state == OPEN
+    assert breaker.counters['trips'] == 2
+
+
+def test_unreported_probe_is_replaced(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    assert breaker.allow_request()
+    clock.now += 30
+    assert breaker.allow_request()
+
+
+def test_late_result_after_opening_is_ignored(breaker):
+    assert breaker.allow_request()  # Started before the breaker opened
+    trip(breaker)
+    breaker.record_success(0.1)
+    assert breaker.state == OPEN
@@ -0,0 +1,45 @@
+# test_email_alerts.py - Alert checks against usage_logs and the in-process metrics
+
+from email_alerts import EmailAlertSystem
+from request_metrics import RequestMetrics
+
+
+class FakeAnalyticsDb:
+    """Stands in for SupabaseDatabase; counts come from a fixed table of answers"""
+    
+    supabase = True
+    
+    def __init__(self, errors: int):
+        self.errors = errors
+        self.calls = []
+    
+    def count_usage_logs(self, start=None, end=None, errors_only=False):
+        self.calls.append((start, errors_only))
+        return self.errors if errors_only else 0
+
+
+def alert_system(db, metrics):
+    alerts = EmailAlertSystem(db, metrics)
+    alerts.sent = []
+    alerts._send_api_failure_alert = alerts.sent.append
+    return alerts
+
+
+def test_api_failures_are_counted_from_usage_logs():
+    # This process saw no failures, but the other workers logged six
+    metrics = RequestMetrics()
+    metrics.started_at = 0.0
+    metrics.record(80, 'huggingface', 0.2)
+    db = FakeAnalyticsDb(errors=6)
+    alerts = alert_system(db, metrics)
+
+    assert alerts.check_api_failure_alert() is True
+    assert alerts.sent == [6]
+    assert [errors_only for _, errors_only in db.calls] == [True]
+
+
+def test_no_api_failure_alert_below_threshold():
+    alerts = alert_system(FakeAnalyticsDb(errors=4), RequestMetrics())
+
+    assert alerts.check_api_failure_alert() is False
+    assert alerts.sent == []
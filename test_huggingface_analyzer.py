@@ -0,0 +1,299 @@
+# test_huggingface_analyzer.py - Sentiment calls against a stubbed inference API
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker
+from huggingface_analyzer import HuggingFaceAnalyzer, SentimentBatcher
+from lexicon_sentiment import LexiconSentimentAnalyzer
+
+PRIMARY = "distilbert-base-uncased-finetuned-sst-2-english"
+FALLBACK = "fallback/sentiment-model"
+
+
+def sentiment_payload(positive: float):
+    return [[{'label': 'POSITIVE', 'score': positive}, {'label': 'NEGATIVE', 'score': 1 - positive}]]
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeAsyncClient:
+    """Answers each model after its configured delay; records every call"""
+
+    def __init__(self, delays=None, status_codes=None, positive: float = 0.9):
+        self.delays = delays or {}
+        self.status_codes = status_codes or {}
+        self.positive = positive
+        self.calls = []
+        self.finished = []
+
+    async def post(self, url, json=None, timeout=None):
+        model = url.rsplit("/models/", 1)[-1]
+        self.calls.append((model, json['inputs']))
+        await asyncio.sleep(self.delays.get(model, 0))
+        self.finished.append(model)
+        inputs = json['inputs']
+        count = len(inputs) if isinstance(inputs, list) else 1
+        status = self.status_codes.get(model, 200)
+        return FakeResponse(status, sentiment_payload(self.positive) * count if status == 200 else None)
+
+    async def aclose(self):
+        pass
+
+
+class FakeSession:
+    """Blocking counterpart of FakeAsyncClient, standing in for the requests session"""
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.calls = []
+        self.headers = {}
+
+    def post(self, url, json=None, timeout=None):
+        self.calls.append(json['inputs'])
+        time.sleep(self.delay)
+        return FakeResponse(200, sentiment_payload(0.9))
+
+    def close(self):
+        pass
+
+
+def make_analyzer(client, **kwargs):
+    kwargs.setdefault('batch_size', 1)
+    kwargs.setdefault('fallback_models', [FALLBACK])
+    kwargs.setdefault('hedge_delay_ms', 20)
+    analyzer = HuggingFaceAnalyzer("test-key", base_url="http://hf.test/models/", **kwargs)
+    analyzer._async_client = client
+    analyzer.breaker = CircuitBreaker("test", window_seconds=60, min_calls=1, failure_rate_threshold=0.5,
+                                      slow_call_seconds=5, slow_rate_threshold=1.0, open_seconds=0)
+    return analyzer
+
+
+def test_concurrent_lookups_share_one_call():
+    client = FakeAsyncClient(delays={PRIMARY: 0.05})
+    analyzer = make_analyzer(client, hedge_delay_ms=1000)
+
+    async def scenario():
+        return await asyncio.gather(*[analyzer._get_sentiment_analysis_async("same text") for _ in range(5)])
+
+    results = asyncio.run(scenario())
+    assert client.calls == [(PRIMARY, "same text")]
+    assert analyzer.sentiment_stats['upstream_calls'] == 1
+    assert analyzer.sentiment_stats['coalesced_calls'] == 4
+    results[0]['sentiment_score'] = 0  # Each caller gets its own copy
+    assert results[1]['sentiment_score'] == pytest.approx(0.8)
+
+
+def test_concurrent_threads_share_one_call():
+    analyzer = make_analyzer(FakeAsyncClient())
+    analyzer.session = FakeSession(delay=0.05)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(analyzer._get_sentiment_analysis("same text")))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert analyzer.session.calls == ["same text"]
+    assert len(results) == 5 and all(result['sentiment_score'] == pytest.approx(0.8) for result in results)
+
+
+def test_batcher_sends_close_lookups_as_one_list():
+    batches = []
+
+    async def fetch_many(texts):
+        batches.append(texts)
+        return [{'text': text} for text in texts]
+
+    async def scenario():
+        batcher = SentimentBatcher(fetch_many, max_batch_size=8, max_wait=0.01)
+        return await asyncio.gather(*[batcher.submit(text) for text in ("a", "b", "c")])
+
+    assert asyncio.run(scenario()) == [{'text': "a"}, {'text': "b"}, {'text': "c"}]
+    assert batches == [["a", "b", "c"]]
+
+
+def test_batcher_flushes_a_full_batch_at_once():
+    batches = []
+
+    async def fetch_many(texts):
+        batches.append(texts)
+        return [None] * len(texts)
+
+    async def scenario():
+        batcher = SentimentBatcher(fetch_many, max_batch_size=2, max_wait=0.05)
+        pending = [asyncio.ensure_future(batcher.submit(text)) for text in ("a", "b", "c")]
+        await asyncio.sleep(0.01)
+        assert batches == [["a", "b"]]  # "c" waits for more texts or max_wait
+        await asyncio.gather(*pending)
+
+    asyncio.run(scenario())
+    assert batches == [["a", "b"], ["c"]]
+
+
+def test_aclose_sends_what_is_pending():
+    batches = []
+
+    async def fetch_many(texts):
+        await asyncio.sleep(0.01)
+        batches.append(texts)
+        return [{'text': text} for text in texts]
+
+    async def scenario():
+        batcher = SentimentBatcher(fetch_many, max_batch_size=8, max_wait=10)
+        pending = asyncio.ensure_future(batcher.submit("a"))
+        await asyncio.sleep(0)
+        await batcher.aclose()
+        assert batches == [["a"]]  # Sent and answered before aclose returned
+        return await pending
+
+    assert asyncio.run(scenario()) == {'text': "a"}
+
+
+def test_failed_batch_answers_none_to_every_caller():
+    async def fetch_many(texts):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        batcher = SentimentBatcher(fetch_many, max_batch_size=8, max_wait=0.01)
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+
+    assert asyncio.run(scenario()) == [None, None]
+
+
+def test_analyzer_batches_different_texts_into_one_request():
+    client = FakeAsyncClient()
+    analyzer = make_analyzer(client, batch_size=8)
+
+    async def scenario():
+        try:
+            return await asyncio.gather(*[analyzer._get_sentiment_analysis_async(text) for text in ("a", "b", "c")])
+        finally:
+            await analyzer.aclose()
+
+    results = asyncio.run(scenario())
+    assert client.calls == [(PRIMARY, ["a", "b", "c"])]
+    assert all(result['sentiment_score'] == pytest.approx(0.8) for result in results)
+
+
+def test_fast_primary_is_not_hedged():
+    client = FakeAsyncClient()
+    analyzer = make_analyzer(client)
+
+    result = asyncio.run(analyzer._fetch_sentiment_async("hello"))
+    assert result['sentiment_score'] == pytest.approx(0.8)
+    assert [model for model, _ in client.calls] == [PRIMARY]
+    assert analyzer.sentiment_stats['hedged_requests'] == 0
+
+
+def test_slow_primary_is_hedged_and_the_fallback_wins():
+    client = FakeAsyncClient(delays={PRIMARY: 0.5})
+    analyzer = make_analyzer(client)
+
+    result = asyncio.run(analyzer._fetch_sentiment_async("hello"))
+    assert result['sentiment_score'] == pytest.approx(0.8)
+    assert analyzer.sentiment_stats['hedged_requests'] == 1
+    assert analyzer.sentiment_stats['hedge_wins'] == 1
+    assert client.finished == [FALLBACK]  # The primary was cancelled once the fallback answered
+
+
+def test_failed_primary_hedges_without_waiting():
+    client = FakeAsyncClient(status_codes={PRIMARY: 500})
+    analyzer = make_analyzer(client, hedge_delay_ms=10_000)
+
+    started = time.monotonic()
+    result = asyncio.run(analyzer._fetch_sentiment_async("hello"))
+    assert result['sentiment_score'] == pytest.approx(0.8)
+    assert client.finished == [PRIMARY, FALLBACK]
+    assert time.monotonic() - started < 1
+
+
+def test_hedge_delay_follows_the_primary_latency_percentile():
+    analyzer = make_analyzer(FakeAsyncClient(), hedge_percentile=90)
+    assert analyzer.hedge_delay() == pytest.approx(0.02)  # The default until enough samples
+    analyzer._primary_latencies.extend(i / 100 for i in range(1, 101))
+    assert analyzer.hedge_delay() == pytest.approx(0.91)
+
+
+def test_abandoned_primary_call_is_not_a_failure():
+    analyzer = make_analyzer(FakeAsyncClient(delays={PRIMARY: 1}))
+
+    async def scenario():
+        task = asyncio.ensure_future(analyzer._post_sentiment_async("hello"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert analyzer.breaker.counters['failures'] == 0
+    assert analyzer.breaker.state == CLOSED
+
+
+def test_hedge_lets_the_half_open_probe_finish():
+    client = FakeAsyncClient(delays={PRIMARY: 0.1})
+    analyzer = make_analyzer(client)
+    analyzer.breaker.record_failure(0.1)
+    assert analyzer.breaker.state == OPEN
+
+    async def scenario():
+        response, model = await analyzer._post_sentiment_hedged_async("hello")
+        assert model == FALLBACK  # The fallback won the race against the slow probe
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+    assert PRIMARY in client.finished
+    assert analyzer.breaker.state == CLOSED  # The probe's real (successful) outcome
+    assert analyzer.breaker.counters['failures'] == 1
+
+
+def analyze(analyzer):
+    async def scenario():
+        try:
+            return await analyzer.analyze_email_with_ai_async("Quick question", "Hi Sam, loved your post.")
+        finally:
+            await analyzer.aclose()
+    return asyncio.run(scenario())
+
+
+def test_primary_answer_is_reported_as_huggingface():
+    result, source = analyze(make_analyzer(FakeAsyncClient()))
+    assert source == "huggingface"
+    assert result['verdict'].endswith("(AI Enhanced)")
+
+
+def test_fallback_model_answer_is_reported_by_name():
+    client = FakeAsyncClient(status_codes={PRIMARY: 500})
+    result, source = analyze(make_analyzer(client))
+    assert source == FALLBACK
+    assert HuggingFaceAnalyzer.is_ai_source(source)
+    assert result['verdict'].endswith("(AI Enhanced)")
+
+
+def test_lexicon_answer_is_not_ai_enhanced():
+    client = FakeAsyncClient(status_codes={PRIMARY: 500, FALLBACK: 500})
+    result, source = analyze(make_analyzer(client, fallback_sentiment=LexiconSentimentAnalyzer()))
+    assert source == "lexicon"
+    assert not HuggingFaceAnalyzer.is_ai_source(source)
+    assert result['verdict'].endswith("(Local Analysis)")
+    assert "Tone check detected" in result['breakdown'][-1]['feedback']
+
+
+def test_no_sentiment_at_all_is_local():
+    client = FakeAsyncClient(status_codes={PRIMARY: 500, FALLBACK: 500})
+    result, source = analyze(make_analyzer(client))
+    assert source is None
+    assert result['verdict'].endswith("(Local Analysis)")
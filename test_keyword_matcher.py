@@ -0,0 +1,64 @@
+# test_keyword_matcher.py - KeywordMatcher must agree with per-keyword `in` checks
+
+import csv
+import os
+
+import pytest
+
+import keyword_matcher
+from keyword_matcher import LEXICONS, KeywordMatcher
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+TEXTS = [
+    "no risk free trial, act now!",  # overlapping phrases
+    "we helped clients grow; can we help you save time?",  # 'help' inside 'helped'
+    "hi there {name}, quick call?",
+    "",
+    "nothing relevant here",
+]
+
+
+def load_texts():
+    with open(os.path.join(HERE, "test_emails.csv"), newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    return TEXTS + [(row["subject"] + " " + row["body"]).lower() for row in rows]
+
+
+def old_checks(text):
+    """The checks KeywordMatcher replaced: one `word in text` per keyword"""
+    return {name: {word for word in words if word.lower() in text} for name, words in LEXICONS.items()}
+
+
+@pytest.fixture(params=["automaton", "fallback"])
+def matcher(request, monkeypatch):
+    if request.param == "automaton":
+        if keyword_matcher.ahocorasick is None:
+            pytest.skip("pyahocorasick not installed")
+    else:
+        monkeypatch.setattr(keyword_matcher, "ahocorasick", None)
+    return KeywordMatcher(LEXICONS)
+
+
+@pytest.mark.parametrize("text", load_texts())
+def test_matches_old_checks(matcher, text):
+    assert matcher.match(text) == old_checks(text)
+
+
+def test_keyword_in_several_lists(matcher):
+    hits = matcher.match("we can save you money")
+    assert "save" in hits["value_words"]
+    assert "save" in hits["suggestion_value_words"]
+
+
+def test_patterns_are_lowercased(matcher):
+    hits = KeywordMatcher({"words": ["Thank You"]}).match("thank you for reading")
+    assert hits == {"words": {"thank you"}}
+
+
+def test_count_many_matches_per_text_counts(matcher):
+    texts = load_texts()
+    counts = matcher.count_many(texts)
+    for row, text in enumerate(texts):
+        hits = old_checks(text)
+        assert {name: counts[name][row] for name in LEXICONS} == {name: len(words) for name, words in hits.items()}
@@ -0,0 +1,56 @@
+# test_lexicon_sentiment.py - Offline lexicon sentiment scoring
+
+import pytest
+
+from lexicon_sentiment import LexiconSentimentAnalyzer
+
+
+@pytest.fixture
+def lexicon():
+    return LexiconSentimentAnalyzer()
+
+
+def score(lexicon, text):
+    return lexicon.analyze(text)['sentiment_score']
+
+
+def test_polarity(lexicon):
+    assert score(lexicon, "Thanks, I loved your talk and the results were excellent") > 0.5
+    assert score(lexicon, "The rollout was a terrible, frustrating waste of time") < -0.5
+    assert score(lexicon, "Could we meet on Tuesday at noon?") == 0
+
+
+def test_confidences_sum_to_one(lexicon):
+    result = lexicon.analyze("Great work, but the pricing is a problem")
+    assert result['positive_confidence'] + result['negative_confidence'] == pytest.approx(1)
+    assert -1 < result['sentiment_score'] < 1
+
+
+def test_intensifiers_scale_the_next_sentiment_word(lexicon):
+    plain = score(lexicon, "this is good")
+    assert score(lexicon, "this is very good") > plain
+    assert score(lexicon, "this is extremely good") > score(lexicon, "this is very good")
+    assert 0 < score(lexicon, "this is slightly good") < plain
+
+
+def test_negation_flips_and_dampens(lexicon):
+    great = score(lexicon, "the demo was great")
+    not_great = score(lexicon, "the demo was not great")
+    assert not_great < 0
+    assert abs(not_great) < great
+    assert score(lexicon, "it didn't fail") > 0
+
+
+def test_negation_scope_ends(lexicon):
+    # "great" is four tokens after "not", beyond the negation scope
+    assert score(lexicon, "not sure about the great results") > 0
+
+
+def test_clause_after_but_dominates(lexicon):
+    assert score(lexicon, "The idea is good but the execution is poor") < 0
+    assert score(lexicon, "The execution is poor but the idea is good") > 0
+
+
+def test_get_sentiment_many_matches_analyze(lexicon):
+    texts = ["great news", "bad news", ""]
+    assert lexicon.get_sentiment_many(texts) == [lexicon.analyze(text) for text in texts]
@@ -0,0 +1,71 @@
+# test_local_analyzer.py - Batch scoring and cache keys for LocalEmailAnalyzer
+
+import csv
+import os
+
+import pytest
+
+from analysis_cache import AnalysisCache
+from local_analyzer import LocalEmailAnalyzer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_emails():
+    with open(os.path.join(HERE, "test_emails.csv"), newline="", encoding="utf-8") as f:
+        return [(row["subject"], row["body"]) for row in csv.DictReader(f)]
+
+
+EDGE_CASES = [
+    ("Empty", ""),
+    ("Newlines", "Hi Ana,\nwould you be open to a quick call?\nWe grew revenue 3x.\nbook a demo\nnow"),
+    # lower() lengthens 'İ', which shifts the lowered text against the original
+    ("Unicode", "İİ hello Ana, we saw your $5 plan. Free guarantee! You, your team, our team."),
+    ("Metrics", "Saved 40% and $200 for you. 10x? I, we, my, our"),
+]
+
+
+def test_analyze_many_matches_analyze_email():
+    analyzer = LocalEmailAnalyzer()
+    emails = load_emails() + EDGE_CASES
+    subjects = [subject for subject, _ in emails]
+    bodies = [body for _, body in emails]
+
+    batch = analyzer.analyze_many(subjects, bodies)
+    expected = [analyzer.analyze_email(s, b) for s, b in emails]
+
+    assert list(batch.results()) == expected
+    assert [batch.score(i) for i in range(len(batch))] == [result["overallScore"] for result in expected]
+    assert [batch.verdict(i) for i in range(len(batch))] == [result["verdict"] for result in expected]
+
+
+def test_analyze_many_builds_feedback_per_row():
+    analyzer = LocalEmailAnalyzer()
+    subject, body = EDGE_CASES[1]
+
+    batch = analyzer.analyze_many([subject] * 3, [body] * 3)
+
+    assert batch.breakdown(2) == analyzer.analyze_email(subject, body)["breakdown"]
+    assert [result["overallScore"] for result in batch.results([0, 2])] == [batch.score(0), batch.score(2)]
+
+
+def test_analyze_many_handles_an_empty_batch():
+    assert len(LocalEmailAnalyzer().analyze_many([], [])) == 0
+
+
+def test_analyze_many_rejects_mismatched_lengths():
+    with pytest.raises(ValueError):
+        LocalEmailAnalyzer().analyze_many(["one subject"], [])
+
+
+def test_cache_key_normalizes_subject_whitespace():
+    cache = AnalysisCache(max_items=10)
+    analyzer = LocalEmailAnalyzer(cache=cache)
+    body = "Hi Sam, would you be open to a quick call?"
+
+    first = analyzer.analyze_email("Quick question", body)
+    second = analyzer.analyze_email("  Quick \t question\n", body)
+
+    assert second == first
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hits'] == 1
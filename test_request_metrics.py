@@ -0,0 +1,91 @@
+# test_request_metrics.py - RequestMetrics ring-buffer windows
+
+import pytest
+
+from dashboard_feed import DashboardFeed
+from request_metrics import RequestMetrics
+
+NOW = 100_020.0  # Start of a minute bucket
+
+
+@pytest.fixture
+def metrics():
+    ring = RequestMetrics(second_slots=60, minute_slots=10)
+    ring.started_at = 0.0
+    return ring
+
+
+def test_second_window_counts_recent_requests(metrics):
+    metrics.record(80, 'huggingface', 0.2, now=NOW - 5)
+    metrics.record(40, 'local', 0.4, now=NOW - 30)
+    metrics.record(60, 'local', 0.3, now=NOW - 100)
+
+    last_minute = metrics.window(60, now=NOW)
+    assert last_minute['total_requests'] == 2
+    assert last_minute['requests_by_model'] == {'huggingface': 1, 'local': 1}
+
+    assert metrics.window(10, now=NOW)['total_requests'] == 1
+
+
+def test_longer_windows_use_the_minute_ring(metrics):
+    for offset in (5, 30, 100, 250):
+        metrics.record(50, 'local', 0.1, now=NOW - offset)
+
+    assert metrics.window(120, now=NOW)['total_requests'] == 3
+    assert metrics.window(300, now=NOW)['total_requests'] == 4
+
+
+def test_reused_slots_drop_old_counts(metrics):
+    metrics.record(50, 'local', 0.1, now=NOW - 70)
+    metrics.record(50, 'local', 0.1, now=NOW - 10)  # Same second slot, one lap later
+
+    assert metrics.window(60, now=NOW)['total_requests'] == 1
+    assert metrics.window(120, now=NOW)['total_requests'] == 2
+
+
+def test_minute_ring_forgets_beyond_its_span(metrics):
+    metrics.record(50, 'local', 0.1, now=NOW - 700)
+    metrics.record(50, 'local', 0.1, now=NOW - 10)
+
+    assert metrics.window(600, now=NOW)['total_requests'] == 1
+
+
+def test_uncovered_windows_return_none_unless_partial(metrics):
+    metrics.record(50, 'local', 0.1, now=NOW - 10)
+
+    assert metrics.window(3600, now=NOW) is None  # Longer than the minute ring
+    partial = metrics.window(3600, partial=True, now=NOW)
+    assert partial['window_seconds'] == 600
+    assert partial['total_requests'] == 1
+
+    metrics.started_at = NOW - 30
+    assert metrics.window(60, now=NOW) is None  # Longer than the process has run
+    assert metrics.window(60, partial=True, now=NOW)['window_seconds'] == 30
+
+
+def test_window_summarizes_scores_errors_and_times(metrics):
+    metrics.record(90, 'huggingface', 0.2, now=NOW - 3)
+    metrics.record(30, 'local', 1.5, error_message="API timeout", now=NOW - 2)
+    metrics.record(None, 'local', 0.1, error_message="Invalid request", now=NOW - 1)
+
+    summary = metrics.window(60, now=NOW)
+    assert summary['total_requests'] == 3
+    assert summary['error_count'] == 2
+    assert summary['avg_score'] == 60
+    assert (summary['min_score'], summary['max_score']) == (30, 90)
+    assert summary['avg_response_time'] == pytest.approx(0.6)
+    buckets = {bucket['range']: bucket['count'] for bucket in summary['score_distribution']}
+    assert buckets['81-100'] == 1 and buckets['21-40'] == 1
+
+
+def test_unknown_models_count_as_local(metrics):
+    metrics.record(50, 'gemini', 0.1, now=NOW - 1)
+    assert metrics.window(60, now=NOW)['requests_by_model']['local'] == 1
+
+
+def test_dashboard_feed_records_into_its_metrics(metrics):
+    feed = DashboardFeed(metrics)
+    feed.record(70, 'local', 0.2)
+
+    assert feed.snapshot()['requests'] == 1
+    assert metrics.window(60, partial=True)['total_requests'] == 1
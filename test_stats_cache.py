@@ -0,0 +1,145 @@
+# test_stats_cache.py - StatsCache TTL, stale-while-revalidate and per-key loading
+
+import threading
+import time
+
+import pytest
+
+import stats_cache
+from stats_cache import StatsCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(stats_cache, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def cache():
+    stats = StatsCache(ttl_seconds=30, max_stale_seconds=600, max_items=10)
+    yield stats
+    stats.close()
+
+
+def wait_for_refresh(cache):
+    for _ in range(200):
+        if not cache.stats()['refreshing']:
+            return
+        time.sleep(0.005)
+    raise AssertionError("background refresh did not finish")
+
+
+def test_fresh_value_is_served_from_memory(cache, clock):
+    calls = []
+    loader = lambda: calls.append(1) or len(calls)
+
+    assert cache.get('k', loader) == 1
+    clock.now += 29
+    assert cache.get('k', loader) == 1
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_stale_value_is_served_while_refreshing(cache, clock):
+    values = iter([1, 2])
+    cache.get('k', lambda: next(values))
+
+    clock.now += 60
+    release = threading.Event()
+
+    def slow_loader():
+        release.wait(1)
+        return next(values)
+
+    # The stale value comes back at once; the refresh runs in the background
+    assert cache.get('k', slow_loader) == 1
+    assert cache.get('k', slow_loader) == 1
+    release.set()
+    wait_for_refresh(cache)
+
+    assert cache.get('k', slow_loader) == 2
+    assert cache.stats()['stale_hits'] == 2
+    assert cache.stats()['refreshes'] == 1
+
+
+def test_failed_refresh_keeps_stale_value(cache, clock):
+    cache.get('k', lambda: 1)
+    clock.now += 60
+
+    def failing_loader():
+        raise RuntimeError("database down")
+
+    assert cache.get('k', failing_loader) == 1
+    wait_for_refresh(cache)
+    assert cache.stats()['refresh_errors'] == 1
+
+    # The next read past the TTL tries again
+    assert cache.get('k', lambda: 2) == 1
+    wait_for_refresh(cache)
+    assert cache.get('k', lambda: 3) == 2
+
+
+def test_too_stale_value_is_reloaded_in_caller(cache, clock):
+    cache.get('k', lambda: 1)
+    clock.now += 601
+    assert cache.get('k', lambda: 2) == 2
+    assert cache.stats()['misses'] == 2
+
+
+def test_load_error_reaches_caller_and_is_not_cached(cache, clock):
+    def failing_loader():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get('k', failing_loader)
+    assert cache.get('k', lambda: 5) == 5
+
+
+def test_failed_load_does_not_let_waiters_stampede(cache):
+    active = []
+    peak = []
+    calls = []
+    retrying = threading.Event()
+
+    def loader():
+        calls.append(1)
+        if len(calls) == 2:
+            retrying.set()
+        active.append(1)
+        peak.append(len(active))
+        time.sleep(0.05)
+        active.pop()
+        if len(calls) == 1:
+            raise RuntimeError("first load fails")
+        return 42
+
+    def read():
+        try:
+            cache.get('k', loader)
+        except RuntimeError:
+            pass
+
+    first = [threading.Thread(target=read) for _ in range(3)]
+    for thread in first:
+        thread.start()
+    # Callers arriving while a waiter retries after the failure must queue behind it
+    retrying.wait(1)
+    later = [threading.Thread(target=read) for _ in range(3)]
+    for thread in later:
+        thread.start()
+    for thread in first + later:
+        thread.join()
+
+    assert max(peak) == 1
+    assert len(calls) == 2
+    assert cache._key_locks == {}
@@ -0,0 +1,119 @@
+# test_supabase_bulk_insert.py - Multi-row inserts split, shrink or retry by the kind of failure
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("supabase")
+
+import supabase_db
+from postgrest.exceptions import APIError
+from supabase_db import SupabaseDB
+
+
+class FakeInsert:
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+
+    def execute(self):
+        self.client.requests.append(len(self.rows))
+        error = self.client.fail(self.rows)
+        if error is not None:
+            raise error
+        self.client.written.extend(self.rows)
+        return SimpleNamespace(data=self.rows)
+
+
+class FakeClient:
+    """Records insert requests; `fail(rows)` returns the exception a request raises, if any"""
+
+    def __init__(self, fail):
+        self.fail = fail
+        self.requests = []
+        self.written = []
+
+    def table(self, name):
+        return SimpleNamespace(insert=lambda rows: FakeInsert(self, rows))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(supabase_db.time, "sleep", slept.append)
+    return slept
+
+
+def make_db(fail, max_rows=8, retries=2):
+    db = SupabaseDB.__new__(SupabaseDB)  # Skips connecting to Supabase
+    db.supabase = FakeClient(fail)
+    db.bulk_max_rows = max_rows
+    db.bulk_max_bytes = 1024 * 1024
+    db.bulk_retries = retries
+    return db
+
+
+def rows(count):
+    return [{'id': i, 'action': 'view_stats'} for i in range(count)]
+
+
+def test_constraint_violation_drops_only_the_bad_rows(sleeps):
+    def fail(chunk):
+        if any(row['id'] in (2, 5) for row in chunk):
+            return APIError({'code': '23505', 'message': 'duplicate key value violates unique constraint'})
+
+    db = make_db(fail)
+    assert db._bulk_insert('admin_audit_log', rows(8)) == 6
+    assert sorted(row['id'] for row in db.supabase.written) == [0, 1, 3, 4, 6, 7]
+    assert sleeps == []
+
+
+def test_server_error_is_retried_not_split(sleeps):
+    failures = [APIError({'code': 503, 'message': 'Service Unavailable'})]
+    db = make_db(lambda chunk: failures.pop() if failures else None)
+
+    assert db._bulk_insert('admin_audit_log', rows(8)) == 8
+    assert db.supabase.requests == [8, 8]
+    assert sleeps == [1]
+
+
+@pytest.mark.parametrize("error", [
+    APIError({'code': 502, 'message': 'Bad Gateway'}),
+    APIError({'code': 'PGRST001', 'message': 'Could not connect to the database'}),
+    APIError({'code': '57014', 'message': 'canceling statement due to statement timeout'}),
+    ConnectionError("connection reset"),
+], ids=['5xx', 'pgrst-connection', 'statement-timeout', 'connection-error'])
+def test_transient_failures_back_off_then_give_up(sleeps, error):
+    db = make_db(lambda chunk: error)
+
+    assert db._bulk_insert('admin_audit_log', rows(8)) == 0
+    assert db.supabase.requests == [8, 8, 8]
+    assert sleeps == [1, 2]
+
+
+def test_payload_too_large_shrinks_without_losing_rows(sleeps):
+    def fail(chunk):
+        if len(chunk) > 2:
+            return APIError({'code': 413, 'message': 'Payload Too Large'})
+
+    db = make_db(fail)
+    assert db._bulk_insert('admin_audit_log', rows(8)) == 8
+    assert sorted(row['id'] for row in db.supabase.written) == list(range(8))
+    assert db.bulk_max_bytes < 1024 * 1024  # Later chunks start below the refused size
+    assert sleeps == []
+
+
+def test_request_wide_errors_fail_the_chunk_at_once(sleeps):
+    error = APIError({'code': 'PGRST204', 'message': "Could not find the 'action' column"})
+    db = make_db(lambda chunk: error)
+
+    assert db._bulk_insert('admin_audit_log', rows(8)) == 0
+    assert db.supabase.requests == [8]
+    assert sleeps == []
+
+
+def test_rows_are_chunked_by_count():
+    db = make_db(lambda chunk: None, max_rows=3)
+
+    assert db._bulk_insert('admin_audit_log', rows(8)) == 8
+    assert db.supabase.requests == [3, 3, 2]
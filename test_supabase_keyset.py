@@ -0,0 +1,161 @@
+# test_supabase_keyset.py - Keyset pagination in SupabaseDB must visit every row exactly once
+
+import re
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("supabase")
+
+from supabase_db import SupabaseDB
+
+KEYSET_FILTER = re.compile(r'^timestamp\.(gt|lt)\."([^"]+)",and\(timestamp\.eq\."([^"]+)",id\.(gt|lt)\.(\d+)\)$')
+OPERATORS = {
+    'gt': lambda a, b: a > b,
+    'lt': lambda a, b: a < b,
+}
+
+
+class FakeQuery:
+    """Just enough of the PostgREST query builder to run _iter_keyset against a list of rows"""
+
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+        self.columns = None
+        self.predicates = []
+        self.orders = []
+        self.row_limit = None
+        self.negate = False
+
+    def select(self, columns):
+        self.columns = columns.split(',')
+        return self
+
+    def _where(self, predicate):
+        if self.negate:
+            self.negate = False
+            self.predicates.append(lambda row: not predicate(row))
+        else:
+            self.predicates.append(predicate)
+        return self
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def gte(self, column, value):
+        return self._where(lambda row: row[column] >= value)
+
+    def lt(self, column, value):
+        return self._where(lambda row: row[column] < value)
+
+    def neq(self, column, value):
+        return self._where(lambda row: row[column] != value)
+
+    def is_(self, column, value):
+        assert value == 'null'
+        return self._where(lambda row: row[column] is None)
+
+    def or_(self, expression):
+        match = KEYSET_FILTER.match(expression)
+        assert match, f"unexpected or_ filter: {expression}"
+        direction, timestamp, tied_timestamp, id_direction, last_id = match.groups()
+        assert timestamp == tied_timestamp and direction == id_direction
+        after = OPERATORS[direction]
+        return self._where(lambda row: after(row['timestamp'], timestamp)
+                           or (row['timestamp'] == timestamp and after(row['id'], int(last_id))))
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        self.client.requests += 1
+        rows = [row for row in self.rows if all(predicate(row) for predicate in self.predicates)]
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        rows = rows[:self.row_limit]
+        assert len(rows) <= self.client.max_rows
+        return SimpleNamespace(data=[{column: row[column] for column in self.columns} for row in rows])
+
+
+class FakeClient:
+    def __init__(self, rows, max_rows):
+        self.rows = rows
+        self.max_rows = max_rows  # PostgREST's row cap
+        self.requests = 0
+
+    def table(self, name):
+        assert name == 'usage_logs'
+        return FakeQuery(self, self.rows)
+
+
+def make_rows():
+    # Several rows share each timestamp, with ids out of insertion order, so page
+    # boundaries fall inside runs of tied timestamps
+    rows = []
+    for i, row_id in enumerate([7, 3, 12, 1, 9, 4, 15, 2, 11, 6, 14, 5, 10, 8, 13]):
+        rows.append({
+            'id': row_id,
+            'timestamp': f"2026-10-0{1 + i % 3}T10:00:00",
+            'error_message': "timeout" if row_id % 4 == 0 else None,
+        })
+    return rows
+
+
+def make_db(rows, page_size=4):
+    db = SupabaseDB.__new__(SupabaseDB)  # Skips connecting to Supabase
+    db.supabase = FakeClient(rows, max_rows=page_size)
+    db.page_size = page_size
+    return db
+
+
+def order_key(row):
+    return row['timestamp'], row['id']
+
+
+@pytest.mark.parametrize("newest_first", [False, True])
+def test_visits_every_row_once_in_order(newest_first):
+    rows = make_rows()
+    db = make_db(rows)
+
+    seen = list(db.iter_usage_logs('id,timestamp', newest_first=newest_first))
+
+    expected = sorted(rows, key=order_key, reverse=newest_first)
+    assert [row['id'] for row in seen] == [row['id'] for row in expected]
+    assert db.supabase.requests == len(rows) // db.page_size + 1
+
+
+def test_stops_without_an_extra_request_on_a_short_page():
+    rows = make_rows()[:14]
+    db = make_db(rows, page_size=5)
+
+    assert len(list(db.iter_usage_logs('id,timestamp'))) == 14
+    assert db.supabase.requests == 3
+
+
+def test_filters_apply_to_every_page():
+    rows = make_rows()
+    db = make_db(rows, page_size=2)
+
+    seen = list(db.iter_usage_logs('id,timestamp,error_message', start="2026-10-02", errors_only=True))
+
+    expected = sorted((row for row in rows if row['timestamp'] >= "2026-10-02" and row['error_message']),
+                      key=order_key)
+    assert [row['id'] for row in seen] == [row['id'] for row in expected]
+
+
+def test_get_usage_logs_returns_newest_first_up_to_limit():
+    rows = make_rows()
+    db = make_db(rows)
+
+    logs = db.get_usage_logs(limit=6, columns='id,timestamp')
+
+    expected = sorted(rows, key=order_key, reverse=True)[:6]
+    assert [log['id'] for log in logs] == [row['id'] for row in expected]
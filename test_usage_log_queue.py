@@ -0,0 +1,124 @@
+# test_usage_log_queue.py - Write-behind batching, flush on close and drop counting
+
+import threading
+
+import pytest
+
+from usage_log_queue import UsageLogWriter
+
+
+class RowDb:
+    """Writes one row per call; `gate` holds writes until it is set, and negative scores fail"""
+
+    def __init__(self):
+        self.rows = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def log_email_analysis(self, **record):
+        self.gate.wait(5)
+        if record['score'] < 0:
+            return None
+        self.rows.append(record['score'])
+        return len(self.rows)
+
+
+class BulkDb(RowDb):
+    """Also takes whole batches, writing `written_per_batch` rows of each (all by default)"""
+
+    def __init__(self, written_per_batch=None):
+        super().__init__()
+        self.batches = []
+        self.written_per_batch = written_per_batch
+
+    def log_email_analyses(self, records):
+        self.gate.wait(5)
+        self.batches.append([record['score'] for record in records])
+        written = records[:self.written_per_batch]
+        self.rows.extend(record['score'] for record in written)
+        return len(written)
+
+
+@pytest.fixture
+def writers():
+    created = []
+    yield created
+    for writer in created:
+        writer.close()
+
+
+def make_writer(writers, db, **kwargs):
+    kwargs.setdefault('flush_interval_ms', 10)
+    writer = UsageLogWriter(db, **kwargs)
+    writers.append(writer)
+    return writer
+
+
+def test_close_writes_out_everything_queued(writers):
+    db = RowDb()
+    db.gate.clear()  # Hold the writer on its first batch while the rest queue up
+    writer = make_writer(writers, db, batch_size=3)
+    for score in range(7):
+        assert writer.log(score=score)
+    db.gate.set()
+    writer.close()
+
+    assert sorted(db.rows) == list(range(7))
+    stats = writer.stats()
+    assert (stats['enqueued'], stats['written'], stats['failed'], stats['queued']) == (7, 7, 0, 0)
+
+
+def test_rows_logged_after_close_are_dropped(writers):
+    writer = make_writer(writers, RowDb())
+    writer.close()
+
+    assert writer.log(score=1) is False
+    assert writer.stats()['dropped'] == 1
+
+
+def test_full_queue_drops_instead_of_blocking(writers):
+    db = RowDb()
+    db.gate.clear()
+    writer = make_writer(writers, db, max_queue=2, batch_size=1)
+    results = [writer.log(score=score) for score in range(10)]
+    db.gate.set()
+    writer.close()
+
+    assert results.count(False) == writer.stats()['dropped'] > 0
+    assert writer.stats()['written'] == results.count(True)
+
+
+def test_failed_rows_are_counted(writers):
+    db = RowDb()
+    writer = make_writer(writers, db, batch_size=10)
+    for score in (5, -1, 7):
+        writer.log(score=score)
+    writer.close()
+
+    assert db.rows == [5, 7]
+    assert (writer.stats()['written'], writer.stats()['failed']) == (2, 1)
+
+
+def test_batches_are_written_with_one_bulk_insert_each(writers):
+    db = BulkDb()
+    db.gate.clear()
+    writer = make_writer(writers, db, batch_size=3)
+    for score in range(7):
+        writer.log(score=score)
+    db.gate.set()
+    writer.close()
+
+    assert sorted(db.rows) == list(range(7))
+    assert all(len(batch) <= 3 for batch in db.batches)
+    assert writer.stats()['batches'] == len(db.batches) < 7
+
+
+def test_partly_written_batches_count_failures(writers):
+    writer = make_writer(writers, BulkDb(written_per_batch=1), batch_size=10)
+    for score in range(3):
+        writer.log(score=score)
+    writer.close()
+
+    stats = writer.stats()
+    assert stats['written'] + stats['failed'] == 3
+    assert stats['written'] == stats['batches']
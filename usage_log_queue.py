@@ -0,0 +1,112 @@
+# usage_log_queue.py - Write-behind queue for usage_logs rows
+
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class UsageLogWriter:
+    """Take usage-log writes off the request path.
+
+    `log` puts the row on a bounded in-memory queue and returns at once; a background
+    thread drains it, writing up to `batch_size` rows at a time (it waits at most
+    `flush_interval_ms` after the first row for a batch to fill). When the queue is full
+    the row is dropped and counted rather than making the request wait. `close` writes
+    out whatever is still queued.
+    """
+
+    def __init__(self, db, max_queue: Optional[int] = None, batch_size: Optional[int] = None,
+                 flush_interval_ms: Optional[int] = None):
+        if max_queue is None:
+            max_queue = int(os.getenv("USAGE_LOG_QUEUE_SIZE", "10000"))
+        if batch_size is None:
+            batch_size = int(os.getenv("USAGE_LOG_BATCH_SIZE", "100"))
+        if flush_interval_ms is None:
+            flush_interval_ms = int(os.getenv("USAGE_LOG_FLUSH_MS", "500"))
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000
+
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._stopping = threading.Event()
+        self.counters = {'enqueued': 0, 'dropped': 0, 'written': 0, 'failed': 0, 'batches': 0}
+        self._counter_lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._run, name="usage-log-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, **record) -> bool:
+        """Queue one db.log_email_analysis(**record) call; False if it was dropped"""
+        if not self._stopping.is_set():
+            try:
+                self._queue.put_nowait(record)
+                self._count('enqueued')
+                return True
+            except queue.Full:
+                pass
+        self._count('dropped')
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and write counters"""
+        with self._counter_lock:
+            return {
+                **self.counters,
+                'queued': self._queue.qsize(),
+                'max_queue': self._queue.maxsize,
+                'batch_size': self.batch_size
+            }
+
+    def close(self, timeout: float = 10):
+        """Stop accepting rows and write out everything still queued"""
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"WARNING: Usage log writer still busy after {timeout:g}s, {self._queue.qsize()} rows unwritten")
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0 or self._stopping.is_set():
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        written = 0
+        if hasattr(self.db, 'log_email_analyses'):
+            # One multi-row insert per batch
+            try:
+                written = self.db.log_email_analyses(batch)
+            except Exception as e:
+                print(f"WARNING: Usage log write failed: {e}")
+        else:
+            for record in batch:
+                try:
+                    if self.db.log_email_analysis(**record) is not None:
+                        written += 1
+                except Exception as e:
+                    print(f"WARNING: Usage log write failed: {e}")
+        self._count('written', written)
+        self._count('failed', len(batch) - written)
+        self._count('batches')
+
+    def _count(self, name: str, amount: int = 1):
+        with self._counter_lock:
+            self.counters[name] += amount
@@ -0,0 +1,111 @@
+# usage_rollup.py - Buckets and summaries for the hourly usage rollup tables
+
+from datetime import datetime
+from typing import Any, Dict, Iterable
+
+# usage_rollup_hourly holds one row per (hour, ai_model), kept up to date by a trigger on
+# usage_logs in both the Supabase and SQLite backends. The bucket columns below must match
+# the table definitions there.
+
+# Fixed score histogram: (label, column, low, high), inclusive bounds
+SCORE_BUCKETS = (
+    ('0-20', 'score_0_20', 0, 20),
+    ('21-40', 'score_21_40', 21, 40),
+    ('41-60', 'score_41_60', 41, 60),
+    ('61-80', 'score_61_80', 61, 80),
+    ('81-100', 'score_81_100', 81, 100),
+)
+
+# Response-time sketch: (upper bound in seconds, column); the last bucket is open-ended
+RESPONSE_TIME_BUCKETS = (
+    (0.25, 'rt_le_250ms'),
+    (0.5, 'rt_le_500ms'),
+    (1.0, 'rt_le_1s'),
+    (2.0, 'rt_le_2s'),
+    (5.0, 'rt_le_5s'),
+    (None, 'rt_gt_5s'),
+)
+
+# Columns that add up across rows
+SUM_COLUMNS = (
+    'request_count', 'error_count', 'score_count', 'score_sum', 'score_sum_sq',
+    *(column for _, column, _, _ in SCORE_BUCKETS),
+    'response_time_count', 'response_time_sum',
+    *(column for _, column in RESPONSE_TIME_BUCKETS),
+)
+
+
+def is_ai_enhanced(ai_model) -> bool:
+    """Whether a request counts as AI enhanced; the same rule as get_daily_usage in SQL"""
+    return bool(ai_model) and ai_model != 'none'
+
+
+def rollup_hour(row: Dict[str, Any]) -> datetime:
+    """The hour a rollup row covers, as a naive datetime (UTC for Supabase)"""
+    return datetime.fromisoformat(str(row['hour']).replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def requests_by_hour(rows: Iterable[Dict[str, Any]]) -> Dict[datetime, int]:
+    """Request counts per hour, summed over ai_model"""
+    counts = {}
+    for row in rows:
+        hour = rollup_hour(row)
+        counts[hour] = counts.get(hour, 0) + (row['request_count'] or 0)
+    return counts
+
+
+def summarize_rollup(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine rollup rows into totals, score statistics and response-time percentiles"""
+    totals = dict.fromkeys(SUM_COLUMNS, 0)
+    by_model = {}
+    score_min = score_max = response_time_max = None
+
+    for row in rows:
+        for column in SUM_COLUMNS:
+            totals[column] += row.get(column) or 0
+        by_model[row['ai_model']] = by_model.get(row['ai_model'], 0) + (row['request_count'] or 0)
+        if row.get('score_min') is not None:
+            score_min = row['score_min'] if score_min is None else min(score_min, row['score_min'])
+        if row.get('score_max') is not None:
+            score_max = row['score_max'] if score_max is None else max(score_max, row['score_max'])
+        if row.get('response_time_max') is not None:
+            response_time_max = (row['response_time_max'] if response_time_max is None
+                                 else max(response_time_max, row['response_time_max']))
+
+    requests = totals['request_count']
+    scored = totals['score_count']
+    avg_score = totals['score_sum'] / scored if scored else 0
+    variance = totals['score_sum_sq'] / scored - avg_score ** 2 if scored else 0
+    timed = totals['response_time_count']
+
+    return {
+        'total_requests': requests,
+        'error_count': totals['error_count'],
+        'success_rate': (requests - totals['error_count']) / requests * 100 if requests else 0,
+        'avg_score': avg_score,
+        'score_stddev': max(variance, 0) ** 0.5,
+        'min_score': score_min or 0,
+        'max_score': score_max or 0,
+        'score_distribution': [
+            {'range': label, 'count': totals[column]} for label, column, _, _ in SCORE_BUCKETS
+        ],
+        'avg_response_time': totals['response_time_sum'] / timed if timed else 0,
+        'response_time_p50': _sketch_percentile(totals, 0.50, response_time_max),
+        'response_time_p95': _sketch_percentile(totals, 0.95, response_time_max),
+        'requests_by_model': by_model
+    }
+
+
+def _sketch_percentile(totals: Dict[str, Any], quantile: float, maximum) -> float:
+    """Upper bound of the response-time bucket holding the quantile (capped at the maximum seen)"""
+    count = totals['response_time_count']
+    if not count:
+        return 0
+    seen = 0
+    for bound, column in RESPONSE_TIME_BUCKETS:
+        seen += totals[column]
+        if seen >= quantile * count:
+            if bound is None or (maximum is not None and maximum < bound):
+                return maximum or 0
+            return bound
+    return maximum or 0